@@ -1,15 +1,24 @@
 import streamlit as st
 import pandas as pd
-import plotly.express as px
-import json, re
-from PIL import Image
+import json
 from io import BytesIO
 import base64
 
-from libs.sheets import load_sheet_as_df
-from libs.nlp import classify_topic, detect_urgency, detect_sender_type
-from libs.llm_client import generate_email_skeleton, fact_check_and_save
+from libs.sheets import load_sheet_as_df, load_sheet_values, load_email_metadata
+from libs.nlp import detect_sender_type
+from libs.llm_client import generate_email_skeleton_structured, fact_check_and_save, register_drafts_target
 from libs.gmail_scheduler import get_scheduler
+from libs.sync_worker import WorkerStatusClient, worker_mode_enabled
+from libs.near_dup import get_skeleton_index
+from libs.threads import summarize_threads, thread_messages, thread_text
+from libs.response_times import drafts_frame, get_response_stats
+from libs.rollups import get_rollup_store
+from libs.metrics import compute_email_metrics
+from libs.priority import get_priority_index, policy_flags
+from libs.alerts import alerts_view
+from libs.pagination import frame_version, render_table
+from libs.content_store import get_content_store, with_content
+from libs import profiler
 
 
 # ------------------------------------------------
@@ -19,6 +28,8 @@ st.set_page_config(
     page_title="BAKY TERPS - Academic Advisor Dashboard",
     layout="wide",
 )
+# Rerun timings (DASHBOARD_PROFILE=1; no-ops otherwise); see the sidebar panel
+profiler.start_session_rerun()
 
 SHEET_ID = st.secrets.get("SHEET_ID")
 
@@ -26,6 +37,7 @@ SHEET_ID = st.secrets.get("SHEET_ID")
 # ------------------------------------------------
 # THEME STYLING
 # ------------------------------------------------
+profiler.mark("css")
 st.markdown(
     """
     <style>
@@ -101,13 +113,17 @@ st.markdown(
 # ------------------------------------------------
 # HEADER WITH LOGO AND TITLE
 # ------------------------------------------------
+@st.cache_data
 def image_to_base64(img_path):
+    from PIL import Image  # only needed once per process thanks to the cache
+
     img = Image.open(img_path).convert("RGBA")
     buffered = BytesIO()
     img.save(buffered, format="PNG")
     return base64.b64encode(buffered.getvalue()).decode()
 
 
+profiler.mark("logo")
 logo_b64 = image_to_base64("testudo.jpg")
 
 header_html = f"""
@@ -118,6 +134,7 @@ header_html = f"""
     </h1>
 </div>
 """
+profiler.mark("css")
 # Extra CSS to ensure consistent light theme across all widgets
 st.markdown(
     """
@@ -312,19 +329,31 @@ st.markdown(
 # ------------------------------------------------
 # START BACKGROUND GMAIL SYNC
 # ------------------------------------------------
-if "scheduler_started" not in st.session_state:
+profiler.mark("startup")
+# With GMAIL_SYNC_MODE=worker the sync runs in `python -m libs.sync_worker`
+# and the dashboard only reads the status it publishes.
+if "scheduler_started" not in st.session_state and not worker_mode_enabled():
     try:
         scheduler = get_scheduler()
-        scheduler.start(interval_minutes=4)
+        scheduler.start(interval_minutes=4, adaptive=True, min_interval_minutes=1, max_interval_minutes=30)
         st.session_state["scheduler_started"] = True
         print("✅ Gmail scheduler started")
     except Exception as e:
         print("⚠️ Failed to start scheduler:", e)
 
+# Drafts spooled by an earlier run are flushed as soon as the app is up
+if "drafts_queue_registered" not in st.session_state:
+    try:
+        register_drafts_target()
+    except Exception as e:
+        print("⚠️ Could not open the Sheets write queue:", e)
+    st.session_state["drafts_queue_registered"] = True
+
 
 # ------------------------------------------------
 # SIDEBAR NAVIGATION
 # ------------------------------------------------
+profiler.mark("sidebar")
 st.sidebar.title("📊 Navigation")
 
 page = st.sidebar.radio(
@@ -333,39 +362,137 @@ page = st.sidebar.radio(
 )
 
 # Gmail Sync Status
-scheduler = get_scheduler()
-status = scheduler.get_status()
+scheduler = WorkerStatusClient() if worker_mode_enabled() else get_scheduler()
+
+
+# Rendered as a fragment so it can refresh itself (every 2s while a sync is
+# running) without rerunning the whole page; the sync runs in the background.
+@st.fragment(run_every=2 if scheduler.sync_in_progress else None)
+def gmail_sync_sidebar():
+    status = scheduler.get_status()
+
+    st.markdown("### 📩 Gmail Sync Status")
+    st.write("✅ Running:", status["is_running"])
+    st.write("⏱ Last Sync:", status["last_sync_time"])
+    st.write("📥 Emails Added:", status["last_sync_count"])
+    st.write("⏭ Next Run:", status["next_run_time"])
+    if status.get("interval_minutes"):
+        interval = f"{status['interval_minutes']:.1f} min"
+        if status.get("arrival_rate_per_hour") is not None:
+            interval += f" (~{status['arrival_rate_per_hour']:.1f} emails/h)"
+        if status.get("quota_backoff"):
+            interval += " · backing off after quota error"
+        st.write("🔁 Interval:", interval)
+    if status.get("last_error"):
+        st.error(status["last_error"])
+    write_queue = status.get("write_queue") or {}
+    if write_queue.get("pending"):
+        st.caption(f"📤 {write_queue['pending']} rows waiting to be written to Google Sheets"
+                   + (f" (retrying: {write_queue['last_error']})" if write_queue.get("last_error") else ""))
+
+    # Polling stops with a full rerun once the background sync finishes
+    if st.session_state.get("sync_polling") and not status["sync_in_progress"]:
+        st.session_state["sync_polling"] = False
+        st.rerun()
+
+    mailboxes = status.get("mailboxes")
+    if mailboxes:
+        st.dataframe(
+            pd.DataFrame([
+                {"mailbox": name,
+                 "state": "syncing" if m["sync_in_progress"] else "queued" if m["queued"] else "idle",
+                 "last sync": m["last_sync_time"].strftime("%H:%M") if m["last_sync_time"] else "—",
+                 "added": m["last_sync_count"],
+                 "every (min)": round(m["interval_minutes"] or 0, 1),
+                 "error": m["last_error"] or ""}
+                for name, m in mailboxes.items()
+            ]),
+            hide_index=True,
+            use_container_width=True,
+        )
+
+    progress = status["progress"]
+    if status["sync_in_progress"]:
+        total = progress["total"] or 0
+        st.progress(
+            min(progress["fetched"] / total, 1.0) if total else 0.0,
+            text=f"{progress['stage'].capitalize()}: fetched {progress['fetched']}/{total}, "
+                 f"parsed {progress['parsed']}, appended {progress['appended']}",
+        )
+
+    metrics = status.get("metrics") or {}
+    if metrics.get("runs"):
+        with st.expander("⏱ Sync timings"):
+            st.caption(
+                f"Last run {metrics['last_run_ms'] / 1000:.1f}s · p95 {metrics['run_p95_ms'] / 1000:.1f}s "
+                f"over {metrics['runs']} runs · {metrics['counters'].get('errors', 0)} errors"
+            )
+            st.dataframe(
+                pd.DataFrame([
+                    {"stage": stage, "n": s["count"], "p50 ms": s["p50_ms"], "p95 ms": s["p95_ms"],
+                     "last run ms": s["last_run_total_ms"]}
+                    for stage, s in metrics["stages"].items() if s["count"]
+                ]),
+                hide_index=True,
+                use_container_width=True,
+            )
+
+    if st.button("🔄 Run Gmail Sync Now", disabled=status["sync_in_progress"]):
+        if scheduler.trigger_sync():
+            st.toast("🔄 Gmail sync started in the background")
+        else:
+            st.toast("⏳ A Gmail sync is already running")
+        # Full rerun so the fragment is re-registered with polling enabled
+        st.session_state["sync_polling"] = True
+        st.rerun()
 
-st.sidebar.markdown("### 📩 Gmail Sync Status")
-st.sidebar.write("✅ Running:", status["is_running"])
-st.sidebar.write("⏱ Last Sync:", status["last_sync_time"])
-st.sidebar.write("📥 Emails Added:", status["last_sync_count"])
-st.sidebar.write("⏭ Next Run:", status["next_run_time"])
 
-if st.sidebar.button("🔄 Run Gmail Sync Now"):
-    scheduler.sync_emails()
-    st.sidebar.success("✅ Sync complete!")
+with st.sidebar:
+    gmail_sync_sidebar()
 
 
 # ------------------------------------------------
 # LOAD GOOGLE SHEETS DATA
 # ------------------------------------------------
-student_cases = load_sheet_as_df(SHEET_ID, "Student Case")
-meetings = load_sheet_as_df(SHEET_ID, "Meetings")
-policies = load_sheet_as_df(SHEET_ID, "Academic Policy")
-email_df = load_sheet_as_df(SHEET_ID, "Email")
+profiler.mark("load sheets")
+with profiler.section("sheet: Student Case"):
+    student_cases = load_sheet_as_df(SHEET_ID, "Student Case")
+with profiler.section("sheet: Meetings"):
+    meetings = load_sheet_as_df(SHEET_ID, "Meetings")
+with profiler.section("sheet: Academic Policy"):
+    policies = load_sheet_as_df(SHEET_ID, "Academic Policy")
+# Metadata only: bodies live in the content store and are read when displayed
+with profiler.section("sheet: Email"):
+    email_df = load_email_metadata(SHEET_ID)
 
 
 # ------------------------------------------------
 # PREPROCESS EMAIL DATA
 # ------------------------------------------------
+profiler.mark("nlp enrichment")
 email_df["Date"] = pd.to_datetime(email_df["Date"], errors="coerce")
 email_df["month"] = email_df["Date"].dt.strftime("%b")
 
-email_df["topic"] = email_df["Content"].apply(classify_topic)
-email_df["urgency"] = email_df["Content"].apply(detect_urgency)
+# topic is classified once per body; urgency is recomputed on every load from the deadlines stored with it
 email_df["sender_type"] = email_df["Email"].apply(detect_sender_type)
 
+profiler.mark("load drafts")
+drafts_df = drafts_frame(load_sheet_values(SHEET_ID, "drafts"))
+
+# Open threads by urgency, deadline and policy status; only rows and drafts
+# appended since the last rerun are added, nothing is re-sorted
+profiler.mark("priority index")
+priority = get_priority_index()
+priority.set_policy_flags(policy_flags(policies))
+priority.ingest_sheet(email_df)
+priority.ingest_drafts(drafts_df)
+
+
+@st.cache_data(max_entries=2, show_spinner=False)
+def cached_threads(version, _email_df):
+    # Thread summaries are rebuilt only when the email rows change
+    return summarize_threads(_email_df)
+
 
 # ------------------------------------------------
 # HELPER: STAT CARD
@@ -383,10 +510,14 @@ def stat_card(title, value, subtitle=""):
     )
 
 
+profiler.mark(f"page: {page}")
+
 # ================================================================
 # HOME DASHBOARD
 # ================================================================
 if page == "Home Dashboard":
+    import plotly.express as px  # deferred: only the dashboard draws charts
+
     total_students = len(student_cases)
     scheduled_meetings = len(meetings)
     student_cases["GPA"] = pd.to_numeric(student_cases["GPA"], errors="coerce")
@@ -407,6 +538,7 @@ if page == "Home Dashboard":
 
     # --- Students by Program ---
     with c1:
+        profiler.mark("chart: programs")
         st.markdown("### Students by Program")
         if "Program" in student_cases.columns:
             program_counts = student_cases["Program"].value_counts()
@@ -423,6 +555,7 @@ if page == "Home Dashboard":
 
     # --- Emails by Category ---
     with c2:
+        profiler.mark("chart: topics")
         st.markdown("### Emails by Category")
         if "topic" in email_df.columns:
             topic_counts = email_df["topic"].value_counts().reset_index()
@@ -455,6 +588,7 @@ if page == "Home Dashboard":
 
     st.markdown("---")
 
+    profiler.mark("chart: credits")
     # --- Credits Distribution ---
     st.subheader("📘 Credits Distribution")
     if "Earned Credits" in student_cases.columns:
@@ -493,6 +627,7 @@ if page == "Home Dashboard":
 
     st.markdown("---")
 
+    profiler.mark("chart: gpa")
     # --- GPA Distribution ---
     st.subheader("🎯 GPA Distribution")
     bins = [0, 2.5, 3.0, 3.5, 4.1]
@@ -525,46 +660,109 @@ if page == "Home Dashboard":
 
     st.markdown("---")
 
+    profiler.mark("alerts")
     # --- Academic Alerts ---
+    # One table element however many students are flagged; rebuilt only when the sheets change
     st.subheader("⚠️ Academic Policy Alerts")
-    alerts = policies[
-        (policies["Probation"] == "Yes") |
-        (policies["Registration Block"] == "Yes")
-    ]
-    for _, row in alerts.iterrows():
-        st.write(f"**{row['Student']}** — UID: {row['UID']}")
-        st.caption(row.get("Note", ""))
+    alerts = alerts_view(policies, student_cases, email_df)
+    if alerts.empty:
+        st.caption("No students on probation or with a registration block.")
+    else:
+        page_size = 25
+        pages = -(-len(alerts) // page_size)
+        alerts_page = st.number_input("Alerts page", 1, pages, 1, key="alerts_page") if pages > 1 else 1
+        st.caption(f"{len(alerts)} alerts, most severe first — page {alerts_page} of {pages}")
+        st.dataframe(alerts.iloc[(alerts_page - 1) * page_size:alerts_page * page_size],
+                     use_container_width=True, hide_index=True)
+
+    st.markdown("---")
+
+    profiler.mark("priority inbox")
+    # --- Top threads ---
+    st.subheader("🧵 Priority Inbox")
+    st.caption(f"{priority.open_count()} open threads")
+    st.dataframe(
+        pd.DataFrame(priority.top(10), columns=[
+            "latest_name", "subject", "messages", "urgency", "deadline", "flagged", "latest_at",
+        ]).rename(columns={
+            "latest_name": "Latest From", "subject": "Subject", "messages": "Messages", "urgency": "Urgency",
+            "deadline": "Deadline", "flagged": "Probation / Block", "latest_at": "Last Message",
+        }),
+        use_container_width=True, hide_index=True,
+    )
 
     st.markdown("---")
 
+    profiler.mark("response times")
+    # --- Response times ---
+    # Only drafts appended since the last rerun are joined; the sketches hold the rest
+    st.subheader("⏱️ Response Times")
+    response_stats = get_response_stats()
+    rollups = get_rollup_store()
+    response_stats.update(email_df, drafts_df, rollups=rollups)
+    reply_metrics = compute_email_metrics(rollups=rollups)
+    c1, c2, c3 = st.columns(3)
+    with c1: stat_card("Replies Saved", reply_metrics["total_emails"])
+    with c2: stat_card("Avg Response", f"{reply_metrics['avg_response_hours']:.1f} h"
+                       if reply_metrics["avg_response_hours"] is not None else "N/A")
+    with c3: stat_card("Hours Saved", f"{reply_metrics['hours_saved']:.1f}", "by AI skeletons")
+    group_by = st.radio("Group by", ["advisor", "topic", "urgency"], horizontal=True, key="response_group_by")
+    response_summary = response_stats.summary(group_by)
+    if response_summary.empty:
+        st.caption("No timestamped drafts yet.")
+    else:
+        st.dataframe(response_summary.round(1), use_container_width=True, hide_index=True)
+
+    st.markdown("---")
+
+    profiler.mark("assistant")
     # --- AI EMAIL ASSISTANT ---
+    # One skeleton per conversation: the LLM sees the whole thread, newest messages first to be kept
     st.subheader("🧠 AI Email Draft Assistant")
-    newest = email_df.sort_values("Date", ascending=False).head(5)
-    for idx, row in newest.iterrows():
-        with st.expander(f"📧 {row['Name']} — {row['Subject']}"):
-            st.write(f"**From:** {row['Email']}")
-            st.write(f"**Date:** {row['Date'].strftime('%b %d, %Y') if pd.notnull(row['Date']) else 'N/A'}")
-            st.markdown("**Content:**")
-            st.write(row['Content'])
+    advisor = st.text_input("Advisor name (saved with your drafts)", value=st.secrets.get("ADVISOR_NAME", ""),
+                            key="advisor_name")
+    for thread in priority.top(5):
+        tid = thread["thread_id"]
+        messages = with_content(thread_messages(email_df, tid))
+        label = f" ({thread['messages']} messages)" if thread["messages"] > 1 else ""
+        with st.expander(f"📧 {thread['latest_name']} — {thread['subject']}{label}"):
+            st.write(f"**Participants:** {thread['participants']}")
+            st.write(f"**Urgency:** {thread['urgency']}")
+            if thread["deadline"] is not None:
+                st.write(f"**Deadline:** {thread['deadline'].strftime('%b %d, %Y %H:%M')}")
+            if thread["flagged"]:
+                st.write("**Policy:** ⚠️ probation or registration block")
+            for _, msg in messages.iterrows():
+                when = msg["sent_at"].strftime("%b %d, %Y %H:%M") if pd.notnull(msg["sent_at"]) else "N/A"
+                st.markdown(f"**{msg['Name']}** <{msg['Email']}> — {when}")
+                st.write(msg["Content"])
             st.markdown("---")
 
-            if st.button(f"🪄 Generate AI Skeleton #{idx}", key=f"skeleton_btn_{idx}"):
-                with st.spinner("Generating AI reply skeleton..."):
-                    skeleton_json = generate_email_skeleton(row["Content"], student_summary=row.get("Name", "N/A"))
-                st.session_state[f"skeleton_json_{idx}"] = skeleton_json
-
-            if f"skeleton_json_{idx}" in st.session_state:
-                raw_output = st.session_state[f"skeleton_json_{idx}"]
+            conversation = thread_text(messages)
+            if st.button("🪄 Generate AI Skeleton", key=f"skeleton_btn_{tid}"):
                 try:
-                    match = re.search(r'\{.*\}', raw_output, re.DOTALL)
-                    cleaned_json = match.group(0) if match else raw_output
-                    skeleton = json.loads(cleaned_json)
-                except Exception:
-                    st.warning("⚠️ Could not parse Groq output as JSON.")
-                    st.code(raw_output)
-                    continue
+                    with st.spinner("Generating AI reply skeleton..."):
+                        # Near-duplicate threads (same topic, similar wording) reuse a cached skeleton
+                        skeleton_obj, similarity = get_skeleton_index().get_or_generate(
+                            conversation,
+                            thread["latest_name"] or "N/A",
+                            lambda text, name: generate_email_skeleton_structured(text, student_summary=name),
+                        )
+                    # Cache the parsed skeleton, not the raw LLM text
+                    st.session_state[f"skeleton_json_{tid}"] = skeleton_obj.to_dict()
+                    st.session_state[f"skeleton_issues_{tid}"] = skeleton_obj.issues
+                    st.session_state[f"skeleton_reused_{tid}"] = similarity
+                except RuntimeError as e:
+                    st.error(str(e))
+
+            if f"skeleton_json_{tid}" in st.session_state:
+                skeleton = st.session_state[f"skeleton_json_{tid}"]
 
                 st.markdown("### ✉️ AI-Generated Reply Skeleton")
+                if st.session_state.get(f"skeleton_issues_{tid}"):
+                    st.caption("⚠️ Repaired model output: " + "; ".join(st.session_state[f"skeleton_issues_{tid}"]))
+                if st.session_state.get(f"skeleton_reused_{tid}") is not None:
+                    st.caption(f"♻️ Reused from a similar email (similarity {st.session_state[f'skeleton_reused_{tid}']:.0%})")
                 st.write("**Summary:**", skeleton.get("summary", ""))
                 st.markdown("**Points to Include:**")
                 for point in skeleton.get("reply_points", []):
@@ -577,16 +775,23 @@ if page == "Home Dashboard":
                 st.code(skeleton.get("skeleton_reply", ""), language="markdown")
 
                 st.markdown('<div class="custom-info-box">Write your own email below based on this skeleton:</div>', unsafe_allow_html=True)
-                user_draft = st.text_area("Your Email Draft", key=f"user_draft_{idx}", height=220)
+                user_draft = st.text_area("Your Email Draft", key=f"user_draft_{tid}", height=220)
 
-                if st.button(f"✅ Fact-check & Save Draft #{idx}", key=f"factcheck_btn_{idx}"):
+                if st.button("✅ Fact-check & Save Draft", key=f"factcheck_btn_{tid}"):
                     if not user_draft.strip():
                         st.warning("⚠️ Please write your draft before fact-checking.")
                     else:
-                        with st.spinner("Fact-checking your reply..."):
-                            review = fact_check_and_save(user_draft, st.session_state[f"skeleton_json_{idx}"], row["Content"])
-                        st.markdown("**📋 Fact-check Report:**")
-                        st.code(review, language="json")
+                        try:
+                            with st.spinner("Fact-checking your reply..."):
+                                review = fact_check_and_save(
+                                    user_draft, json.dumps(skeleton, indent=2), conversation,
+                                    message_id=messages.iloc[-1].get("Message ID"), thread_id=tid, advisor=advisor,
+                                    student_uid=messages.iloc[-1].get("UID"),
+                                )
+                            st.markdown("**📋 Fact-check Report:**")
+                            st.code(review, language="json")
+                        except RuntimeError as e:
+                            st.error(str(e))
 
 
 # ================================================================
@@ -607,7 +812,34 @@ elif page == "Students":
 # ================================================================
 elif page == "Emails":
     st.title("Emails")
-    st.dataframe(email_df.sort_values("Date", ascending=False), use_container_width=True, height=520)
+    # Row identity columns (bodies are not in email_df)
+    email_version = frame_version(email_df, ["Email", "Date", "Time", "Subject", "UID", "Thread ID"])
+    if st.toggle("Group by thread", value=True):
+        threads = cached_threads(email_version, email_df)
+        st.caption(f"{len(threads)} threads from {len(email_df)} emails")
+        selected = render_table(
+            threads, "threads", default_sort="latest_at",
+            search_columns=["subject", "participants", "latest_email"],
+            hidden_columns=["thread_id", "latest_content"],
+            version=hash((email_version, "threads")),
+        )
+        if selected is not None:
+            st.markdown(f"#### 🧵 {selected['subject']}")
+            for _, msg in with_content(thread_messages(email_df, selected["thread_id"])).iterrows():
+                when = msg["sent_at"].strftime("%b %d, %Y %H:%M") if pd.notnull(msg["sent_at"]) else "N/A"
+                st.markdown(f"**{msg['Name']}** <{msg['Email']}> — {when}")
+                st.write(msg["Content"])
+    else:
+        selected = render_table(
+            email_df, "emails", default_sort="Date",
+            search_columns=["Name", "Email", "Subject", "UID"],
+            hidden_columns=["month", "message_key"], version=email_version,
+        )
+        if selected is not None:
+            st.markdown(f"#### ✉️ {selected['Subject']}")
+            st.caption(f"{selected['Name']} <{selected['Email']}> — "
+                       f"{selected['Date'].strftime('%b %d, %Y') if pd.notnull(selected['Date']) else 'N/A'} {selected.get('Time', '')}")
+            st.write(get_content_store().get(selected["message_key"]))
 
 
 # ================================================================
@@ -615,7 +847,7 @@ elif page == "Emails":
 # ================================================================
 elif page == "Meetings":
     st.title("Advisor Meetings")
-    st.dataframe(meetings, use_container_width=True, height=520)
+    render_table(meetings, "meetings", descending=False)
 
 
 # ================================================================
@@ -623,4 +855,6 @@ elif page == "Meetings":
 # ================================================================
 elif page == "Policies":
     st.title("Policy Records")
-    st.dataframe(policies, use_container_width=True, height=520)
+    render_table(policies, "policies", descending=False, preview_columns=["Note"])
+
+profiler.render_panel(profiler.finish_rerun())
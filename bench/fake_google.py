@@ -0,0 +1,259 @@
+# bench/fake_google.py
+"""In-memory stand-ins for the Gmail API service and gspread client.
+
+Only the calls the sync uses are implemented: ``users().messages().list/get``
+(with ``format``, ``metadataHeaders`` and ``fields``) and gspread's
+``open_by_key`` / ``worksheet`` / ``add_worksheet`` / ``get_all_values`` /
+``get_all_records`` / ``row_values`` / ``update_cell`` / ``append_rows``. Each call sleeps for ``latency_ms``
+and the Gmail fake counts the JSON bytes it returns, so benchmarks can
+compare round trips and transfer size without network access.
+"""
+import base64
+import json
+import random
+import threading
+import time
+from email.utils import format_datetime
+from datetime import datetime, timedelta, timezone
+
+SUBJECTS = [
+    "Question about registration", "Add/drop deadline", "Internship credit",
+    "Graduation audit", "Course overload request", "Meeting request",
+    "Study abroad credits", "Major change", "Prerequisite override", "Transcript question",
+]
+
+
+def _b64(text):
+    return base64.urlsafe_b64encode(text.encode("utf-8")).decode("ascii")
+
+
+def make_message(i, domain="umd.edu", body_chars=3000, base_time=None):
+    """A Gmail API ``format='full'`` message with text and HTML alternatives."""
+    base_time = base_time or datetime(2025, 10, 1, 9, 0, tzinfo=timezone.utc)
+    sent = base_time + timedelta(minutes=7 * i)
+    text = (f"Hello, this is student {i}. I have a question about my schedule. " * (body_chars // 64 + 1))[:body_chars]
+    html = "<html><body><div style='font-family:Arial'>" + text.replace(". ", ".<br>") + "</div></body></html>"
+    return {
+        "id": f"m{i:06d}",
+        "threadId": f"t{i // 3:06d}",
+        "labelIds": ["INBOX", "UNREAD"],
+        "snippet": text[:120],
+        "historyId": str(100000 + i),
+        "internalDate": str(int(sent.timestamp() * 1000)),
+        "sizeEstimate": len(text) + len(html) + 2000,
+        "payload": {
+            "mimeType": "multipart/alternative",
+            "headers": [
+                {"name": "Received", "value": "from mx.example.org by mx.google.com; " + format_datetime(sent)},
+                {"name": "From", "value": f"Student {i} <student{i % 400}@{domain}>"},
+                {"name": "To", "value": "advisor@umd.edu"},
+                {"name": "Date", "value": format_datetime(sent)},
+                {"name": "Subject", "value": f"{SUBJECTS[i % len(SUBJECTS)]} #{i}"},
+                {"name": "Message-ID", "value": f"<{i}@mail.example.org>"},
+                {"name": "Content-Type", "value": "multipart/alternative; boundary=xyz"},
+            ],
+            "body": {"size": 0},
+            "parts": [
+                {"partId": "0", "mimeType": "text/plain", "filename": "",
+                 "headers": [{"name": "Content-Type", "value": "text/plain; charset=UTF-8"}],
+                 "body": {"size": len(text), "data": _b64(text)}},
+                {"partId": "1", "mimeType": "text/html", "filename": "",
+                 "headers": [{"name": "Content-Type", "value": "text/html; charset=UTF-8"}],
+                 "body": {"size": len(html), "data": _b64(html)}},
+            ],
+        },
+    }
+
+
+def make_mailbox(n, foreign_share=0.3, body_chars=3000, seed=0):
+    """``n`` messages, newest first, with ``foreign_share`` from non-UMD domains."""
+    rng = random.Random(seed)
+    messages = [
+        make_message(i, "gmail.com" if rng.random() < foreign_share else "umd.edu", body_chars)
+        for i in range(n)
+    ]
+    return list(reversed(messages))
+
+
+class _Request:
+    def __init__(self, fn):
+        self._fn = fn
+
+    def execute(self):
+        return self._fn()
+
+
+def _select_parts(payload, keep):
+    out = {k: v for k, v in payload.items() if k in keep}
+    if "parts" in payload and "parts" in keep:
+        out["parts"] = [_select_parts(p, keep) for p in payload["parts"]]
+    return out
+
+
+class FakeGmailService:
+    """Serves ``messages`` (newest first). Thread-safe; one instance can back many "services"."""
+
+    def __init__(self, messages, latency_ms=0):
+        self.mailbox = messages
+        self._by_id = {m["id"]: m for m in messages}
+        self.latency_ms = latency_ms
+        self.bytes_served = 0
+        self.calls = {"list": 0, "get": 0}
+        self._lock = threading.Lock()
+
+    def _respond(self, kind, response):
+        if self.latency_ms:
+            time.sleep(self.latency_ms / 1000)
+        with self._lock:
+            self.calls[kind] += 1
+            self.bytes_served += len(json.dumps(response))
+        return response
+
+    # service.users().messages() chain
+    def users(self):
+        return self
+
+    def messages(self):
+        return self
+
+    def list(self, userId="me", q=None, maxResults=100, pageToken=None):
+        def run():
+            candidates = self.mailbox
+            after = [t for t in (q or "").split() if t.startswith("after:")]
+            if after:
+                cutoff = int(after[-1][len("after:"):]) * 1000
+                candidates = [m for m in candidates if int(m["internalDate"]) > cutoff]
+            start = int(pageToken or 0)
+            page = candidates[start:start + maxResults]
+            response = {"messages": [{"id": m["id"], "threadId": m["threadId"]} for m in page],
+                        "resultSizeEstimate": len(candidates)}
+            if start + maxResults < len(candidates):
+                response["nextPageToken"] = str(start + maxResults)
+            return self._respond("list", response)
+        return _Request(run)
+
+    def get(self, userId="me", id=None, format="full", metadataHeaders=None, fields=None):
+        def run():
+            msg = self._by_id[id]
+            if format == "metadata":
+                wanted = {h.lower() for h in (metadataHeaders or [])}
+                headers = [h for h in msg["payload"]["headers"] if not wanted or h["name"].lower() in wanted]
+                response = {k: msg[k] for k in ("id", "threadId", "labelIds", "snippet", "historyId",
+                                                "internalDate", "sizeEstimate")}
+                response["payload"] = {"mimeType": msg["payload"]["mimeType"], "headers": headers}
+            else:
+                response = json.loads(json.dumps(msg))
+            if fields:
+                # Coarse emulation of a partial response: keep the top-level
+                # fields named in the mask and, for payload(...), the listed keys
+                top = {f.split("(")[0].split("/")[0] for f in _split_fields(fields)}
+                response = {k: v for k, v in response.items() if k in top}
+                if "payload" in response and "payload(" in fields:
+                    inner = fields[fields.index("payload(") + len("payload("):]
+                    keep = {f.split("(")[0].split("/")[0] for f in _split_fields(inner)}
+                    response["payload"] = _select_parts(response["payload"], keep)
+            return self._respond("get", response)
+        return _Request(run)
+
+
+def _split_fields(mask):
+    """Split a fields mask on top-level commas."""
+    out, depth, current = [], 0, ""
+    for ch in mask:
+        if ch == "(":
+            depth += 1
+        elif ch == ")":
+            depth -= 1
+            if depth < 0:
+                break
+        if ch == "," and depth == 0:
+            out.append(current)
+            current = ""
+        else:
+            current += ch
+    if current:
+        out.append(current)
+    return out
+
+
+class WorksheetNotFound(Exception):
+    pass
+
+
+class FakeWorksheet:
+    def __init__(self, title, rows=None, latency_ms=0):
+        self.title = title
+        self.rows = [list(r) for r in (rows or [])]
+        self.latency_ms = latency_ms
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def _wait(self):
+        if self.latency_ms:
+            time.sleep(self.latency_ms / 1000)
+        self.calls += 1
+
+    def get_all_values(self):
+        self._wait()
+        with self._lock:
+            return [list(r) for r in self.rows]
+
+    def get_all_records(self):
+        values = self.get_all_values()
+        if not values:
+            return []
+        header = values[0]
+        return [dict(zip(header, row)) for row in values[1:]]
+
+    def append_rows(self, rows, **kwargs):
+        self._wait()
+        with self._lock:
+            self.rows.extend([list(r) for r in rows])
+
+    def append_row(self, row, **kwargs):
+        self.append_rows([row])
+
+    def row_values(self, row):
+        self._wait()
+        with self._lock:
+            return list(self.rows[row - 1]) if len(self.rows) >= row else []
+
+    def update_cell(self, row, col, value):
+        self._wait()
+        with self._lock:
+            while len(self.rows) < row:
+                self.rows.append([])
+            cells = self.rows[row - 1]
+            cells.extend([""] * (col - len(cells)))
+            cells[col - 1] = value
+
+
+class FakeSpreadsheet:
+    def __init__(self, latency_ms=0):
+        self.latency_ms = latency_ms
+        self.worksheets = {}
+
+    def worksheet(self, title):
+        if title not in self.worksheets:
+            raise WorksheetNotFound(title)
+        return self.worksheets[title]
+
+    def add_worksheet(self, title, rows=1000, cols=10):
+        self.worksheets[title] = FakeWorksheet(title, latency_ms=self.latency_ms)
+        return self.worksheets[title]
+
+
+class FakeSheetsClient:
+    """gspread-like client; every ``open_by_key`` returns the same spreadsheet."""
+
+    def __init__(self, latency_ms=0):
+        self.spreadsheet = FakeSpreadsheet(latency_ms)
+
+    def open_by_key(self, key):
+        return self.spreadsheet
+
+    def add_rows(self, title, rows):
+        """Seed a worksheet (first row is the header)."""
+        ws = self.spreadsheet.worksheets.get(title) or self.spreadsheet.add_worksheet(title)
+        ws.rows.extend([list(r) for r in rows])
+        return ws
@@ -0,0 +1,99 @@
+# bench/import_time.py
+"""Startup-cost benchmark based on ``python -X importtime``.
+
+Imports each target in a fresh interpreter and reports its cumulative
+import time plus the heaviest packages it pulled in. ``app`` is measured by
+replaying only the top-level import statements of app.py (running the
+script itself would start drawing the page).
+
+    python -m bench.import_time
+    python -m bench.import_time --max-ms 1500   # non-zero exit on regression
+"""
+import argparse
+import ast
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+DEFAULT_TARGETS = [
+    "app",
+    "libs.llm_client",
+    "libs.gmail_to_sheets",
+    "libs.gmail_scheduler",
+    "libs.sheets",
+    "libs.nlp",
+    "libs.metrics",
+]
+
+
+def app_import_source(path=os.path.join(ROOT, "app.py")):
+    """Return the module-level import statements of app.py as source."""
+    with open(path, encoding="utf-8") as f:
+        tree = ast.parse(f.read())
+    stmts = [node for node in tree.body if isinstance(node, (ast.Import, ast.ImportFrom))]
+    return "\n".join(ast.unparse(node) for node in stmts)
+
+
+def measure(target, repeat=3):
+    """Return (best_total_us, {root_package: self_us}) over ``repeat`` cold runs."""
+    code = app_import_source() if target == "app" else f"import {target}"
+    best_total, best_packages = None, {}
+    for _ in range(repeat):
+        proc = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", code],
+            cwd=ROOT, capture_output=True, text=True,
+        )
+        if proc.returncode != 0:
+            raise RuntimeError(f"Importing {target} failed:\n{proc.stderr.strip().splitlines()[-1]}")
+        packages = {}
+        total = 0
+        for line in proc.stderr.splitlines():
+            if not line.startswith("import time:") or "cumulative" in line:
+                continue
+            self_us, cumulative, raw_name = line[len("import time:"):].split("|")
+            name = raw_name.strip()
+            # Self time is attributed to the root package (pandas.core.frame -> pandas)
+            root = name.split(".")[0]
+            packages[root] = packages.get(root, 0) + int(self_us)
+            # Top-level entries (single space of indentation) sum to the total import cost
+            if not raw_name.startswith("  "):
+                total += int(cumulative)
+        if best_total is None or total < best_total:
+            best_total, best_packages = total, packages
+    return best_total, best_packages
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("targets", nargs="*", default=DEFAULT_TARGETS)
+    parser.add_argument("--repeat", type=int, default=3, help="Cold runs per target (best is reported)")
+    parser.add_argument("--top", type=int, default=5, help="Heaviest top-level packages to list")
+    parser.add_argument("--max-ms", type=float, default=None,
+                        help="Fail (exit 1) if any target exceeds this import budget")
+    args = parser.parse_args(argv)
+
+    over_budget = False
+    for target in args.targets:
+        try:
+            total_us, packages = measure(target, args.repeat)
+        except RuntimeError as e:
+            print(f"✗ {e}")
+            over_budget = True
+            continue
+        heaviest = sorted(packages.items(), key=lambda kv: kv[1], reverse=True)[:args.top]
+        print(f"{target:<24} {total_us / 1000:>9.1f} ms")
+        for name, us in heaviest:
+            print(f"    {name:<32} {us / 1000:>9.1f} ms")
+        if args.max_ms is not None and total_us / 1000 > args.max_ms:
+            over_budget = True
+
+    if over_budget:
+        print("✗ Import-time budget exceeded (or an import failed)")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
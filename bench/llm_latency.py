@@ -0,0 +1,151 @@
+# bench/llm_latency.py
+"""Latency/throughput benchmark for libs/llm_client.py against libs/fake_llm.py.
+
+Runs skeleton generation and fact-checking at several concurrency levels
+and reports p50/p95/p99 latency and throughput. Nothing leaves the machine.
+
+    python -m bench.llm_latency --latency-ms 200 --concurrency 1 4 16
+    python -m bench.llm_latency --stream --max-p95-ms 800   # non-zero exit on regression
+
+The client is built with ``max_retries=0`` so every call is one request and
+failures are counted, not hidden behind SDK retries. The run fails when a
+level's error rate is above ``--max-error-rate`` or no call succeeded.
+"""
+import argparse
+import math
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from libs.fake_llm import FakeLLMServer, CANNED_SKELETON  # noqa: E402
+
+SAMPLE_EMAIL = (
+    "Hi, I have a registration hold on my account and can't add INST 627. "
+    "The add/drop deadline is Friday, can you help me clear it asap? Thanks, Sam"
+)
+SAMPLE_DRAFT = (
+    "Hi Sam,\nThe hold was placed by the bursar's office. Please pay the balance "
+    "and email me once it clears so we can add INST 627 before Friday.\nRegards"
+)
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of a list of numbers."""
+    if not values:
+        return float("nan")
+    ordered = sorted(values)
+    rank = max(0, min(len(ordered) - 1, int(round(pct / 100.0 * len(ordered) + 0.5)) - 1))
+    return ordered[rank]
+
+
+def _timed(fn):
+    start = time.perf_counter()
+    fn()
+    return time.perf_counter() - start
+
+
+def run_level(fn, concurrency, requests):
+    """Run ``requests`` calls of ``fn`` on ``concurrency`` threads."""
+    errors = 0
+    latencies = []
+
+    def one(_):
+        try:
+            return _timed(fn)
+        except Exception:
+            return None
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for result in pool.map(one, range(requests)):
+            if result is None:
+                errors += 1
+            else:
+                latencies.append(result)
+    wall = time.perf_counter() - start
+    return {
+        "concurrency": concurrency,
+        "requests": requests,
+        "errors": errors,
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p95_ms": percentile(latencies, 95) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+        "throughput_rps": len(latencies) / wall if wall else 0.0,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--requests", type=int, default=64, help="Calls per concurrency level")
+    parser.add_argument("--latency-ms", type=float, default=150)
+    parser.add_argument("--jitter-ms", type=float, default=50)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--stream", action="store_true", help="Also measure time-to-first-chunk when streaming")
+    parser.add_argument("--max-p95-ms", type=float, default=None,
+                        help="Fail (exit 1) if any p95 exceeds this budget")
+    parser.add_argument("--max-error-rate", type=float, default=0.0,
+                        help="Fail (exit 1) if any level has a larger share of failed calls")
+    args = parser.parse_args(argv)
+
+    server = FakeLLMServer(latency_ms=args.latency_ms, jitter_ms=args.jitter_ms,
+                           chunk_delay_ms=5, error_rate=args.error_rate, seed=0).start()
+    os.environ.setdefault("GROQ_API_KEY", "fake-key")
+    os.environ["GROQ_BASE_URL"] = server.base_url
+    os.environ["GROQ_MAX_RETRIES"] = "0"
+
+    from libs import llm_client
+
+    skeleton_text = str(CANNED_SKELETON)
+    scenarios = {
+        "skeleton": lambda: llm_client.generate_email_skeleton(SAMPLE_EMAIL, "Sam Terp"),
+        "skeleton_json": lambda: llm_client.generate_email_skeleton_structured(SAMPLE_EMAIL, "Sam Terp"),
+        "fact_check": lambda: llm_client.fact_check_draft(SAMPLE_DRAFT, skeleton_text, SAMPLE_EMAIL),
+    }
+    if args.stream:
+        def first_chunk():
+            stream = llm_client.get_client().chat.completions.create(
+                model=llm_client.GROQ_MODEL,
+                messages=[{"role": "user", "content": SAMPLE_EMAIL}],
+                stream=True,
+            )
+            for _ in stream:
+                break
+            stream.response.close()
+        scenarios["stream_ttfc"] = first_chunk
+
+    print(f"Fake LLM at {server.base_url} (latency {args.latency_ms}±{args.jitter_ms} ms, "
+          f"error rate {args.error_rate:.0%})")
+    print(f"{'scenario':<14} {'conc':>5} {'reqs':>5} {'err':>4} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'req/s':>8}")
+
+    failures = []
+    try:
+        for name, fn in scenarios.items():
+            for level in args.concurrency:
+                r = run_level(fn, level, args.requests)
+                print(f"{name:<14} {r['concurrency']:>5} {r['requests']:>5} {r['errors']:>4} "
+                      f"{r['p50_ms']:>8.1f} {r['p95_ms']:>8.1f} {r['p99_ms']:>8.1f} {r['throughput_rps']:>8.1f}")
+                where = f"{name} at concurrency {level}"
+                if math.isnan(r["p95_ms"]):
+                    failures.append(f"{where}: every call failed")
+                elif args.max_p95_ms is not None and r["p95_ms"] > args.max_p95_ms:
+                    failures.append(f"{where}: p95 {r['p95_ms']:.1f} ms exceeded budget of {args.max_p95_ms} ms")
+                if r["errors"] / r["requests"] > args.max_error_rate:
+                    failures.append(f"{where}: {r['errors']}/{r['requests']} calls failed "
+                                    f"(--max-error-rate {args.max_error_rate:g})")
+    finally:
+        server.stop()
+
+    print(f"Server handled {server.request_count} requests ({server.error_count} injected errors)")
+    for failure in failures:
+        print(f"✗ {failure}")
+    if failures:
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
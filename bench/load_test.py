@@ -0,0 +1,314 @@
+# bench/load_test.py
+"""Multi-session load test of the dashboard with local fake backends.
+
+Drives app.py headlessly with Streamlit's AppTest: ``--sessions``
+simulated advisors run concurrently, each loading the home page and then
+clicking through "Generate AI Skeleton", the Emails, Students, Meetings and
+Policies pages and back. Google Sheets (libs/sheets.py, libs/llm_client.py),
+the Gmail API (the background sync) and Groq are replaced by in-process
+fakes with configurable latency (bench/fake_google.py, libs/fake_llm.py),
+filled with synthetic students and emails. Reports rerun latency
+percentiles per action, memory per session and backend calls per rerun.
+
+    python -m bench.load_test
+    python -m bench.load_test --sessions 50 --reruns 6 --sheets-latency-ms 80 --llm-latency-ms 400
+    python -m bench.load_test --max-p95-ms 3000      # exits 1 on regression (CI gate)
+"""
+import argparse
+import contextlib
+import io
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+import numpy as np
+
+APP_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app.py")
+SHEET_ID = "load-test"
+
+PROGRAMS = ["Computer Science", "Information Science", "Data Science"]
+TERMS = ["F25", "S26", "F26", "S27"]
+SUBJECTS = [
+    "Registration hold", "Add/drop deadline", "Internship credit", "Graduation audit",
+    "Course overload request", "Meeting request", "Prerequisite override", "Transcript question",
+]
+BODIES = [
+    "Hi, I have a question about my schedule for next semester and which electives count.",
+    "Hello, I need to drop a class before the deadline, please reply by tomorrow. It is urgent!",
+    "Good morning, could we meet this week to go over my graduation audit? Thank you.",
+    "Hi, there is a hold on my account and I can't register, can you help asap?",
+]
+# Pages visited after the first load, in order (the skeleton click happens on the home page)
+ACTIONS = ["skeleton", "Emails", "Students", "Meetings", "Policies", "Home Dashboard"]
+
+
+# --- synthetic data -----------------------------------------------------------
+def make_sheets(students, emails, seed=0):
+    """Worksheet rows (header first) for the sheets the dashboard reads."""
+    from libs.gmail_to_sheets import EMAIL_SHEET_HEADERS
+    from libs.llm_client import DRAFTS_HEADERS
+
+    rng = random.Random(seed)
+    people = [(f"Student {i}", str(110000000 + i), f"student{i}@umd.edu") for i in range(students)]
+    sheets = {
+        "Student Case": [["Student", "UID", "Program", "GPA", "Earned Credits", "Predicted Graduation"]] + [
+            [name, uid, rng.choice(PROGRAMS), f"{rng.uniform(1.8, 4.0):.2f}", str(rng.randint(0, 120)),
+             rng.choice(TERMS)]
+            for name, uid, _ in people
+        ],
+        "Academic Policy": [["Student", "UID", "Probation", "Registration Block", "Note"]] + [
+            [name, uid, "Yes" if rng.random() < 0.5 else "", "Yes" if rng.random() < 0.5 else "", "Review"]
+            for name, uid, _ in people if rng.random() < 0.08
+        ],
+        "Meetings": [["Student", "UID", "Date", "Time", "Topic"]] + [
+            [name, uid, (datetime.now() + timedelta(days=rng.randint(0, 6))).strftime("%Y-%m-%d"),
+             f"{rng.randint(9, 16)}:00", rng.choice(SUBJECTS)]
+            for name, uid, _ in rng.sample(people, min(len(people), 40))
+        ],
+        "drafts": [DRAFTS_HEADERS],
+    }
+    now = datetime.now()
+    rows = []
+    for i in range(emails):
+        name, uid, address = people[rng.randrange(len(people))]
+        # A few messages a day for the last year, bunched into threads of ~3
+        sent = now - timedelta(hours=(emails - i) * 365 * 24 / max(emails, 1), minutes=rng.randint(0, 59))
+        thread = i // 3
+        body = (BODIES[rng.randrange(len(BODIES))] + " ") * rng.randint(2, 8)
+        rows.append(dict(zip(EMAIL_SHEET_HEADERS, [
+            name, address, uid, sent.strftime("%H:%M:%S"), sent.strftime("%Y-%m-%d"),
+            f"{SUBJECTS[thread % len(SUBJECTS)]} #{thread}", body.strip(), f"m{i:07d}", f"t{thread:07d}",
+        ])))
+    sheets["Email"] = [EMAIL_SHEET_HEADERS] + [[r[h] for h in EMAIL_SHEET_HEADERS] for r in rows]
+    return sheets
+
+
+# --- fake backends --------------------------------------------------------------
+class Backends:
+    """The fakes, patched into the modules the app uses, with call counters."""
+
+    def __init__(self, args):
+        from bench.fake_google import FakeGmailService, FakeSheetsClient, make_mailbox
+        from libs.fake_llm import FakeLLMServer
+
+        self.sheets = FakeSheetsClient(latency_ms=args.sheets_latency_ms)
+        for title, rows in make_sheets(args.students, args.emails, seed=args.seed).items():
+            self.sheets.add_rows(title, rows)
+        self.gmail = FakeGmailService(make_mailbox(args.mailbox, body_chars=1500, seed=args.seed),
+                                      latency_ms=args.gmail_latency_ms)
+        self.llm = FakeLLMServer(latency_ms=args.llm_latency_ms, seed=args.seed).start()
+        self.sync = not args.no_sync
+
+    def install(self, state_dir):
+        import libs.gmail_scheduler as gmail_scheduler
+        import libs.llm_client as llm_client
+        import libs.sheets as sheets
+
+        os.environ["GROQ_API_KEY"] = "fake"
+        os.environ["GROQ_BASE_URL"] = self.llm.base_url
+        sheets.get_gspread_client = lambda: self.sheets
+        llm_client._get_gspread_client = lambda: self.sheets
+        gmail_scheduler.get_gmail_credentials = lambda *args: None
+        gmail_scheduler.build_gmail_service = lambda creds: self.gmail
+        gmail_scheduler.authenticate_sheets = lambda: self.sheets
+        if self.sync:
+            gmail_scheduler._scheduler = gmail_scheduler.GmailSyncScheduler(
+                sheet_name="Email", name="load-test", sheet_id=SHEET_ID,
+                checkpoint_path=os.path.join(state_dir, "load-test.json"),
+            )
+        else:
+            os.environ["GMAIL_SYNC_MODE"] = "worker"
+
+    def counts(self):
+        return {
+            "sheets": sum(ws.calls for ws in self.sheets.spreadsheet.worksheets.values()),
+            "llm": self.llm.request_count,
+            "gmail": sum(self.gmail.calls.values()),
+        }
+
+    def stop(self):
+        self.llm.stop()
+
+
+def _isolate(state_dir):
+    """Keep every local store of the run (content, rollups, spool, worker state) in ``state_dir``."""
+    for name, filename in (("EMAIL_CONTENT_PATH", "content.sqlite3"), ("EMAIL_ROLLUPS_PATH", "rollups.sqlite3"),
+                           ("SHEETS_SPOOL_PATH", "sheets_writes.sqlite3"), ("GMAIL_SYNC_STATE_DIR", "worker"),
+                           ("DASHBOARD_PROFILE_DIR", "profiles")):
+        os.environ[name] = os.path.join(state_dir, filename)
+
+
+# --- sessions -------------------------------------------------------------------
+def rss_mb():
+    """Resident set size of this process in MB."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except (OSError, ValueError):
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def serialize_script_compiles():
+    """Compile app.py in one thread at a time. Every AppTest run compiles the script,
+    and CPython before 3.11.8 can fail compiling in several threads at once
+    ("AST constructor recursion depth mismatch")."""
+    import threading
+
+    from streamlit.runtime.scriptrunner.script_cache import ScriptCache
+
+    if sys.version_info >= (3, 11, 8) or getattr(ScriptCache, "_serialized", False):
+        return
+    lock = threading.Lock()
+    get_bytecode = ScriptCache.get_bytecode
+
+    def serialized(self, script_path):
+        with lock:
+            return get_bytecode(self, script_path)
+
+    ScriptCache.get_bytecode = serialized
+    ScriptCache._serialized = True
+
+
+def install_secrets():
+    """Process-wide secrets for every session. AppTest.secrets would swap the global
+    ``st.secrets`` on each run and restore it afterwards, racing with the other sessions."""
+    import streamlit as st
+    from streamlit.runtime.secrets import Secrets
+
+    secrets = Secrets()
+    secrets._secrets = {"SHEET_ID": SHEET_ID, "ADVISOR_NAME": "Load Test"}
+    st.secrets = secrets
+
+
+class Session:
+    def __init__(self, timeout):
+        from streamlit.testing.v1 import AppTest
+
+        self.at = AppTest.from_file(APP_PATH, default_timeout=timeout)
+        self.samples = []      # (action, ms, ok)
+
+    def _step(self, action):
+        at = self.at
+        if action == "load":
+            at.run()
+        elif action == "skeleton":
+            buttons = [b for b in at.button if (b.key or "").startswith("skeleton_btn_")]
+            (buttons[0].click() if buttons else at).run()
+        else:
+            at.sidebar.radio[0].set_value(action).run()
+
+    def run(self, reruns, think_ms=0):
+        for i in range(reruns + 1):
+            action = "load" if i == 0 else ACTIONS[(i - 1) % len(ACTIONS)]
+            start = time.perf_counter()
+            try:
+                self._step(action)
+                ok = not self.at.exception
+            except Exception:
+                ok = False
+            self.samples.append((action, (time.perf_counter() - start) * 1000, ok))
+            if think_ms:
+                time.sleep(think_ms / 1000)
+        return self
+
+
+def percentiles(values):
+    values = np.asarray(values, dtype=float)
+    if not len(values):
+        return {"n": 0, "p50": float("nan"), "p90": float("nan"), "p95": float("nan"), "p99": float("nan"),
+                "max": float("nan")}
+    return {"n": len(values), "p50": np.percentile(values, 50), "p90": np.percentile(values, 90),
+            "p95": np.percentile(values, 95), "p99": np.percentile(values, 99), "max": values.max()}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", type=int, default=10, help="Concurrent simulated advisors")
+    parser.add_argument("--reruns", type=int, default=6, help="Interactions per session after the first load")
+    parser.add_argument("--think-ms", type=float, default=0, help="Pause between a session's interactions")
+    parser.add_argument("--students", type=int, default=500)
+    parser.add_argument("--emails", type=int, default=5000, help="Rows in the Email sheet")
+    parser.add_argument("--mailbox", type=int, default=200, help="Messages in the fake Gmail inbox")
+    parser.add_argument("--sheets-latency-ms", type=float, default=50)
+    parser.add_argument("--gmail-latency-ms", type=float, default=20)
+    parser.add_argument("--llm-latency-ms", type=float, default=300)
+    parser.add_argument("--no-sync", action="store_true", help="Do not run the background Gmail sync")
+    parser.add_argument("--timeout", type=float, default=120, help="Seconds allowed per rerun")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--max-p95-ms", type=float, default=None, help="Exit 1 if the rerun p95 is above this")
+    parser.add_argument("--verbose", action="store_true", help="Show the app's and the sync's output")
+    args = parser.parse_args(argv)
+
+    state_dir = tempfile.mkdtemp(prefix="dashboard-load-")
+    _isolate(state_dir)
+    backends = Backends(args)
+    backends.install(state_dir)
+    quiet = contextlib.nullcontext() if args.verbose else contextlib.redirect_stdout(io.StringIO())
+
+    try:
+        with quiet:
+            # One session first: imports, caches and the singletons are shared process-wide
+            serialize_script_compiles()
+            install_secrets()
+            warm_start = time.perf_counter()
+            Session(args.timeout).run(0)
+            warm_ms = (time.perf_counter() - warm_start) * 1000
+            before_calls, before_rss = backends.counts(), rss_mb()
+            warm_calls = dict(before_calls)
+
+            start = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=args.sessions) as pool:
+                sessions = list(pool.map(lambda _: Session(args.timeout).run(args.reruns, args.think_ms),
+                                         range(args.sessions)))
+            wall = time.perf_counter() - start
+            after_calls, after_rss = backends.counts(), rss_mb()
+    finally:
+        backends.stop()
+        shutil.rmtree(state_dir, ignore_errors=True)
+
+    samples = [s for session in sessions for s in session.samples]
+    failed = sum(1 for _, _, ok in samples if not ok)
+    reruns = len(samples)
+    print(f"{args.sessions} sessions × {args.reruns + 1} reruns, {args.students} students, "
+          f"{args.emails} emails; latency sheets {args.sheets_latency_ms:g} ms, "
+          f"gmail {args.gmail_latency_ms:g} ms, llm {args.llm_latency_ms:g} ms")
+    print(f"warm-up session (imports, cold caches): {warm_ms:.0f} ms")
+    print(f"{reruns} reruns in {wall:.1f} s ({reruns / wall:.1f} reruns/s), {failed} failed\n")
+
+    print(f"{'action':<16}{'n':>6}{'p50':>10}{'p90':>10}{'p95':>10}{'p99':>10}{'max':>10}   ms")
+    by_action = {}
+    for action, ms, _ in samples:
+        by_action.setdefault(action, []).append(ms)
+    for action in ["load"] + ACTIONS + ["all"]:
+        values = [ms for _, ms, _ in samples] if action == "all" else by_action.get(action)
+        if values:
+            p = percentiles(values)
+            print(f"{action:<16}{p['n']:>6}{p['p50']:>10.0f}{p['p90']:>10.0f}{p['p95']:>10.0f}"
+                  f"{p['p99']:>10.0f}{p['max']:>10.0f}")
+
+    print(f"\nmemory: {after_rss:.0f} MB RSS, {(after_rss - before_rss) / max(args.sessions, 1):.1f} MB per session")
+    calls = {k: after_calls[k] - before_calls[k] for k in after_calls}
+    print("backend calls per rerun: " + ", ".join(f"{k} {v / max(reruns, 1):.2f} ({v} total)"
+                                                  for k, v in calls.items()))
+    print("warm-up backend calls (cold caches, first sync): " + ", ".join(f"{k} {v}" for k, v in warm_calls.items()))
+    print(f"gmail bytes served: {backends.gmail.bytes_served / 2**20:.1f} MB")
+
+    status = 0
+    if failed:
+        print(f"✗ {failed} reruns raised an exception")
+        status = 1
+    p95 = percentiles([ms for _, ms, _ in samples])["p95"]
+    if args.max_p95_ms is not None and p95 > args.max_p95_ms:
+        print(f"✗ rerun p95 {p95:.0f} ms is above --max-p95-ms {args.max_p95_ms:g}")
+        status = 1
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,106 @@
+# bench/mime_body.py
+"""Body-extraction cost on large messages: full decode vs libs/mime_text.
+
+The baseline is the previous ``get_email_body`` (decode every candidate
+part in full, then cut to 2000 characters), which returned raw HTML for
+HTML-only mail; "legacy+strip" adds converting that full HTML to text.
+Messages are an HTML-only newsletter with inline images and a plain/HTML
+alternative pair.
+
+    python -m bench.mime_body
+    python -m bench.mime_body --html-kib 2048 --images 8 --repeat 20
+"""
+import argparse
+import base64
+import sys
+import time
+
+from libs.mime_text import extract_body_text, html_to_text
+
+
+def legacy_get_email_body(payload):
+    body = ""
+    if 'parts' in payload:
+        for part in payload['parts']:
+            if part['mimeType'] == 'text/plain':
+                if 'data' in part['body']:
+                    body = base64.urlsafe_b64decode(part['body']['data']).decode('utf-8', errors='ignore')
+                    break
+            elif part['mimeType'] == 'text/html' and not body:
+                if 'data' in part['body']:
+                    body = base64.urlsafe_b64decode(part['body']['data']).decode('utf-8', errors='ignore')
+            elif 'parts' in part:
+                nested_body = legacy_get_email_body(part)
+                if nested_body:
+                    body = nested_body
+                    break
+    else:
+        if 'body' in payload and 'data' in payload['body']:
+            body = base64.urlsafe_b64decode(payload['body']['data']).decode('utf-8', errors='ignore')
+    return body.strip()
+
+
+def legacy_then_strip(payload):
+    body = legacy_get_email_body(payload)
+    return html_to_text(body) if body.startswith("<") else body
+
+
+def _part(mime, raw, filename=""):
+    return {"mimeType": mime, "filename": filename,
+            "body": {"size": len(raw), "data": base64.urlsafe_b64encode(raw).decode("ascii")}}
+
+
+def newsletter(html_kib, images):
+    block = ("<div class='story'><h2>Campus news &amp; updates</h2><p>Registration opens next week. "
+             "See the <a href='https://umd.edu'>advising page</a> for details.</p></div>\n")
+    html = ("<html><head><style>.story{margin:4px}</style></head><body>"
+            + block * (html_kib * 1024 // len(block)) + "</body></html>").encode()
+    image = bytes(range(256)) * 1024  # 256 KiB
+    related = [_part("text/html", html)] + [_part("image/png", image, f"img{i}.png") for i in range(images)]
+    return {"mimeType": "multipart/related", "parts": related}
+
+
+def alternative(text_kib):
+    text = ("Hi, I have a question about my degree audit and course load. " * (text_kib * 16)).encode()
+    html = b"<html><body><p>" + text + b"</p></body></html>"
+    return {"mimeType": "multipart/alternative", "parts": [_part("text/plain", text), _part("text/html", html)]}
+
+
+def timed(fn, payload, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(payload)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--html-kib", type=int, default=1024)
+    parser.add_argument("--images", type=int, default=4)
+    parser.add_argument("--text-kib", type=int, default=512)
+    parser.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args(argv)
+
+    cases = {
+        "html newsletter": newsletter(args.html_kib, args.images),
+        "plain+html": alternative(args.text_kib),
+    }
+    print(f"{'message':<18} {'legacy ms':>10} {'legacy+strip':>13} {'bounded ms':>11} {'speedup':>8}")
+    for name, payload in cases.items():
+        legacy = timed(lambda p: legacy_get_email_body(p)[:2000], payload, args.repeat)
+        stripped = timed(lambda p: legacy_then_strip(p)[:2000], payload, args.repeat)
+        bounded = timed(lambda p: extract_body_text(p, 2000), payload, args.repeat)
+        print(f"{name:<18} {legacy * 1000:>10.2f} {stripped * 1000:>13.2f} {bounded * 1000:>11.2f} "
+              f"{stripped / bounded:>7.0f}x")
+    sample = extract_body_text(cases["html newsletter"], 2000)
+    if "<" in sample or len(sample) > 2000:
+        print("✗ HTML was not converted to bounded text")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,160 @@
+# bench/nlp.py
+"""Throughput and golden-output checks for the rules in libs/nlp.py.
+
+Times ``classify_topic``, ``detect_urgency``, ``detect_sender_type`` and
+``_extract_candidate_deadlines`` over a synthetic corpus
+(bench/nlp_corpus.py) and reports emails/sec, then compares every result
+on the golden corpus with bench/nlp_golden.json. Deadlines and urgency
+are computed with ``now=FROZEN_NOW`` so relative phrases ("tomorrow",
+"by Friday") resolve the same way on every run.
+
+Speed is also reported relative to a fixed reference pass over the same
+corpus (lower-casing and splitting each text), which cancels out how fast
+the machine is. Exits 1 when an output differs from the golden file
+(accuracy drift) or when a function's relative cost grew by more than
+``--max-regression`` over the committed bench/nlp_baseline.json.
+
+    python -m bench.nlp                    # CI gate: golden outputs + relative cost
+    python -m bench.nlp --save-baseline bench/nlp_baseline.json   # after an intended speed change
+    python -m bench.nlp --update-golden    # after an intended change to the rules
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from datetime import datetime
+
+import libs.nlp as nlp
+from bench.nlp_corpus import make_corpus
+
+GOLDEN_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "nlp_golden.json")
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "nlp_baseline.json")
+GOLDEN_EMAILS = 400
+GOLDEN_SEED = 1234
+# A Wednesday morning
+FROZEN_NOW = datetime(2025, 10, 1, 9, 30)
+
+
+def _deadlines(text):
+    return [d.isoformat() for d in nlp._extract_candidate_deadlines((text or "").lower(), now=FROZEN_NOW)]
+
+
+FUNCTIONS = {
+    "classify_topic": lambda email: nlp.classify_topic(email["text"]),
+    "detect_urgency": lambda email: nlp.detect_urgency(email["text"], now=FROZEN_NOW),
+    "detect_sender_type": lambda email: nlp.detect_sender_type(email["email"]),
+    "extract_deadlines": lambda email: _deadlines(email["text"]),
+}
+
+
+# Plain string work over the same text: the unit relative costs are measured in
+def _reference(email):
+    return email["text"].lower().split()
+
+
+def outputs(corpus):
+    """{function: [result per email]} at ``FROZEN_NOW``."""
+    return {name: [fn(email) for email in corpus] for name, fn in FUNCTIONS.items()}
+
+
+def throughput(corpus, repeat=3):
+    """{function: emails/sec} (plus "reference"), best of ``repeat`` passes."""
+    rates = {}
+    for name, fn in {**FUNCTIONS, "reference": _reference}.items():
+        best = float("inf")
+        for _ in range(repeat):
+            start = time.perf_counter()
+            for email in corpus:
+                fn(email)
+            best = min(best, time.perf_counter() - start)
+        rates[name] = len(corpus) / best if best > 0 else float("inf")
+    return rates
+
+
+def check_golden(results, golden, show=3):
+    """Number of outputs that differ from ``golden``; prints the first few per function."""
+    corpus = make_corpus(GOLDEN_EMAILS, GOLDEN_SEED)
+    mismatches = 0
+    for name, expected in golden["outputs"].items():
+        got = results.get(name, [])
+        diff = [i for i, (a, b) in enumerate(zip(got, expected)) if a != b]
+        diff += list(range(min(len(got), len(expected)), max(len(got), len(expected))))
+        mismatches += len(diff)
+        status = "✓" if not diff else "✗"
+        print(f"  {status} {name:<20} {len(expected) - len(diff)}/{len(expected)} match golden")
+        for i in diff[:show]:
+            snippet = corpus[i]["text"][:90].replace("\n", " ") if i < len(corpus) else ""
+            print(f"      #{i}: expected {expected[i] if i < len(expected) else None!r}, "
+                  f"got {got[i] if i < len(got) else None!r} — {snippet!r}")
+    return mismatches
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--emails", type=int, default=5000, help="Corpus size for the throughput runs")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--quoted-share", type=float, default=0.3)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--baseline", default=BASELINE_PATH,
+                        help="JSON from --save-baseline to compare relative costs against ('' to skip)")
+    parser.add_argument("--max-regression", type=float, default=0.5,
+                        help="Allowed growth of a function's cost relative to the reference pass (0.5 = 50%%)")
+    parser.add_argument("--save-baseline", help="Write this run's relative costs and emails/sec to a JSON file")
+    parser.add_argument("--update-golden", action="store_true", help="Rewrite bench/nlp_golden.json")
+    args = parser.parse_args(argv)
+
+    golden_results = outputs(make_corpus(GOLDEN_EMAILS, GOLDEN_SEED))
+    if args.update_golden:
+        with open(GOLDEN_PATH, "w") as f:
+            json.dump({"emails": GOLDEN_EMAILS, "seed": GOLDEN_SEED, "now": FROZEN_NOW.isoformat(),
+                       "outputs": golden_results}, f, indent=0)
+            f.write("\n")
+        print(f"✓ wrote {GOLDEN_PATH}")
+        return 0
+
+    corpus = make_corpus(args.emails, args.seed, args.quoted_share)
+    chars = sum(len(e["text"]) for e in corpus)
+    print(f"{len(corpus)} emails, {chars / len(corpus):.0f} chars on average, now={FROZEN_NOW}")
+    rates = throughput(corpus, args.repeat)
+    # µs per email of each function over µs per email of the reference pass
+    relative = {name: rates["reference"] / rate for name, rate in rates.items() if name != "reference"}
+    baseline = None
+    if args.baseline and not args.save_baseline:
+        if os.path.exists(args.baseline):
+            with open(args.baseline) as f:
+                baseline = json.load(f)["relative_cost"]
+        else:
+            print(f"  (no baseline at {args.baseline}; skipping the regression check)")
+    status = 0
+    for name, rate in rates.items():
+        line = f"  {name:<20} {rate:12,.0f} emails/s {1e6 / rate:10.1f} µs/email"
+        if name in relative:
+            line += f" {relative[name]:8.2f}× reference"
+        if baseline and name in baseline:
+            change = relative[name] / baseline[name] - 1
+            line += f"   {change:+.0%} vs baseline"
+            if change > args.max_regression:
+                line += "  ✗ regression"
+                status = 1
+        print(line)
+    if args.save_baseline:
+        with open(args.save_baseline, "w") as f:
+            json.dump({"emails": len(corpus), "seed": args.seed, "relative_cost": relative,
+                       "emails_per_sec": rates}, f, indent=2)
+            f.write("\n")
+        print(f"  saved to {args.save_baseline}")
+
+    print(f"golden outputs ({GOLDEN_EMAILS} emails, seed {GOLDEN_SEED}):")
+    if not os.path.exists(GOLDEN_PATH):
+        print(f"  ✗ {GOLDEN_PATH} is missing; create it with --update-golden")
+        return 1
+    with open(GOLDEN_PATH) as f:
+        golden = json.load(f)
+    if check_golden(golden_results, golden):
+        status = 1
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,110 @@
+# bench/nlp_corpus.py
+"""Synthetic advisor emails for exercising the rules in libs/nlp.py.
+
+Each email is put together from a greeting, one or two request sentences
+(with or without topic keywords), an optional urgency phrase, an optional
+deadline (relative words, weekdays, "by/before/due/deadline/on" phrases
+with dates and times), emphasis, a signature and, for a share of the mail,
+a long quoted reply chain. Senders mix UMD students, other .edu staff and
+outside addresses. The corpus is fully determined by ``seed``.
+
+    python -m bench.nlp_corpus --emails 10000 > corpus.jsonl
+"""
+import argparse
+import json
+import random
+import sys
+
+FIRST_NAMES = ["Sam", "Priya", "Jordan", "Wei", "Maria", "Alex", "Fatima", "Chris", "Dana", "Kwame"]
+REQUESTS = [
+    # Topic keywords from libs/nlp.py TOPIC_KEYWORDS, and some requests without any
+    "I am trying to register for INST 627 but the system will not let me enroll.",
+    "Could you help me add course INST 414 to my schedule?",
+    "I would like some advice on which electives to take next term.",
+    "Can my advisor review my plan before I commit to a minor?",
+    "I want to make sure I meet the graduation requirements for the spring.",
+    "Could you run a degree audit for me? I think I am missing a credit.",
+    "Is it possible to book an appointment with you to talk about my plan?",
+    "I have a hold on my account and I can't see my classes.",
+    "There is a registration block on my record from the bursar.",
+    "I am writing about the internship I found over the summer.",
+    "My professor asked me to check with you about the lab section.",
+    "I wanted to share an update about my study abroad application.",
+    "Do you know who approves transfer credit from community college?",
+]
+URGENCY = {
+    "high": ["This is urgent.", "Please get back to me asap.", "I need this resolved today.",
+             "It is time-sensitive because of my visa.", "This is critical for my financial aid."],
+    "medium": ["I would appreciate an answer soon.", "Could we talk this week?", "Maybe next week works?",
+               "This is a priority for me."],
+    "low": ["No rush at all.", "Just checking in.", "FYI, nothing needed from you.", "Reply whenever is fine."],
+}
+DEADLINES = [
+    "The form is due tomorrow.", "I need it by tomorrow afternoon.", "The add/drop deadline is Friday.",
+    "Can you sign it before Monday?", "It is due on October 15.", "The deadline is November 1st at 5pm.",
+    "Please send it by 3pm.", "The office closes at end of day.", "I have to submit it by 12/03/2025.",
+    "Is there a meeting on Thursday?", "My registration window opens on Tuesday morning.",
+    "I need a decision before the 20th.", "The petition is due by next Wednesday.",
+]
+SIGNATURES = ["Thanks,\n{name}", "Best regards,\n{name}\nUID 11{uid}", "Thank you so much!\n{name}", "-- {name}"]
+QUOTED_LINES = [
+    "Thanks for reaching out. Let me look into this and get back to you.",
+    "Please remember to bring your unofficial transcript to the appointment.",
+    "The registrar's office can also help with questions about holds.",
+    "You can find the four-year plans on the department website.",
+    "Let me know if you have any other questions about the requirements.",
+]
+DOMAINS = [("umd.edu", 0.6), ("terpmail.umd.edu", 0.1), ("cs.jhu.edu", 0.1), ("gmail.com", 0.2)]
+
+
+def _sender(rng, name):
+    r, total = rng.random(), 0.0
+    for domain, share in DOMAINS:
+        total += share
+        if r < total:
+            return f"{name.lower()}{rng.randint(1, 999)}@{domain}"
+    return f"{name.lower()}@example.com"
+
+
+def _quoted(rng, lines):
+    header = f"On Mon, Sep {rng.randint(1, 28)}, 2025 at 10:{rng.randint(10, 59)} AM Advisor <advisor@umd.edu> wrote:"
+    return "\n\n" + header + "\n" + "\n".join("> " + rng.choice(QUOTED_LINES) for _ in range(lines))
+
+
+def make_email(rng, quoted_share=0.3, quoted_lines=(20, 200)):
+    """One synthetic email: {"email": sender address, "text": body}."""
+    name = rng.choice(FIRST_NAMES)
+    parts = [rng.choice(["Hi,", "Hello Dr. Smith,", "Good morning,", "Dear advisor,", "Hey"])]
+    parts += rng.sample(REQUESTS, rng.randint(1, 2))
+    if rng.random() < 0.6:
+        parts.append(rng.choice(URGENCY[rng.choice(list(URGENCY))]))
+    if rng.random() < 0.5:
+        parts.append(rng.choice(DEADLINES))
+    if rng.random() < 0.1:
+        parts.append("Please help!!")
+    text = " ".join(parts) + "\n\n" + rng.choice(SIGNATURES).format(name=name, uid=rng.randint(1000000, 9999999))
+    if rng.random() < quoted_share:
+        text += _quoted(rng, rng.randint(*quoted_lines))
+    return {"email": _sender(rng, name), "text": text}
+
+
+def make_corpus(n, seed=0, quoted_share=0.3, quoted_lines=(20, 200)):
+    """``n`` synthetic emails; the same arguments always give the same corpus."""
+    rng = random.Random(seed)
+    return [make_email(rng, quoted_share, quoted_lines) for _ in range(n)]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--emails", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--quoted-share", type=float, default=0.3, help="Share of emails with a quoted reply chain")
+    parser.add_argument("--quoted-lines", type=int, nargs=2, default=(20, 200), metavar=("MIN", "MAX"))
+    args = parser.parse_args(argv)
+    for email in make_corpus(args.emails, args.seed, args.quoted_share, tuple(args.quoted_lines)):
+        sys.stdout.write(json.dumps(email) + "\n")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,98 @@
+# bench/response_times.py
+"""Response-time analytics over years of synthetic email and draft history.
+
+Builds ``--years`` of threads (several emails each) and reply drafts, then
+times the full merge_asof join + sketch build and an incremental update
+with a day's worth of new drafts. Sketch quantiles are checked against
+exact ``numpy.quantile`` results on the joined response times (exits 1 if
+any is off by more than the sketch's relative accuracy).
+
+    python -m bench.response_times
+    python -m bench.response_times --years 5 --threads-per-day 120
+"""
+import argparse
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from libs.llm_client import DRAFTS_HEADERS
+from libs.response_times import QUANTILES, ResponseTimeStats, drafts_frame, join_drafts
+
+ADVISORS = ["Ann", "Bo", "Cy", "Di", ""]
+TOPICS = ["course registration", "academic advising", "graduation requirements", "meeting scheduled", "other"]
+URGENCIES = ["low", "medium", "high"]
+
+
+def make_history(years, threads_per_day, seed=0):
+    """(email_df, drafts sheet values): 1-5 emails per thread, a draft after most threads."""
+    rng = np.random.default_rng(seed)
+    n_threads = int(years * 365 * threads_per_day)
+    start = pd.Timestamp("2022-01-01")
+    thread_start = start + pd.to_timedelta(np.sort(rng.uniform(0, years * 365 * 24, n_threads)), unit="h")
+    sizes = rng.integers(1, 6, n_threads)
+    thread_idx = np.repeat(np.arange(n_threads), sizes)
+    offsets = pd.to_timedelta(rng.exponential(10, len(thread_idx)), unit="h")
+    sent = thread_start[thread_idx] + offsets
+    email_df = pd.DataFrame({
+        "Date": sent.normalize(),
+        "Time": sent.strftime("%H:%M:%S"),
+        "Name": "Student",
+        "Email": "s@umd.edu",
+        "Subject": "Question",
+        "Content": "",
+        "Thread ID": [f"t{i}" for i in thread_idx],
+        "topic": np.array(TOPICS)[thread_idx % len(TOPICS)],
+        "urgency": np.array(URGENCIES)[rng.integers(0, 3, n_threads)][thread_idx],
+    })
+
+    last_sent = pd.Series(sent).groupby(thread_idx).max().to_numpy()
+    answered = rng.random(n_threads) < 0.8
+    saved = pd.Series(last_sent[answered] + pd.to_timedelta(rng.lognormal(2, 1, answered.sum()), unit="h").to_numpy())
+    order = np.argsort(saved.to_numpy())
+    drafts = [DRAFTS_HEADERS] + [
+        ["", "", "", "", saved.iloc[i].isoformat(timespec="seconds"), "", f"t{tid}", ADVISORS[tid % len(ADVISORS)]]
+        for i, tid in ((i, np.flatnonzero(answered)[i]) for i in order)
+    ]
+    return email_df, drafts
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--years", type=float, default=3)
+    parser.add_argument("--threads-per-day", type=float, default=60)
+    args = parser.parse_args(argv)
+
+    email_df, draft_values = make_history(args.years, args.threads_per_day)
+    new_day = max(1, int(args.threads_per_day))
+    drafts_df = drafts_frame(draft_values)
+    print(f"{len(email_df)} emails, {len(drafts_df)} drafts")
+
+    stats = ResponseTimeStats()
+    start = time.perf_counter()
+    stats.update(email_df, drafts_df.iloc[:-new_day])
+    full = time.perf_counter() - start
+    start = time.perf_counter()
+    stats.update(email_df, drafts_df)
+    incremental = time.perf_counter() - start
+    print(f"full join + sketches:        {full * 1000:8.1f} ms")
+    print(f"incremental ({new_day} new drafts): {incremental * 1000:8.1f} ms")
+
+    joined = join_drafts(email_df, drafts_df)
+    worst = 0.0
+    for dimension in ("all", "advisor", "topic", "urgency"):
+        summary = stats.summary(dimension).set_index(dimension)
+        groups = [("all", joined)] if dimension == "all" else joined.groupby(dimension)
+        for value, group in groups:
+            for q in QUANTILES:
+                exact = np.quantile(group["response_hours"], q, method="lower")
+                approx = summary.loc[value, f"p{round(q * 100)}_hours"]
+                worst = max(worst, abs(approx - exact) / exact)
+    print(stats.summary("advisor").round(2).to_string(index=False))
+    print(f"worst relative quantile error: {worst:.2%} (bound {stats.relative_accuracy:.0%})")
+    return 1 if worst > stats.relative_accuracy + 1e-9 else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
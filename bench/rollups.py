@@ -0,0 +1,98 @@
+# bench/rollups.py
+"""Check the incrementally maintained email rollups against a batch recount.
+
+Syncs a fake mailbox with SyncPipeline in several runs (each run sees more
+mail, so later runs also re-see rows that are already counted), then
+compares ``monthly_volume_by_topic`` / ``compute_email_metrics`` answered
+from the rollups with the same functions run over the full sheet. The
+rollups are then rebuilt from the sheet and compared again, and the query
+times of both paths are reported.
+
+    python -m bench.rollups
+    python -m bench.rollups --messages 5000 --runs 5 --history 20000
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from bench.fake_google import FakeGmailService, FakeSheetsClient, make_mailbox
+from libs.metrics import compute_email_metrics, monthly_volume_by_topic
+from libs.nlp import classify_topic
+from libs.rollups import RollupStore, compare_with_batch, rollup_sheet
+from libs.sync_pipeline import PipelineConfig, SyncPipeline
+
+
+def make_history(n, seed=0):
+    """An email history frame: send date, reply output and (mostly) reply time."""
+    rng = np.random.default_rng(seed)
+    dates = pd.Timestamp.now().normalize() - pd.to_timedelta(rng.integers(0, 200 * 24, n), unit="h")
+    replies = dates + pd.to_timedelta(rng.exponential(20, n), unit="h")
+    replies = pd.Series(replies).where(rng.random(n) > 0.2)
+    return pd.DataFrame({
+        "Date": dates.strftime("%Y-%m-%d %H:%M"),
+        "output": np.where(rng.random(n) < 0.4, "auto skeleton", "manual"),
+        "Reply": replies.dt.strftime("%Y-%m-%d %H:%M"),
+    })
+
+
+def timed(fn, repeat=5):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = fn()
+    return result, (time.perf_counter() - start) / repeat
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--messages", type=int, default=1000)
+    parser.add_argument("--runs", type=int, default=3, help="Sync runs over a growing mailbox")
+    parser.add_argument("--history", type=int, default=5000, help="Email history rows")
+    args = parser.parse_args(argv)
+
+    store = RollupStore(os.path.join(tempfile.mkdtemp(), "rollups.sqlite3"))
+    sheet = rollup_sheet("bench")
+    mailbox = make_mailbox(args.messages, foreign_share=0.2, body_chars=400)
+    gc = FakeSheetsClient()
+    gc.add_rows("Student Case", [["Email", "UID"]])
+    for run in range(1, args.runs + 1):
+        # Oldest mail first: each run adds newer messages and re-lists the older ones
+        visible = mailbox[-(args.messages * run // args.runs):]
+        config = PipelineConfig(max_messages=len(visible), list_page_size=500)
+        SyncPipeline(lambda: FakeGmailService(visible), gc, "bench", config=config, rollups=store).run()
+
+    values = gc.spreadsheet.worksheet("Email").get_all_values()
+    email_df = pd.DataFrame(values[1:], columns=values[0])
+    email_df["topic"] = email_df["Content"].map(classify_topic)
+    history = make_history(args.history)
+    step = max(1, len(history) // 10)
+    for start in range(0, len(history), step):
+        store.add_history(history.iloc[start:start + step])
+
+    failed = False
+    for label in ("incremental", "rebuilt"):
+        if label == "rebuilt":
+            store.rebuild(email_df, history, sheet=sheet)
+        problems = compare_with_batch(store, email_df, history, sheet=sheet)
+        print(f"{label:<12} {'✓ matches batch' if not problems else '✗ differs from batch'}")
+        for problem in problems:
+            print("  " + problem)
+        failed = failed or bool(problems)
+
+    _, batch_topics = timed(lambda: monthly_volume_by_topic(email_df))
+    _, rollup_topics = timed(lambda: monthly_volume_by_topic(rollups=store, sheet=sheet))
+    _, batch_metrics = timed(lambda: compute_email_metrics(history))
+    _, rollup_metrics = timed(lambda: compute_email_metrics(rollups=store))
+    print(f"\n{'query':<26} {'batch ms':>9} {'rollup ms':>10}")
+    print(f"{'monthly_volume_by_topic':<26} {batch_topics * 1000:>9.2f} {rollup_topics * 1000:>10.2f}")
+    print(f"{'compute_email_metrics':<26} {batch_metrics * 1000:>9.2f} {rollup_metrics * 1000:>10.2f}")
+    print(f"({len(email_df)} sheet rows, {len(history)} history rows)")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
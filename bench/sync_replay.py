@@ -0,0 +1,157 @@
+# bench/sync_replay.py
+"""End-to-end sync benchmark replayed from recorded Gmail/Sheets fixtures.
+
+Runs ``GmailSyncScheduler.sync_emails`` (listing, fetching, decoding,
+dedupe against the sheet and the write-behind append) against fixtures
+recorded by libs/api_fixtures.py, served with ``--latency-ms`` per call,
+and reports wall time, API calls per method and bytes in each direction.
+
+Without ``--fixtures`` a recording is made first: a synthetic mailbox of
+``--messages`` messages is synced into an Email sheet that already holds
+``--existing-rows`` rows, using the in-memory fakes of bench/fake_google.py.
+To benchmark a real mailbox, record one with the live APIs
+(``GMAIL_SYNC_RECORD=fixtures/inbox python -m libs.sync_worker``) and pass
+``--fixtures fixtures/inbox``.
+
+    python -m bench.sync_replay
+    python -m bench.sync_replay --messages 1000 --existing-rows 50000 --latency-ms 30
+    python -m bench.sync_replay --fixtures fixtures/inbox --max-seconds 20   # exits 1 on regression
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+SHEET_ID = "sync-replay"
+
+
+def seed_sheets(messages, existing_rows, overlap, seed=0):
+    """Fake Sheets with a Student Case sheet and an Email sheet of ``existing_rows``
+    older rows plus ``overlap`` of the mailbox's UMD mail (already synced)."""
+    import random
+
+    from bench.fake_google import FakeSheetsClient
+    from libs.gmail_to_sheets import EMAIL_SHEET_HEADERS, email_row_values, parse_email_message
+
+    rng = random.Random(seed)
+    gc = FakeSheetsClient()
+    gc.add_rows("Student Case", [["Student", "UID", "Email"]] + [
+        [f"Student {i}", str(110000000 + i), f"student{i}@umd.edu"] for i in range(400)
+    ])
+    old = [[f"Student {i % 400}", f"student{i % 400}@umd.edu", str(110000000 + i % 400), "09:00:00",
+            f"2024-{1 + i % 12:02d}-{1 + i % 28:02d}", f"Older question #{i}",
+            "Hello, I have a question about my schedule. " * rng.randint(2, 10), f"old{i}", f"oldt{i // 3}"]
+           for i in range(existing_rows)]
+    synced = [email_row_values(r) for r in (parse_email_message(m) for m in messages) if r]
+    gc.add_rows("Email", [EMAIL_SHEET_HEADERS] + old + synced[: int(len(synced) * overlap)])
+    return gc
+
+
+def fresh_write_queue(path):
+    """Give the phase its own spool, so rows spooled by the other phase are not deduped away."""
+    import libs.write_queue as write_queue
+
+    if write_queue._queue is not None:
+        write_queue._queue.stop(flush_timeout=0)
+    write_queue._queue = write_queue.WriteQueue(path=path)
+    return write_queue._queue
+
+
+def run_sync(work_dir, phase, config, **scheduler_kwargs):
+    from libs.gmail_scheduler import GmailSyncScheduler
+
+    queue = fresh_write_queue(os.path.join(work_dir, f"{phase}-spool.sqlite3"))
+    scheduler = GmailSyncScheduler(
+        name=phase, sheet_id=SHEET_ID, pipeline_config=config,
+        checkpoint_path=os.path.join(work_dir, f"{phase}-checkpoint.json"), **scheduler_kwargs,
+    )
+    start = time.perf_counter()
+    scheduler.sync_emails()
+    pending = queue.flush(timeout=120)
+    elapsed = time.perf_counter() - start
+    return scheduler, elapsed, pending
+
+
+def record(fixture_dir, work_dir, config, args):
+    import libs.gmail_scheduler as gmail_scheduler
+    from bench.fake_google import FakeGmailService, make_mailbox
+
+    messages = make_mailbox(args.messages, args.foreign, args.body_chars, seed=args.seed)
+    gmail = FakeGmailService(messages)
+    gc = seed_sheets(messages, args.existing_rows, args.overlap, seed=args.seed)
+    gmail_scheduler.get_gmail_credentials = lambda *a: None
+    gmail_scheduler.build_gmail_service = lambda creds: gmail
+    gmail_scheduler.authenticate_sheets = lambda: gc
+    scheduler, elapsed, pending = run_sync(work_dir, "record", config, record_dir=fixture_dir)
+    return scheduler.last_sync_count, elapsed
+
+
+def _size_mb(path):
+    return sum(os.path.getsize(os.path.join(path, f)) for f in os.listdir(path)) / 2**20
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--fixtures", help="Replay this recording instead of recording a synthetic one")
+    parser.add_argument("--keep-fixtures", help="Write the synthetic recording here (kept after the run)")
+    parser.add_argument("--messages", type=int, default=1000)
+    parser.add_argument("--existing-rows", type=int, default=50000)
+    parser.add_argument("--overlap", type=float, default=0.2, help="Share of the mailbox already in the sheet")
+    parser.add_argument("--foreign", type=float, default=0.3, help="Share of mail from other domains")
+    parser.add_argument("--body-chars", type=int, default=3000)
+    parser.add_argument("--latency-ms", type=float, default=20, help="Replayed latency per API call")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--max-seconds", type=float, default=None, help="Exit 1 if the replayed sync is slower")
+    args = parser.parse_args(argv)
+
+    work_dir = tempfile.mkdtemp(prefix="sync-replay-")
+    # Local stores of the sync (rollups, default spool) stay out of the project
+    os.environ["EMAIL_ROLLUPS_PATH"] = os.path.join(work_dir, "rollups.sqlite3")
+    os.environ["SHEETS_SPOOL_PATH"] = os.path.join(work_dir, "spool.sqlite3")
+    from libs.sync_pipeline import PipelineConfig
+
+    status = 0
+    try:
+        if args.fixtures:
+            fixture_dir = args.fixtures
+            # A live recording lists up to the scheduler's default page size and cap
+            config = None
+            recorded = None
+        else:
+            fixture_dir = args.keep_fixtures or os.path.join(work_dir, "fixtures")
+            config = PipelineConfig(max_messages=args.messages, list_page_size=500)
+            recorded, record_s = record(fixture_dir, work_dir, config, args)
+            print(f"recorded a sync of {args.messages} messages against {args.existing_rows} existing rows "
+                  f"in {record_s:.1f} s: {recorded} rows added, fixtures {_size_mb(fixture_dir):.1f} MB")
+
+        scheduler, elapsed, pending = run_sync(work_dir, "replay", config, replay_dir=fixture_dir,
+                                               replay_latency_ms=args.latency_ms)
+        gmail, sheets = scheduler.gmail_service, scheduler.sheets_client
+        print(f"replayed sync ({args.latency_ms:g} ms per call): {elapsed:.2f} s wall, "
+              f"{scheduler.last_sync_count} rows added, {pending} left in the spool")
+        for name, replay in (("gmail", gmail), ("sheets", sheets)):
+            calls = ", ".join(f"{method} {n}" for method, n in sorted(replay.calls.items()))
+            print(f"  {name:<7} {sum(replay.calls.values()):6} calls ({calls}); "
+                  f"{replay.bytes_in / 2**20:.2f} MB in, {replay.bytes_out / 2**20:.2f} MB out")
+        stages = scheduler.metrics.snapshot()["stages"]
+        print("  stages: " + ", ".join(f"{stage} {s['sum_s'] * 1000:.0f} ms"
+                                        for stage, s in stages.items() if s["count"]))
+
+        if scheduler.last_error:
+            print(f"✗ {scheduler.last_error}")
+            status = 1
+        if recorded is not None and scheduler.last_sync_count != recorded:
+            print(f"✗ replay added {scheduler.last_sync_count} rows, the recording {recorded}")
+            status = 1
+        if args.max_seconds is not None and elapsed > args.max_seconds:
+            print(f"✗ {elapsed:.2f} s is above --max-seconds {args.max_seconds:g}")
+            status = 1
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
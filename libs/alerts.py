@@ -0,0 +1,113 @@
+# libs/alerts.py
+"""Academic policy alerts as one precomputed table.
+
+``build_alerts`` keeps the students on probation or with a registration
+block, joins their Student Case record and the urgency of their recent
+emails with vectorized merges, and sorts by a severity score. The dashboard
+renders the result as a single paginated ``st.dataframe``; ``alerts_view``
+caches it by a version hash of the input columns, so reruns with unchanged
+sheets do no work.
+"""
+import pandas as pd
+import streamlit as st
+
+from libs.pagination import frame_version
+from libs.threads import URGENCY_LABELS, URGENCY_RANK
+
+# Days of email history that count towards an alert's urgency
+RECENT_DAYS = 14
+
+SEVERITY_LABELS = [(5, "critical"), (3, "high"), (0, "medium")]
+
+ALERT_COLUMNS = [
+    "Severity", "Student", "UID", "Probation", "Registration Block", "Program", "GPA",
+    "Recent Emails", "Top Urgency", "Last Email", "Note",
+]
+
+# Columns whose values decide the alerts (and therefore the cache version)
+_POLICY_COLUMNS = ["Student", "UID", "Probation", "Registration Block", "Note"]
+_STUDENT_COLUMNS = ["UID", "Program", "GPA"]
+_EMAIL_COLUMNS = ["UID", "Date", "urgency"]
+
+
+def _yes(series):
+    return series.astype(str).str.strip().str.lower() == "yes"
+
+
+def _uid(series):
+    return series.astype(str).str.strip()
+
+
+def _present(df, columns):
+    return df[[c for c in columns if c in df.columns]]
+
+
+def build_alerts(policies, student_cases, email_df, now=None, recent_days=RECENT_DAYS):
+    """Flagged students with program/GPA and recent email urgency, most severe first."""
+    if policies.empty:
+        return pd.DataFrame(columns=ALERT_COLUMNS)
+    probation = _yes(policies.get("Probation", pd.Series("", index=policies.index)))
+    block = _yes(policies.get("Registration Block", pd.Series("", index=policies.index)))
+    alerts = _present(policies[probation | block], _POLICY_COLUMNS).assign(
+        uid_key=lambda df: _uid(df["UID"]),
+        probation=probation[probation | block],
+        block=block[probation | block],
+    )
+
+    if not student_cases.empty and "UID" in student_cases.columns:
+        students = _present(student_cases, ["Program", "GPA"]).assign(uid_key=_uid(student_cases["UID"]))
+        alerts = alerts.merge(students.drop_duplicates("uid_key"), on="uid_key", how="left")
+
+    if not email_df.empty and {"UID", "Date"} <= set(email_df.columns):
+        now = pd.Timestamp(now) if now is not None else pd.Timestamp.now()
+        dates = pd.to_datetime(email_df["Date"], errors="coerce")
+        recent = email_df[dates >= now - pd.Timedelta(days=recent_days)]
+        urgency = recent["urgency"] if "urgency" in recent.columns else pd.Series("low", index=recent.index)
+        per_student = pd.DataFrame({
+            "uid_key": _uid(recent["UID"]),
+            "rank": urgency.map(URGENCY_RANK).fillna(0).astype(int),
+            "date": dates[recent.index],
+        }).groupby("uid_key").agg(recent_emails=("rank", "size"), urgency_rank=("rank", "max"),
+                                  last_email=("date", "max"))
+        alerts = alerts.merge(per_student, left_on="uid_key", right_index=True, how="left")
+    for column, default in (("recent_emails", 0), ("urgency_rank", -1), ("last_email", pd.NaT)):
+        if column not in alerts.columns:
+            alerts[column] = default
+    alerts["recent_emails"] = alerts["recent_emails"].fillna(0).astype(int)
+    alerts["urgency_rank"] = alerts["urgency_rank"].fillna(-1).astype(int)
+
+    # Probation and a block count 2 each; a recent medium/high email adds 1/2
+    score = 2 * alerts["probation"].astype(int) + 2 * alerts["block"].astype(int) + alerts["urgency_rank"].clip(lower=0)
+    severity = pd.Series("medium", index=alerts.index)
+    for threshold, label in reversed(SEVERITY_LABELS):
+        severity = severity.mask(score >= threshold, label)
+    gpa = pd.to_numeric(alerts["GPA"], errors="coerce") if "GPA" in alerts.columns else pd.Series(float("nan"), index=alerts.index)
+
+    view = pd.DataFrame({
+        "Severity": severity,
+        "Student": alerts.get("Student"),
+        "UID": alerts["UID"],
+        "Probation": alerts["probation"].map({True: "Yes", False: ""}),
+        "Registration Block": alerts["block"].map({True: "Yes", False: ""}),
+        "Program": alerts.get("Program"),
+        "GPA": gpa,
+        "Recent Emails": alerts["recent_emails"],
+        "Top Urgency": alerts["urgency_rank"].map(URGENCY_LABELS),
+        "Last Email": alerts["last_email"],
+        "Note": alerts.get("Note"),
+        "_score": score,
+    })
+    view = view.sort_values(["_score", "GPA"], ascending=[False, True], na_position="last", kind="stable")
+    return view.drop(columns="_score").reset_index(drop=True).reindex(columns=ALERT_COLUMNS)
+
+
+@st.cache_data(max_entries=4, show_spinner=False)
+def _cached_alerts(version, day, _policies, _student_cases, _email_df):
+    return build_alerts(_policies, _student_cases, _email_df)
+
+
+def alerts_view(policies, student_cases, email_df):
+    """``build_alerts`` cached by data version (and by day, since "recent" moves with it)."""
+    version = hash((frame_version(policies, _POLICY_COLUMNS), frame_version(student_cases, _STUDENT_COLUMNS),
+                    frame_version(email_df, _EMAIL_COLUMNS)))
+    return _cached_alerts(version, pd.Timestamp.now().strftime("%Y-%m-%d"), policies, student_cases, email_df)
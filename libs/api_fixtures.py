@@ -0,0 +1,303 @@
+# libs/api_fixtures.py
+"""Record and replay the Gmail and Google Sheets calls made by the sync.
+
+Recording wraps a live Gmail service (``users().messages().list/get``) and
+gspread client (``open_by_key`` / ``worksheet`` / ``add_worksheet`` and the
+worksheet reads and writes) and writes every request with its response to
+``gmail.jsonl`` / ``sheets.jsonl`` in a fixture directory (emptied when
+recording starts). Replay serves
+the recorded responses, keyed by method and parameters and in recorded
+order, after ``latency_ms``, and counts calls and bytes in each direction,
+so sync performance can be measured without live accounts.
+
+The scheduler records with ``GMAIL_SYNC_RECORD=<dir>`` and replays with
+``GMAIL_SYNC_REPLAY=<dir>`` (``GMAIL_SYNC_REPLAY_LATENCY_MS``); see
+libs/gmail_scheduler.py and bench/sync_replay.py.
+"""
+import json
+import os
+import threading
+import time
+from collections import deque
+
+FILES = {"gmail": "gmail.jsonl", "sheets": "sheets.jsonl"}
+# Reads whose repeats are answered from the recording; anything else is a write
+SHEETS_READS = {"get_all_values", "get_all_records", "row_values", "col_values", "worksheet"}
+_UNKEYED = {"userId", "rows", "values", "value"}
+
+
+class ReplayMiss(KeyError):
+    """A replayed request that is not in the fixture."""
+
+
+def _dumps(value):
+    return json.dumps(value, default=str, separators=(",", ":"))
+
+
+def request_key(api, method, params):
+    # Written values are not part of the key: batching of appended rows depends on timing
+    params = {k: v for k, v in params.items() if k not in _UNKEYED and v is not None}
+    return _dumps([api, method, dict(sorted(params.items()))])
+
+
+class _Request:
+    """Deferred call, like googleapiclient's HttpRequest."""
+
+    def __init__(self, fn):
+        self._fn = fn
+
+    def execute(self):
+        return self._fn()
+
+
+# --- recording ----------------------------------------------------------------
+class Recorder:
+    """Appends request/response pairs to the fixture files in ``path``; files
+    left by an earlier recording are truncated, so runs never mix."""
+
+    def __init__(self, path):
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+        for filename in FILES.values():
+            open(os.path.join(path, filename), "w").close()
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def record(self, api, method, params, response=None, error=None):
+        entry = {"api": api, "method": method, "params": params}
+        if error is not None:
+            entry["error"] = type(error).__name__
+        else:
+            entry["response"] = response
+        line = _dumps(entry)
+        with self._lock:
+            self.calls += 1
+            with open(os.path.join(self.path, FILES[api]), "a") as f:
+                f.write(line + "\n")
+
+    def call(self, api, method, params, fn):
+        try:
+            response = fn()
+        except Exception as e:
+            self.record(api, method, params, error=e)
+            raise
+        self.record(api, method, params, response)
+        return response
+
+
+class RecordingGmailService:
+    """Wraps a Gmail API service; ``users().messages().list/get(...).execute()`` are recorded."""
+
+    def __init__(self, service, recorder):
+        self._service = service
+        self.recorder = recorder
+
+    def users(self):
+        return self
+
+    def messages(self):
+        return self
+
+    def list(self, **params):
+        return _Request(lambda: self.recorder.call(
+            "gmail", "list", params, lambda: self._service.users().messages().list(**params).execute()))
+
+    def get(self, **params):
+        return _Request(lambda: self.recorder.call(
+            "gmail", "get", params, lambda: self._service.users().messages().get(**params).execute()))
+
+
+class RecordingSheetsClient:
+    """Wraps a gspread client; spreadsheet and worksheet calls are recorded."""
+
+    def __init__(self, client, recorder):
+        self._client = client
+        self.recorder = recorder
+
+    def open_by_key(self, key):
+        return _RecordingSpreadsheet(self._client.open_by_key(key), self.recorder, key)
+
+
+class _RecordingSpreadsheet:
+    def __init__(self, spreadsheet, recorder, key):
+        self._spreadsheet = spreadsheet
+        self.recorder = recorder
+        self.key = key
+
+    def worksheet(self, title):
+        params = {"sheet": self.key, "title": title}
+        ws = self.recorder.call("sheets", "worksheet", params, lambda: self._spreadsheet.worksheet(title))
+        return _RecordingWorksheet(ws, self.recorder, self.key)
+
+    def add_worksheet(self, title, rows=1000, cols=10):
+        params = {"sheet": self.key, "title": title}
+        ws = self.recorder.call("sheets", "add_worksheet", params,
+                                lambda: self._spreadsheet.add_worksheet(title=title, rows=rows, cols=cols))
+        return _RecordingWorksheet(ws, self.recorder, self.key)
+
+
+class _RecordingWorksheet:
+    def __init__(self, worksheet, recorder, key):
+        self._ws = worksheet
+        self.recorder = recorder
+        self.title = worksheet.title
+        self._where = {"sheet": key, "title": self.title}
+
+    def _call(self, method, fn, **params):
+        return self.recorder.call("sheets", method, dict(self._where, **params), fn)
+
+    def get_all_values(self):
+        return self._call("get_all_values", self._ws.get_all_values)
+
+    def get_all_records(self):
+        return self._call("get_all_records", self._ws.get_all_records)
+
+    def row_values(self, row):
+        return self._call("row_values", lambda: self._ws.row_values(row), row=row)
+
+    def col_values(self, col):
+        return self._call("col_values", lambda: self._ws.col_values(col), col=col)
+
+    def update_cell(self, row, col, value):
+        return self._call("update_cell", lambda: self._ws.update_cell(row, col, value), row=row, col=col, value=value)
+
+    def append_rows(self, rows, **kwargs):
+        return self._call("append_rows", lambda: self._ws.append_rows(rows, **kwargs), rows=rows)
+
+    def append_row(self, row, **kwargs):
+        return self._call("append_row", lambda: self._ws.append_row(row, **kwargs), values=row)
+
+
+# --- replay -------------------------------------------------------------------
+class Fixture:
+    """Recorded responses by request, consumed in order (the last one repeats)."""
+
+    def __init__(self, path):
+        self.path = path
+        self._responses = {}
+        for api, filename in FILES.items():
+            file_path = os.path.join(path, filename)
+            if not os.path.exists(file_path):
+                continue
+            with open(file_path) as f:
+                for line in f:
+                    entry = json.loads(line)
+                    key = request_key(entry["api"], entry["method"], entry["params"])
+                    # Bytes are measured once here, not on every replayed call
+                    self._responses.setdefault(key, deque()).append(
+                        (entry.get("response"), entry.get("error"), len(_dumps(entry.get("response")))))
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return sum(len(v) for v in self._responses.values())
+
+    def respond(self, api, method, params):
+        """(response, error name, response bytes) for a request; raises ReplayMiss."""
+        key = request_key(api, method, params)
+        with self._lock:
+            queue = self._responses.get(key)
+            if not queue:
+                raise ReplayMiss(key)
+            return queue.popleft() if len(queue) > 1 else queue[0]
+
+
+class _Replay:
+    def __init__(self, fixture, api, latency_ms=0):
+        self.fixture = fixture
+        self.api = api
+        self.latency_ms = latency_ms
+        self.calls = {}
+        self.bytes_in = 0        # response bytes served
+        self.bytes_out = 0       # request bytes (written rows)
+        self._lock = threading.Lock()
+
+    def _serve(self, method, params, writes=False):
+        if self.latency_ms:
+            time.sleep(self.latency_ms / 1000)
+        response, error, size = self.fixture.respond(self.api, method, params)
+        with self._lock:
+            self.calls[method] = self.calls.get(method, 0) + 1
+            self.bytes_in += size
+            if writes:
+                self.bytes_out += len(_dumps(params))
+        if error == "WorksheetNotFound":
+            # gspread is only imported when a missing worksheet is replayed
+            from gspread.exceptions import WorksheetNotFound
+            raise WorksheetNotFound(params.get("title"))
+        if error is not None:
+            raise RuntimeError(f"replayed {self.api}.{method} error: {error}")
+        return response
+
+
+class ReplayGmailService(_Replay):
+    """Serves recorded ``users().messages().list/get`` responses; one instance is thread-safe."""
+
+    def __init__(self, fixture, latency_ms=0):
+        super().__init__(fixture, "gmail", latency_ms)
+
+    def users(self):
+        return self
+
+    def messages(self):
+        return self
+
+    def list(self, **params):
+        return _Request(lambda: self._serve("list", params))
+
+    def get(self, **params):
+        return _Request(lambda: self._serve("get", params))
+
+
+class ReplaySheetsClient(_Replay):
+    """gspread-like client answering from the recording; writes are acknowledged and counted."""
+
+    def __init__(self, fixture, latency_ms=0):
+        super().__init__(fixture, "sheets", latency_ms)
+
+    def open_by_key(self, key):
+        return _ReplaySpreadsheet(self, key)
+
+
+class _ReplaySpreadsheet:
+    def __init__(self, replay, key):
+        self.replay = replay
+        self.key = key
+
+    def worksheet(self, title):
+        self.replay._serve("worksheet", {"sheet": self.key, "title": title})
+        return _ReplayWorksheet(self.replay, self.key, title)
+
+    def add_worksheet(self, title, rows=1000, cols=10):
+        self.replay._serve("add_worksheet", {"sheet": self.key, "title": title}, writes=True)
+        return _ReplayWorksheet(self.replay, self.key, title)
+
+
+class _ReplayWorksheet:
+    def __init__(self, replay, key, title):
+        self.replay = replay
+        self.title = title
+        self._where = {"sheet": key, "title": title}
+
+    def _serve(self, method, **params):
+        return self.replay._serve(method, dict(self._where, **params), writes=method not in SHEETS_READS)
+
+    def get_all_values(self):
+        return self._serve("get_all_values")
+
+    def get_all_records(self):
+        return self._serve("get_all_records")
+
+    def row_values(self, row):
+        return self._serve("row_values", row=row)
+
+    def col_values(self, col):
+        return self._serve("col_values", col=col)
+
+    def update_cell(self, row, col, value):
+        return self._serve("update_cell", row=row, col=col, value=value)
+
+    def append_rows(self, rows, **kwargs):
+        return self._serve("append_rows", rows=rows)
+
+    def append_row(self, row, **kwargs):
+        return self._serve("append_row", values=row)
@@ -0,0 +1,180 @@
+# libs/content_store.py
+"""Email bodies kept out of the dashboard's DataFrame.
+
+The Email sheet is split into a compact metadata frame (sender, date,
+subject, UID, thread, topic, urgency, ``message_key``) that every session
+holds, and a SQLite content store with one row per message key. Bodies are
+classified once, when they first enter the store: the topic, the urgency
+as of the time the email was sent and the deadlines it mentions (resolved
+against that time). ``current_urgency`` turns the last two into today's
+urgency on every load without reading the body, so a "due tomorrow" email
+stops being urgent once its deadline has passed. Bodies are read back only
+for the messages actually displayed or sent to the LLM (``get_many`` /
+``with_content``), so per-session memory no longer grows with the size of
+the mailbox.
+
+A message key is the Gmail message id when the row has one, otherwise the
+sheet's dedupe key (sender, date, subject).
+"""
+import json
+import os
+import sqlite3
+import threading
+from datetime import datetime
+
+import pandas as pd
+
+from libs.nlp import _extract_candidate_deadlines, classify_topic, deadline_urgency, detect_urgency
+from libs.threads import URGENCY_RANK, message_times
+
+CONTENT_PATH = os.getenv(
+    "EMAIL_CONTENT_PATH",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), ".gmail_sync", "content.sqlite3"),
+)
+
+# ``bodies`` held urgency as of insertion time; its rows are re-read from the sheet
+_SCHEMA = """
+DROP TABLE IF EXISTS bodies;
+CREATE TABLE IF NOT EXISTS messages (
+    message_key TEXT PRIMARY KEY,
+    content TEXT NOT NULL,
+    topic TEXT NOT NULL,
+    urgency TEXT NOT NULL,
+    deadlines TEXT NOT NULL
+);
+"""
+
+# SQLite's default limit on host parameters per statement is 999+
+_CHUNK = 500
+
+
+def message_keys(email_df):
+    """Message key per row (``Date`` must still be the sheet's text)."""
+    fallback = (
+        "key:" + email_df["Email"].astype(str).str.lower() + "|" + email_df["Date"].astype(str)
+        + "|" + email_df["Subject"].astype(str)
+    )
+    if "Message ID" not in email_df.columns:
+        return fallback
+    ids = email_df["Message ID"].fillna("").astype(str).str.strip()
+    return ids.where(ids != "", fallback)
+
+
+def classify_body(content, sent_at=None):
+    """(topic, urgency when sent, deadlines as a JSON list of ISO times) of one body."""
+    sent_at = sent_at.to_pydatetime() if isinstance(sent_at, pd.Timestamp) and pd.notnull(sent_at) else None
+    text = content.lower()
+    deadlines = _extract_candidate_deadlines(text, now=sent_at)
+    return (classify_topic(content), detect_urgency(content, now=sent_at),
+            json.dumps([d.isoformat() for d in deadlines]))
+
+
+def current_urgency(sent_urgency, deadlines, now=None):
+    """Urgency at ``now`` of an email that was ``sent_urgency`` when sent: "low" once
+    every deadline it mentions has passed, raised as the next one gets close."""
+    deadlines = [datetime.fromisoformat(d) for d in json.loads(deadlines or "[]")]
+    if not deadlines:
+        return sent_urgency
+    now = now or datetime.now()
+    upcoming = [d for d in deadlines if d >= now]
+    if not upcoming:
+        return "low"
+    level = deadline_urgency(min(upcoming), now) or "low"
+    return max(sent_urgency, level, key=lambda u: URGENCY_RANK.get(u, 0))
+
+
+class ContentStore:
+    def __init__(self, path=CONTENT_PATH):
+        self.path = path
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, timeout=30, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript(_SCHEMA)
+
+    def missing(self, keys):
+        """The subset of ``keys`` not in the store yet."""
+        keys = list(dict.fromkeys(keys))
+        found = set()
+        with self._lock:
+            for start in range(0, len(keys), _CHUNK):
+                chunk = keys[start:start + _CHUNK]
+                found.update(k for (k,) in self._db.execute(
+                    f"SELECT message_key FROM messages WHERE message_key IN ({','.join('?' * len(chunk))})", chunk))
+        return [k for k in keys if k not in found]
+
+    def put_many(self, keys, contents, sent_at=None):
+        """Store and classify bodies not stored yet, relative phrases resolved against
+        each email's ``sent_at`` (default: now); returns how many were added."""
+        new = set(self.missing(keys))
+        sent_at = sent_at if sent_at is not None else [None] * len(keys)
+        rows = []
+        for key, content, at in zip(keys, contents, sent_at):
+            if key in new:
+                content = "" if content is None or pd.isna(content) else str(content)
+                rows.append((key, content, *classify_body(content, at)))
+                new.discard(key)
+        with self._lock:
+            self._db.execute("BEGIN")
+            self._db.executemany("INSERT OR IGNORE INTO messages VALUES (?, ?, ?, ?, ?)", rows)
+            self._db.execute("COMMIT")
+        return len(rows)
+
+    def _select(self, columns, keys):
+        keys = list(dict.fromkeys(keys))
+        out = {}
+        with self._lock:
+            for start in range(0, len(keys), _CHUNK):
+                chunk = keys[start:start + _CHUNK]
+                for row in self._db.execute(
+                    f"SELECT message_key, {columns} FROM messages WHERE message_key IN ({','.join('?' * len(chunk))})",
+                    chunk,
+                ):
+                    out[row[0]] = row[1:] if len(row) > 2 else row[1]
+        return out
+
+    def get(self, key):
+        return self._select("content", [key]).get(key, "")
+
+    def get_many(self, keys):
+        """message key → body for the keys in the store."""
+        return self._select("content", keys)
+
+    def labels(self, keys, now=None):
+        """message key → (topic, urgency at ``now``)."""
+        return {key: (topic, current_urgency(urgency, deadlines, now))
+                for key, (topic, urgency, deadlines) in self._select("topic, urgency, deadlines", keys).items()}
+
+
+def split_email_frame(email_df, store):
+    """Store the bodies of ``email_df`` (new keys only) and return the metadata
+    frame with ``message_key``, ``topic`` and ``urgency`` and without ``Content``."""
+    if email_df.empty:
+        return email_df.drop(columns=["Content"], errors="ignore").assign(message_key="", topic="", urgency="")
+    meta = email_df.drop(columns=["Content", "topic", "urgency"], errors="ignore")
+    meta["message_key"] = message_keys(email_df)
+    if "Content" in email_df.columns:
+        store.put_many(meta["message_key"].tolist(), email_df["Content"].tolist(), message_times(email_df).tolist())
+    labels = pd.DataFrame.from_dict(store.labels(meta["message_key"].tolist()), orient="index",
+                                    columns=["topic", "urgency"])
+    meta = meta.join(labels, on="message_key")
+    return meta.fillna({"topic": "other", "urgency": "low"})
+
+
+def with_content(meta_df, store=None):
+    """``meta_df`` (a handful of rows) with their ``Content`` read from the store."""
+    bodies = (store or get_content_store()).get_many(meta_df["message_key"].tolist())
+    return meta_df.assign(Content=meta_df["message_key"].map(bodies).fillna(""))
+
+
+# Singleton
+_store = None
+_store_lock = threading.Lock()
+
+def get_content_store():
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = ContentStore()
+    return _store
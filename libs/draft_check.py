@@ -0,0 +1,146 @@
+# libs/draft_check.py
+"""Fast local pre-checks for advisor drafts, run before the LLM fact-check.
+
+Scores how well a draft covers each skeleton ``reply_points`` entry by
+keyword overlap, compares links against ``suggested_links`` and flags
+empty or unfilled placeholder text. Clear problems fail locally and skip
+the LLM: an empty draft, leftover placeholders, a UID that is not the
+student's, links outside ``suggested_links`` and a draft that shares
+almost no words with any reply point. Low but not negligible coverage is
+only a warning, since a paraphrased draft can cover a point without
+sharing its words, and the LLM decides.
+"""
+import json
+import re
+
+from libs.llm_json import parse_json_object
+
+STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "by", "can", "do", "for", "from",
+    "has", "have", "how", "if", "in", "is", "it", "its", "of", "on", "or", "our",
+    "should", "that", "the", "their", "them", "they", "this", "to", "was", "what",
+    "when", "where", "which", "who", "will", "with", "you", "your", "student",
+    "students", "advisor", "mention", "explain", "include", "provide", "let", "know",
+}
+
+# A reply point counts as covered when this share of its keywords is in the draft
+POINT_COVERAGE = 0.5
+# Drafts covering less than this share of reply points get a warning
+MIN_POINT_COVERAGE = 0.34
+# Drafts covering no reply point, with this mean keyword overlap or less, fail locally
+CLEAR_FAIL_SCORE = 0.15
+
+_WORD = re.compile(r"[a-z0-9']+")
+_URL = re.compile(r"https?://[^\s<>()\"']+", re.IGNORECASE)
+_PLACEHOLDER = re.compile(
+    r"\{[a-z_ ]+\}|\[(?:insert|your|student|name|link|date)[^\]]*\]|\bTODO\b|\bTBD\b|lorem ipsum|x{3,}",
+    re.IGNORECASE,
+)
+_UID = re.compile(r"\b\d{9}\b")
+
+
+def _stem(word: str) -> str:
+    for suffix in ("ing", "ed", "es", "s"):
+        if len(word) > len(suffix) + 3 and word.endswith(suffix):
+            return word[: -len(suffix)]
+    return word
+
+
+def keywords(text: str) -> set:
+    return {_stem(w) for w in _WORD.findall((text or "").lower()) if len(w) > 2 and w not in STOPWORDS}
+
+
+def _normalize_url(url: str) -> str:
+    url = url.lower().rstrip(".,;:!?/")
+    return re.sub(r"^https?://(www\.)?", "", url)
+
+
+def parse_skeleton(skeleton) -> dict:
+    """Accept an EmailSkeleton, a dict or the raw LLM text and return a dict (may be empty)."""
+    if hasattr(skeleton, "to_dict"):
+        return skeleton.to_dict()
+    return parse_json_object(skeleton)
+
+
+def _wrong_uid(draft: str, student_uid) -> str:
+    """Reason to fail when the draft quotes UIDs and none of them is the student's."""
+    uid = str(student_uid or "").strip()
+    quoted = set(_UID.findall(draft))
+    if not _UID.fullmatch(uid) or not quoted or uid in quoted:
+        return None
+    return f"Draft UID {', '.join(sorted(quoted))} is not the student's UID ({uid})."
+
+
+def precheck_draft(user_draft: str, skeleton, student_uid=None) -> dict:
+    """Score a draft locally.
+
+    Returns a dict with ``verdict`` ("fail" or "borderline"), ``reasons``
+    for a fail, ``warnings``, per-point ``coverage``, ``missing_points``,
+    ``placeholders``, ``unmatched_links`` and ``missing_links``.
+    "borderline" means the LLM should judge it.
+    """
+    draft = (user_draft or "").strip()
+    skel = parse_skeleton(skeleton)
+    points = [p for p in skel.get("reply_points", []) if isinstance(p, str) and p.strip()]
+    suggested = [l for l in skel.get("suggested_links", []) if isinstance(l, str)]
+
+    draft_words = keywords(draft)
+    coverage = []
+    missing_points = []
+    for point in points:
+        kws = keywords(point)
+        score = len(kws & draft_words) / len(kws) if kws else 1.0
+        coverage.append({"point": point, "score": round(score, 2)})
+        if score < POINT_COVERAGE:
+            missing_points.append(point)
+    covered_share = 1 - len(missing_points) / len(points) if points else 1.0
+
+    draft_links = {_normalize_url(u) for u in _URL.findall(draft)}
+    suggested_links = {_normalize_url(u) for u in _URL.findall(" ".join(suggested))}
+    unmatched_links = sorted(draft_links - suggested_links) if suggested_links else []
+    missing_links = sorted(suggested_links - draft_links)
+    placeholders = sorted(set(m.group(0) for m in _PLACEHOLDER.finditer(draft)))
+
+    reasons = []
+    if not draft:
+        reasons.append("Draft is empty.")
+    if placeholders:
+        reasons.append(f"Draft still contains placeholder text: {', '.join(placeholders)}")
+    wrong_uid = _wrong_uid(draft, student_uid)
+    if wrong_uid:
+        reasons.append(wrong_uid)
+    if unmatched_links:
+        reasons.append(f"Links not in the suggested resources: {', '.join(unmatched_links)}")
+    warnings = []
+    mean_score = sum(c["score"] for c in coverage) / len(coverage) if coverage else 1.0
+    if draft and points and len(missing_points) == len(points) and mean_score <= CLEAR_FAIL_SCORE:
+        reasons.append(f"Draft does not address any of the {len(points)} reply points.")
+    elif draft and points and covered_share < MIN_POINT_COVERAGE:
+        warnings.append(f"Draft seems to cover only {len(points) - len(missing_points)} of "
+                        f"{len(points)} reply points.")
+
+    return {
+        "verdict": "fail" if reasons else "borderline",
+        "reasons": reasons,
+        "warnings": warnings,
+        "covered_share": round(covered_share, 2),
+        "coverage": coverage,
+        "missing_points": missing_points,
+        "placeholders": placeholders,
+        "unmatched_links": unmatched_links,
+        "missing_links": missing_links,
+    }
+
+
+def precheck_report(check: dict) -> str:
+    """Render a failed pre-check in the same JSON shape as the LLM fact-check."""
+    return json.dumps({
+        "factually_correct": False,
+        "missing_points": check["missing_points"],
+        "incorrect_info": check["reasons"],
+        "tone_feedback": "Not reviewed: the draft failed local pre-checks, so no LLM review was run.",
+        "precheck": {
+            "covered_share": check["covered_share"],
+            "missing_links": check["missing_links"],
+        },
+    }, indent=2)
@@ -0,0 +1,229 @@
+# libs/fake_llm.py
+"""Local OpenAI/Groq-compatible stub server for offline testing and benchmarks.
+
+Serves ``POST /openai/v1/chat/completions`` (the path the Groq SDK uses) and
+``POST /v1/chat/completions`` (plain OpenAI clients) with canned JSON
+answers, so ``libs/llm_client.py`` can be exercised without the live API:
+
+    GROQ_API_KEY=fake GROQ_BASE_URL=http://127.0.0.1:8765 streamlit run app.py
+
+Run standalone with ``python -m libs.fake_llm --port 8765 --latency-ms 300``.
+"""
+import argparse
+import json
+import random
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+CANNED_SKELETON = {
+    "summary": "The student is asking how to clear a registration hold before the add/drop deadline.",
+    "reply_points": [
+        "Explain which office placed the hold",
+        "List the steps to clear the hold",
+        "Mention the add/drop deadline",
+    ],
+    "suggested_links": ["https://registrar.umd.edu/registration"],
+    "skeleton_reply": "Hi {student_name},\nThank you for reaching out about your registration hold...\nRegards,\n{advisor_name}",
+    "user_draft_space": "✍️ Please type your final draft below.",
+}
+
+CANNED_FACT_CHECK = {
+    "factually_correct": True,
+    "missing_points": [],
+    "incorrect_info": [],
+    "tone_feedback": "Polite and professional.",
+}
+
+
+def _pick_response(messages):
+    """Choose a canned answer from the system prompt used by llm_client."""
+    system = " ".join(m.get("content", "") for m in messages if m.get("role") == "system").lower()
+    if "reviewer" in system or "fact" in system:
+        return CANNED_FACT_CHECK
+    return CANNED_SKELETON
+
+
+class FakeLLMServer:
+    """Threaded HTTP stub with configurable latency, streaming and errors.
+
+    - ``latency_ms`` / ``jitter_ms``: delay before the first byte of a reply
+    - ``chunk_delay_ms`` / ``chunk_size``: pacing of streamed (SSE) chunks
+    - ``error_rate`` / ``error_status``: fraction of requests that fail
+    - ``responses``: optional callable ``messages -> dict|str`` overriding
+      the canned skeleton/fact-check answers
+    """
+
+    def __init__(self, host="127.0.0.1", port=0, latency_ms=0, jitter_ms=0,
+                 chunk_delay_ms=0, chunk_size=16, error_rate=0.0,
+                 error_status=429, responses=None, seed=None):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.chunk_delay_ms = chunk_delay_ms
+        self.chunk_size = chunk_size
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.responses = responses or _pick_response
+        self.request_count = 0
+        self.error_count = 0
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._thread = None
+        self.httpd = ThreadingHTTPServer((host, port), self._make_handler())
+        self.httpd.daemon_threads = True
+
+    @property
+    def base_url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _next_fault(self):
+        """Return (delay_seconds, should_fail) for one request."""
+        with self._lock:
+            self.request_count += 1
+            jitter = self._rng.uniform(-self.jitter_ms, self.jitter_ms) if self.jitter_ms else 0
+            fail = self._rng.random() < self.error_rate
+            if fail:
+                self.error_count += 1
+        return max(0.0, (self.latency_ms + jitter) / 1000.0), fail
+
+    def _make_handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def _send_json(self, status, payload):
+                body = json.dumps(payload).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_POST(self):
+                if not self.path.rstrip("/").endswith("/chat/completions"):
+                    self._send_json(404, {"error": {"message": f"Unknown path {self.path}"}})
+                    return
+
+                length = int(self.headers.get("Content-Length") or 0)
+                try:
+                    request = json.loads(self.rfile.read(length) or b"{}")
+                except ValueError:
+                    self._send_json(400, {"error": {"message": "Invalid JSON body"}})
+                    return
+
+                delay, fail = server._next_fault()
+                time.sleep(delay)
+                if fail:
+                    self._send_json(server.error_status, {
+                        "error": {"message": "Injected failure", "type": "fake_error", "code": "injected"}
+                    })
+                    return
+
+                answer = server.responses(request.get("messages", []))
+                content = answer if isinstance(answer, str) else json.dumps(answer, indent=2)
+                model = request.get("model", "fake-model")
+                completion_id = f"chatcmpl-{uuid.uuid4().hex[:12]}"
+
+                if request.get("stream"):
+                    try:
+                        self._stream(completion_id, model, content)
+                    except (BrokenPipeError, ConnectionResetError):
+                        # Client stopped reading early (e.g. time-to-first-chunk probes)
+                        self.close_connection = True
+                else:
+                    self._send_json(200, {
+                        "id": completion_id,
+                        "object": "chat.completion",
+                        "created": int(time.time()),
+                        "model": model,
+                        "choices": [{
+                            "index": 0,
+                            "message": {"role": "assistant", "content": content},
+                            "finish_reason": "stop",
+                        }],
+                        "usage": {
+                            "prompt_tokens": 0,
+                            "completion_tokens": len(content.split()),
+                            "total_tokens": len(content.split()),
+                        },
+                    })
+
+            def _stream(self, completion_id, model, content):
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Cache-Control", "no-cache")
+                self.send_header("Connection", "close")
+                self.end_headers()
+                size = max(1, server.chunk_size)
+                for i in range(0, len(content), size):
+                    chunk = {
+                        "id": completion_id,
+                        "object": "chat.completion.chunk",
+                        "created": int(time.time()),
+                        "model": model,
+                        "choices": [{"index": 0, "delta": {"content": content[i:i + size]}, "finish_reason": None}],
+                    }
+                    self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+                    self.wfile.flush()
+                    if server.chunk_delay_ms:
+                        time.sleep(server.chunk_delay_ms / 1000.0)
+                done = {
+                    "id": completion_id,
+                    "object": "chat.completion.chunk",
+                    "created": int(time.time()),
+                    "model": model,
+                    "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}],
+                }
+                self.wfile.write(f"data: {json.dumps(done)}\n\ndata: [DONE]\n\n".encode("utf-8"))
+                self.wfile.flush()
+                self.close_connection = True
+
+        return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a local Groq/OpenAI-compatible stub server.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency-ms", type=float, default=0)
+    parser.add_argument("--jitter-ms", type=float, default=0)
+    parser.add_argument("--chunk-delay-ms", type=float, default=0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--error-status", type=int, default=429)
+    args = parser.parse_args()
+
+    server = FakeLLMServer(
+        host=args.host, port=args.port, latency_ms=args.latency_ms,
+        jitter_ms=args.jitter_ms, chunk_delay_ms=args.chunk_delay_ms,
+        error_rate=args.error_rate, error_status=args.error_status,
+    )
+    print(f"Fake LLM server listening on {server.base_url}")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,11 @@
 # libs/gmail_scheduler.py
+import json
 import os
 import sys
-from datetime import datetime
-from apscheduler.schedulers.background import BackgroundScheduler
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import replace
+from datetime import datetime, timedelta
 
 # Add parent directory to path to import gmail_to_sheets
 sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
@@ -10,111 +13,418 @@ sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
 # Import modules after path fix
 try:
     from libs.gmail_to_sheets import (
-        authenticate_gmail,
+        get_gmail_credentials,
+        build_gmail_service,
         authenticate_sheets,
-        fetch_recent_emails,
-        extract_email_data,
-        match_student_uid,
-        load_student_database,
-        append_to_email_sheet,
-        SHEET_ID
+        get_sheet_id,
+        get_mailbox_configs,
+        build_email_query,
+        DEFAULT_TOKEN_PATH,
     )
+    from libs.sync_pipeline import PipelineConfig, SyncPipeline
+    from libs.sync_metrics import SyncMetrics
+    from libs.write_queue import get_write_queue
+    from libs.rollups import get_rollup_store
+    from libs.priority import get_priority_index
 except ImportError as e:
     print(f"Warning: Could not import gmail_to_sheets: {e}")
     print("Gmail sync capabilities disabled.")
 
     # Dummy fallback functions
-    def authenticate_gmail(): return None
+    def get_gmail_credentials(): return None
+    def build_gmail_service(creds): return None
     def authenticate_sheets(): return None
-    SHEET_ID = None
+    def get_sheet_id(): return None
+    def get_mailbox_configs(): return [{"name": "default"}]
+    def build_email_query(newer_than="7d", after=None): return None
+    DEFAULT_TOKEN_PATH = None
+    PipelineConfig = None
+    def get_write_queue(): return None
+    def get_rollup_store(): return None
+    def get_priority_index(): return None
+    from libs.sync_metrics import SyncMetrics
+
+
+def _dashboard_sheet_id():
+    """SHEET_ID of the dashboard, or None when it is not configured."""
+    try:
+        return get_sheet_id()
+    except Exception:
+        return None
+
+
+def is_quota_error(error):
+    """True if an exception or error message looks like a Gmail/Sheets quota or rate limit."""
+    text = str(error).lower()
+    return any(marker in text for marker in ("429", "ratelimitexceeded", "quota", "rate limit", "userratelimit"))
+
+
+class AdaptiveInterval:
+    """Picks the next sync interval from the observed mail arrival rate.
+
+    The arrival rate (new rows per minute) is an exponentially weighted
+    moving average over recent syncs; the interval aims for about
+    ``target_per_sync`` new emails per run, clamped to the configured
+    bounds. Quota errors double the interval (up to the max) until a sync
+    succeeds again.
+    """
+
+    def __init__(self, initial_minutes=4, min_minutes=1, max_minutes=30,
+                 target_per_sync=2, smoothing=0.3):
+        self.min_minutes = min_minutes
+        self.max_minutes = max_minutes
+        self.target_per_sync = target_per_sync
+        self.smoothing = smoothing
+        self.interval_minutes = self._clamp(initial_minutes)
+        self.rate_per_minute = None
+        self.backoff = False
+        self._last_sync = None
+
+    def _clamp(self, minutes):
+        return max(self.min_minutes, min(self.max_minutes, minutes))
+
+    def observe(self, new_rows, quota_error=False, now=None):
+        """Record one sync and return the next interval in minutes."""
+        now = now or datetime.now()
+        if quota_error:
+            self.backoff = True
+            self.interval_minutes = self._clamp(self.interval_minutes * 2)
+            return self.interval_minutes
+
+        if self._last_sync is not None:
+            elapsed = max((now - self._last_sync).total_seconds() / 60, 1e-6)
+            sample = new_rows / elapsed
+            if self.rate_per_minute is None:
+                self.rate_per_minute = sample
+            else:
+                self.rate_per_minute = self.smoothing * sample + (1 - self.smoothing) * self.rate_per_minute
+        self._last_sync = now
+        self.backoff = False
+
+        if self.rate_per_minute is None:
+            return self.interval_minutes
+        if self.rate_per_minute <= 0:
+            self.interval_minutes = self.max_minutes
+        else:
+            self.interval_minutes = self._clamp(self.target_per_sync / self.rate_per_minute)
+        return self.interval_minutes
+
+
+CHECKPOINT_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), ".gmail_sync")
+# Re-list this much before the checkpoint: Gmail's after: has 1s granularity
+# and internalDate can trail delivery slightly; duplicates are deduped anyway
+CHECKPOINT_OVERLAP_SECONDS = 300
 
 
 class GmailSyncScheduler:
-    def __init__(self, sheet_name="Email"):
-        self.scheduler = BackgroundScheduler()
+    """Syncs one Gmail inbox into one worksheet.
+
+    ``name``, ``token_path``, ``sheet_id`` and ``checkpoint_path`` identify
+    the mailbox; the defaults are the single ``gmail_token.json`` inbox and
+    the ``SHEET_ID`` spreadsheet. The checkpoint stores the newest message
+    date seen so later syncs only list mail received since then.
+
+    ``record_dir`` (``GMAIL_SYNC_RECORD``) records every Gmail and Sheets
+    call of the sync to fixtures; ``replay_dir`` (``GMAIL_SYNC_REPLAY``)
+    serves them instead of the live APIs (libs/api_fixtures.py).
+    """
+
+    def __init__(self, sheet_name="Email", pipeline_config=None, metrics_path=None,
+                 name="default", token_path=None, sheet_id=None, checkpoint_path=None,
+                 record_dir=None, replay_dir=None, replay_latency_ms=None):
+        self.name = name
+        self.token_path = token_path or DEFAULT_TOKEN_PATH
+        self.sheet_id = sheet_id
+        self.checkpoint_path = checkpoint_path or os.path.join(CHECKPOINT_DIR, f"{name}.json")
+        self.scheduler = None  # APScheduler is imported/built on start()
         self.is_running = False
         self.last_sync_time = None
         self.last_sync_count = 0
+        self.gmail_credentials = None
         self.gmail_service = None
         self.sheets_client = None
+        record_dir = record_dir or os.getenv("GMAIL_SYNC_RECORD")
+        self.recorder = None
+        if record_dir:
+            # Fixture recording/replay (libs/api_fixtures.py) is imported only when used
+            from libs.api_fixtures import Recorder
+            self.recorder = Recorder(record_dir)
+        self.replay_dir = replay_dir or os.getenv("GMAIL_SYNC_REPLAY")
+        self.replay_latency_ms = (replay_latency_ms if replay_latency_ms is not None
+                                  else float(os.getenv("GMAIL_SYNC_REPLAY_LATENCY_MS", "0")))
+        self.pipeline_config = pipeline_config or (PipelineConfig() if PipelineConfig else None)
+
+        # Per-stage timings over recent runs; optionally mirrored to a
+        # Prometheus textfile after every run
+        self.metrics = SyncMetrics()
+        self.metrics_path = metrics_path or os.getenv("GMAIL_SYNC_METRICS_PATH")
         self.sheet_name = sheet_name
+        self.last_error = None
+
+        # One sync at a time: overlapping interval runs are coalesced into a
+        # single follow-up run, overlapping manual triggers are rejected.
+        self._sync_lock = threading.Lock()
+        self._rerun_requested = False
+        # Guards _rerun_requested together with releasing _sync_lock, so a
+        # rerun requested while the running sync is finishing is never lost
+        self._rerun_lock = threading.Lock()
+        self._job_thread = None
+        self._progress_lock = threading.Lock()
+        self.progress = self._empty_progress()
+
+        # Set by start(adaptive=True)
+        self.interval_minutes = None
+        self.adaptive = None
+
+    @staticmethod
+    def _empty_progress():
+        return {
+            "stage": "idle",
+            "started_at": None,
+            "total": 0,
+            "fetched": 0,
+            "parsed": 0,
+            "appended": 0,
+        }
+
+    def _update_progress(self, **changes):
+        with self._progress_lock:
+            self.progress.update(changes)
+
+    def _bump_progress(self, key, n=1):
+        with self._progress_lock:
+            self.progress[key] += n
+
+    def _progress_snapshot(self):
+        with self._progress_lock:
+            return dict(self.progress)
+
+    def load_checkpoint(self):
+        """Newest synced Gmail internalDate (ms since epoch), or None before the first sync."""
+        try:
+            with open(self.checkpoint_path) as f:
+                return json.load(f).get("newest_internal_date")
+        except (OSError, ValueError):
+            return None
+
+    def save_checkpoint(self, internal_date):
+        os.makedirs(os.path.dirname(self.checkpoint_path), exist_ok=True)
+        tmp = f"{self.checkpoint_path}.tmp"
+        with open(tmp, "w") as f:
+            json.dump({"newest_internal_date": internal_date, "updated_at": datetime.now().isoformat()}, f)
+        os.replace(tmp, self.checkpoint_path)
+
+    @property
+    def sync_in_progress(self):
+        job = self._job_thread
+        return self._sync_lock.locked() or bool(job and job.is_alive())
 
     def initialize_services(self):
         """Initialize Gmail + Sheets API once"""
         try:
             print(f"[{datetime.now().strftime('%H:%M:%S')}] Initializing services...")
-            self.gmail_service = authenticate_gmail()
-            self.sheets_client = authenticate_sheets()
+            with self.metrics.timer("auth"):
+                if self.replay_dir:
+                    from libs.api_fixtures import Fixture, ReplayGmailService, ReplaySheetsClient
+
+                    fixture = Fixture(self.replay_dir)
+                    self.gmail_service = ReplayGmailService(fixture, self.replay_latency_ms)
+                    self.sheets_client = ReplaySheetsClient(fixture, self.replay_latency_ms)
+                else:
+                    self.gmail_credentials = get_gmail_credentials(self.token_path)
+                    self.gmail_service = self._new_gmail_service()
+                    self.sheets_client = authenticate_sheets()
+                    if self.recorder is not None:
+                        from libs.api_fixtures import RecordingSheetsClient
+
+                        self.sheets_client = RecordingSheetsClient(self.sheets_client, self.recorder)
             print(f"[{datetime.now().strftime('%H:%M:%S')}] ✓ Services initialized")
+            self.last_error = None
             return True
         except Exception as e:
             print(f"[{datetime.now().strftime('%H:%M:%S')}] ✗ Init error: {e}")
+            self.last_error = f"Init error: {e}"
             return False
 
+    def _new_gmail_service(self):
+        """A Gmail service for one pipeline worker (httplib2 is not thread-safe);
+        the replay service is shared, recorded services are wrapped."""
+        if self.replay_dir:
+            return self.gmail_service
+        service = build_gmail_service(self.gmail_credentials)
+        if self.recorder is None:
+            return service
+        from libs.api_fixtures import RecordingGmailService
+
+        return RecordingGmailService(service, self.recorder)
+
     def sync_emails(self):
-        """Pull Gmail → append to Google Sheets"""
+        """Pull Gmail → append to Google Sheets (blocking).
+
+        Safe to call from several threads: if a sync is already running the
+        call returns False immediately and one follow-up run is scheduled
+        after the current one finishes.
+        """
+        with self._rerun_lock:
+            if not self._sync_lock.acquire(blocking=False):
+                self._rerun_requested = True
+                print(f"[{datetime.now().strftime('%H:%M:%S')}] Sync already running; coalescing")
+                return False
+            self._rerun_requested = False
+        try:
+            while True:
+                self._run_sync()
+                with self._rerun_lock:
+                    if not self._rerun_requested:
+                        self._sync_lock.release()
+                        break
+                    self._rerun_requested = False
+        except BaseException:
+            self._sync_lock.release()
+            raise
+        return True
+
+    def trigger_sync(self):
+        """Start a sync in a background thread without blocking the caller.
+
+        Returns False (and does nothing) if a sync is already in progress;
+        poll ``get_status()["progress"]`` to follow the run.
+        """
+        if self.sync_in_progress:
+            return False
+        self._job_thread = threading.Thread(target=self.sync_emails, name="gmail-sync-now", daemon=True)
+        self._job_thread.start()
+        return True
+
+    def _run_sync(self):
+        with self._progress_lock:
+            self.progress = self._empty_progress()
+            self.progress.update(stage="starting", started_at=datetime.now())
+        self.metrics.start_run()
+        ok = False
         try:
             now = datetime.now().strftime("%H:%M:%S")
-            print(f"\n[{now}] === Syncing email ===")
+            print(f"\n[{now}] === Syncing email ({self.name}) ===")
 
             # Lazy init if needed
             if not self.gmail_service or not self.sheets_client:
+                self._update_progress(stage="authenticating")
                 if not self.initialize_services():
                     return
 
-            # Load student data
-            student_cases_df = load_student_database(self.sheets_client, SHEET_ID)
-
-            # Get Gmail messages
-            messages = fetch_recent_emails(self.gmail_service, max_results=50)
-            print(f"[{now}] Found {len(messages)} emails")
-
-            # Process
-            email_data_list = []
-            for msg in messages:
-                email_row = extract_email_data(msg, self.gmail_service)
-                if email_row:
-                    email_row["uid"] = match_student_uid(email_row["email"], student_cases_df)
-                    email_data_list.append(email_row)
-
-            # Append to GSheet
-            if email_data_list:
-                rows_added = append_to_email_sheet(
-                    self.sheets_client,
-                    SHEET_ID,
-                    email_data_list,
-                    sheet_name=self.sheet_name
-                )
-                self.last_sync_count = rows_added
-                print(f"[{now}] ✓ Added {rows_added} rows")
-            else:
-                self.last_sync_count = 0
-                print(f"[{now}] ✓ No new rows")
+            # list → fetch → decode → match → write, stages overlapping
+            self._update_progress(stage="syncing")
+            checkpoint = self.load_checkpoint()
+            config = self.pipeline_config
+            if checkpoint:
+                after = checkpoint // 1000 - CHECKPOINT_OVERLAP_SECONDS
+                config = replace(config, query=build_email_query(after=after))
+            sheet_id = self.sheet_id or get_sheet_id()
+            pipeline = SyncPipeline(
+                service_factory=self._new_gmail_service,
+                sheets_client=self.sheets_client,
+                sheet_id=sheet_id,
+                sheet_name=self.sheet_name,
+                config=config,
+                progress=self._bump_progress,
+                metrics=self.metrics,
+                # Rows are spooled locally and appended by the write-behind
+                # flusher, so a throttled append is retried instead of lost
+                write_queue=get_write_queue(),
+                rollups=get_rollup_store(),
+                # The dashboard's priority inbox covers the Email sheet of its own spreadsheet
+                priority=(get_priority_index()
+                          if self.sheet_name == "Email" and sheet_id == _dashboard_sheet_id() else None),
+            )
+            rows_added = pipeline.run()
+            self.last_sync_count = rows_added
+            print(f"[{now}] Found {pipeline.listed} emails")
+            print(f"[{now}] ✓ Added {rows_added} rows" if rows_added else f"[{now}] ✓ No new rows")
 
             self.last_sync_time = datetime.now()
+            self.last_error = None
+            ok = not pipeline.errors
+            if pipeline.errors:
+                stage, _, error = pipeline.errors[-1]
+                self.last_error = f"{len(pipeline.errors)} sync error(s), last in {stage}: {error}"
+            self._adapt_interval(rows_added, any(is_quota_error(err) for _, _, err in pipeline.errors))
+
+            # Only advance past messages we know were all seen and written:
+            # a capped listing (max_messages reached) may have skipped older mail
+            if ok and pipeline.newest_internal_date and pipeline.listed < config.max_messages:
+                if pipeline.newest_internal_date > (checkpoint or 0):
+                    self.save_checkpoint(pipeline.newest_internal_date)
 
         except Exception as e:
             print(f"[{datetime.now().strftime('%H:%M:%S')}] ✗ Sync error: {e}")
+            self.last_error = f"Sync error: {e}"
+            if is_quota_error(e):
+                self._adapt_interval(0, quota_error=True)
             import traceback
             traceback.print_exc()
+        finally:
+            self.metrics.end_run(ok)
+            self._update_progress(stage="idle")
+            if self.metrics_path:
+                try:
+                    self.metrics.write_prometheus(self.metrics_path)
+                except OSError as e:
+                    print(f"Could not write sync metrics to {self.metrics_path}: {e}")
 
-    def start(self, interval_minutes=4):
-        """Start background sync scheduler"""
+    def _adapt_interval(self, new_rows, quota_error=False):
+        """Feed one sync result to the adaptive policy and reschedule if the interval changed."""
+        if self.adaptive is None:
+            return
+        previous = self.interval_minutes
+        self.interval_minutes = self.adaptive.observe(new_rows, quota_error=quota_error)
+        if self.is_running and abs(self.interval_minutes - previous) >= 0.25:
+            print(f"[{datetime.now().strftime('%H:%M:%S')}] Sync interval {previous:.1f} → "
+                  f"{self.interval_minutes:.1f} min{' (quota backoff)' if quota_error else ''}")
+            try:
+                self.scheduler.reschedule_job('gmail_sync_job', trigger='interval', minutes=self.interval_minutes)
+            except Exception as e:
+                print(f"Could not reschedule sync job: {e}")
+
+    def start(self, interval_minutes=4, adaptive=False, min_interval_minutes=1,
+              max_interval_minutes=30, target_per_sync=2):
+        """Start background sync scheduler.
+
+        With ``adaptive=True`` the interval starts at ``interval_minutes`` and
+        then follows the observed arrival rate within
+        [``min_interval_minutes``, ``max_interval_minutes``], backing off on
+        quota errors (see AdaptiveInterval).
+        """
         if not self.is_running:
+            self.interval_minutes = interval_minutes
+            if adaptive:
+                self.adaptive = AdaptiveInterval(
+                    initial_minutes=interval_minutes,
+                    min_minutes=min_interval_minutes,
+                    max_minutes=max_interval_minutes,
+                    target_per_sync=target_per_sync,
+                )
+                self.interval_minutes = self.adaptive.interval_minutes
+            mode = f"adaptive {min_interval_minutes}–{max_interval_minutes} min" if adaptive else f"every {interval_minutes} min"
             print(f"\n{'='*60}")
-            print(f"Starting Gmail scheduler (every {interval_minutes} min)")
+            print(f"Starting Gmail scheduler ({mode})")
             print(f"{'='*60}")
 
             if self.initialize_services():
-                # Run once immediately
-                self.sync_emails()
+                from apscheduler.schedulers.background import BackgroundScheduler
+
+                if self.scheduler is None:
+                    self.scheduler = BackgroundScheduler()
 
-                # Schedule recurring
+                # Schedule recurring, with the first run right away on the
+                # scheduler's thread so the caller (a page render) isn't blocked
                 self.scheduler.add_job(
                     self.sync_emails,
                     'interval',
-                    minutes=interval_minutes,
-                    id='gmail_sync_job'
+                    minutes=self.interval_minutes,
+                    next_run_time=datetime.now(),
+                    id='gmail_sync_job',
+                    max_instances=1,
+                    coalesce=True,
                 )
                 self.scheduler.start()
                 self.is_running = True
@@ -125,6 +435,7 @@ class GmailSyncScheduler:
     def stop(self):
         if self.is_running:
             self.scheduler.shutdown()
+            self.scheduler = None
             self.is_running = False
             print("Scheduler stopped")
 
@@ -140,18 +451,207 @@ class GmailSyncScheduler:
                 pass
 
         return {
+            "name": self.name,
+            "sheet_name": self.sheet_name,
             "is_running": self.is_running,
             "last_sync_time": self.last_sync_time,
             "last_sync_count": self.last_sync_count,
             "next_run_time": next_run,
+            "last_error": self.last_error,
+            "sync_in_progress": self.sync_in_progress,
+            "progress": self._progress_snapshot(),
+            "metrics": self.metrics.snapshot(),
+            "interval_minutes": self.interval_minutes,
+            "adaptive": self.adaptive is not None,
+            "arrival_rate_per_hour": (
+                self.adaptive.rate_per_minute * 60
+                if self.adaptive and self.adaptive.rate_per_minute is not None else None
+            ),
+            "quota_backoff": bool(self.adaptive and self.adaptive.backoff),
+            "write_queue": _write_queue_stats(),
         }
 
 
+class MultiMailboxScheduler:
+    """Runs one GmailSyncScheduler per configured mailbox on a shared, bounded pool.
+
+    A single APScheduler job ticks every ``tick_seconds`` and hands the
+    mailboxes that are due to a ``max_workers`` thread pool, least recently
+    synced first, so one busy or slow inbox cannot starve the others and
+    at most ``max_workers`` syncs hit the APIs at once. Each mailbox keeps
+    its own credentials, checkpoint, target sheet, metrics and (adaptive)
+    interval. ``get_status()`` has the same top-level keys as the
+    single-mailbox scheduler plus a per-mailbox ``mailboxes`` dict.
+    """
+
+    def __init__(self, mailbox_configs, max_workers=4, pipeline_config=None, metrics_path=None,
+                 tick_seconds=30):
+        metrics_path = metrics_path or os.getenv("GMAIL_SYNC_METRICS_PATH")
+        record_dir, replay_dir = os.getenv("GMAIL_SYNC_RECORD"), os.getenv("GMAIL_SYNC_REPLAY")
+        self.mailboxes = {}
+        for cfg in mailbox_configs:
+            path = None
+            if metrics_path:
+                root, ext = os.path.splitext(metrics_path)
+                path = f"{root}_{cfg['name']}{ext}"
+            self.mailboxes[cfg["name"]] = GmailSyncScheduler(
+                sheet_name=cfg.get("sheet_name", "Email"),
+                pipeline_config=pipeline_config,
+                metrics_path=path,
+                name=cfg["name"],
+                token_path=cfg.get("token_path"),
+                sheet_id=cfg.get("sheet_id"),
+                checkpoint_path=cfg.get("checkpoint_path"),
+                # One fixture directory per mailbox
+                record_dir=os.path.join(record_dir, cfg["name"]) if record_dir else None,
+                replay_dir=os.path.join(replay_dir, cfg["name"]) if replay_dir else None,
+            )
+        self.max_workers = max_workers
+        self.tick_seconds = tick_seconds
+        self.scheduler = None
+        self.is_running = False
+        self._pool = None
+        self._lock = threading.Lock()
+        self._queued = set()
+        self._next_due = {}
+
+    @property
+    def sync_in_progress(self):
+        return bool(self._queued) or any(mb.sync_in_progress for mb in self.mailboxes.values())
+
+    def _submit(self, names):
+        """Queue syncs for ``names`` (skipping ones already queued or running), oldest sync first."""
+        with self._lock:
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="gmail-sync")
+            candidates = [
+                self.mailboxes[n] for n in names
+                if n not in self._queued and not self.mailboxes[n].sync_in_progress
+            ]
+            candidates.sort(key=lambda mb: mb.last_sync_time or datetime.min)
+            for mb in candidates:
+                self._queued.add(mb.name)
+                self._pool.submit(self._run_mailbox, mb)
+            return len(candidates)
+
+    def _run_mailbox(self, mb):
+        try:
+            mb.sync_emails()
+        finally:
+            with self._lock:
+                self._queued.discard(mb.name)
+                self._next_due[mb.name] = datetime.now() + timedelta(minutes=mb.interval_minutes or 4)
+
+    def _dispatch(self):
+        now = datetime.now()
+        due = [name for name in self.mailboxes if self._next_due.get(name, now) <= now]
+        if due:
+            self._submit(due)
+
+    def trigger_sync(self, name=None):
+        """Queue a sync of one mailbox (or all); False if nothing could be queued."""
+        names = [name] if name else list(self.mailboxes)
+        return self._submit(names) > 0
+
+    def start(self, interval_minutes=4, adaptive=False, min_interval_minutes=1,
+              max_interval_minutes=30, target_per_sync=2):
+        """Start the dispatcher; every mailbox is synced right away, then on its own interval."""
+        if self.is_running:
+            return
+        print(f"\n{'='*60}")
+        print(f"Starting Gmail scheduler for {len(self.mailboxes)} mailboxes "
+              f"({self.max_workers} parallel syncs)")
+        print(f"{'='*60}")
+        for mb in self.mailboxes.values():
+            mb.interval_minutes = interval_minutes
+            if adaptive:
+                mb.adaptive = AdaptiveInterval(
+                    initial_minutes=interval_minutes,
+                    min_minutes=min_interval_minutes,
+                    max_minutes=max_interval_minutes,
+                    target_per_sync=target_per_sync,
+                )
+                mb.interval_minutes = mb.adaptive.interval_minutes
+
+        from apscheduler.schedulers.background import BackgroundScheduler
+
+        self.scheduler = BackgroundScheduler()
+        self.scheduler.add_job(
+            self._dispatch,
+            'interval',
+            seconds=self.tick_seconds,
+            next_run_time=datetime.now(),
+            id='gmail_dispatch_job',
+            max_instances=1,
+            coalesce=True,
+        )
+        self.scheduler.start()
+        self.is_running = True
+        print("✓ Scheduler started")
+
+    def stop(self):
+        if self.is_running:
+            self.scheduler.shutdown()
+            self.scheduler = None
+            self.is_running = False
+        if self._pool is not None:
+            self._pool.shutdown(wait=False)
+            self._pool = None
+        print("Scheduler stopped")
+
+    def get_status(self):
+        mailboxes = {}
+        for name, mb in self.mailboxes.items():
+            status = mb.get_status()
+            status["next_run_time"] = self._next_due.get(name)
+            status["queued"] = name in self._queued and not mb.sync_in_progress
+            mailboxes[name] = status
+        statuses = list(mailboxes.values())
+        synced = [s["last_sync_time"] for s in statuses if s["last_sync_time"]]
+        due = [s["next_run_time"] for s in statuses if s["next_run_time"]]
+        errors = [f"{s['name']}: {s['last_error']}" for s in statuses if s["last_error"]]
+        progress = GmailSyncScheduler._empty_progress()
+        for s in statuses:
+            if s["sync_in_progress"]:
+                progress["stage"] = "syncing"
+                for key in ("total", "fetched", "parsed", "appended"):
+                    progress[key] += s["progress"][key]
+        return {
+            "is_running": self.is_running,
+            "last_sync_time": max(synced) if synced else None,
+            "last_sync_count": sum(s["last_sync_count"] for s in statuses),
+            "next_run_time": min(due) if due else None,
+            "last_error": "; ".join(errors) or None,
+            "sync_in_progress": self.sync_in_progress,
+            "progress": progress,
+            "mailboxes": mailboxes,
+            "write_queue": _write_queue_stats(),
+        }
+
+
+def _write_queue_stats():
+    write_queue = get_write_queue()
+    return write_queue.stats() if write_queue is not None else None
+
+
 # Singleton
 _scheduler = None
 
 def get_scheduler():
+    """The process-wide scheduler: a GmailSyncScheduler for the single default
+    inbox, or a MultiMailboxScheduler when secrets.toml lists several mailboxes."""
     global _scheduler
     if _scheduler is None:
-        _scheduler = GmailSyncScheduler()
+        configs = get_mailbox_configs()
+        if len(configs) > 1:
+            _scheduler = MultiMailboxScheduler(configs, max_workers=int(os.getenv("GMAIL_SYNC_WORKERS", "4")))
+        else:
+            cfg = configs[0]
+            _scheduler = GmailSyncScheduler(
+                sheet_name=cfg.get("sheet_name", "Email"),
+                name=cfg["name"],
+                token_path=cfg.get("token_path"),
+                sheet_id=cfg.get("sheet_id"),
+                checkpoint_path=cfg.get("checkpoint_path"),
+            )
     return _scheduler
@@ -1,19 +1,21 @@
 # gmail_to_sheets.py
 import os
-import base64
+import sys
 import json
-import toml
 from datetime import datetime
-from google.auth.transport.requests import Request
-from google.oauth2.credentials import Credentials
-from google_auth_oauthlib.flow import InstalledAppFlow
-from googleapiclient.discovery import build
-from googleapiclient.errors import HttpError
-import gspread
-from google.oauth2.service_account import Credentials as ServiceAccountCredentials
+from functools import lru_cache
 import pandas as pd
 from email.utils import parsedate_to_datetime
 
+# Allow running as a script (python libs/gmail_to_sheets.py)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from libs.mime_text import extract_body_text
+
+# google-auth, googleapiclient, gspread and toml are imported inside the
+# functions that need them, and secrets.toml is read on first use, so
+# importing this module is cheap and never exits the process.
+
 # Gmail API scopes
 GMAIL_SCOPES = ['https://www.googleapis.com/auth/gmail.readonly']
 
@@ -21,9 +23,18 @@ GMAIL_SCOPES = ['https://www.googleapis.com/auth/gmail.readonly']
 SHEETS_SCOPES = ['https://www.googleapis.com/auth/spreadsheets', 
                  'https://www.googleapis.com/auth/drive']
 
+ALLOWED_DOMAINS = ['umd.edu', 'terpmail.umd.edu']
+
+
+class ConfigError(RuntimeError):
+    """Raised when secrets.toml or a required credentials section is missing."""
+
+
 # Load configuration from secrets.toml
 def load_config():
     """Load configuration from .streamlit/secrets.toml"""
+    import toml
+
     # Try multiple possible locations
     possible_paths = [
         '.streamlit/secrets.toml',
@@ -43,21 +54,63 @@ def load_config():
                 print(f"Error reading {path}: {e}")
                 continue
     
-    print("Error: secrets.toml not found!")
-    print("Searched in:", possible_paths)
-    exit(1)
+    raise ConfigError(f"secrets.toml not found! Searched in: {possible_paths}")
 
-config = load_config()
-SHEET_ID = config.get("SHEET_ID")
-ALLOWED_DOMAINS = ['umd.edu', 'terpmail.umd.edu']
 
+@lru_cache(maxsize=1)
+def get_config():
+    """Return the parsed secrets.toml, loading it once per process."""
+    return load_config()
+
+
+def get_sheet_id():
+    return get_config().get("SHEET_ID")
+
+
+def get_mailbox_configs():
+    """Mailboxes to sync, from ``[[mailboxes]]`` tables in secrets.toml.
+
+    Each entry needs a ``name`` and may set ``token_path`` (OAuth token for
+    that inbox), ``sheet_id``, ``sheet_name`` and ``checkpoint_path``.
+    Without a ``mailboxes`` section the single ``gmail_token.json`` inbox
+    is used, writing to the "Email" worksheet of ``SHEET_ID``.
+    """
+    try:
+        mailboxes = get_config().get("mailboxes") or []
+    except ConfigError:
+        mailboxes = []
+    if not mailboxes:
+        return [{"name": "default", "token_path": DEFAULT_TOKEN_PATH, "sheet_name": "Email"}]
+    configs = []
+    for i, mailbox in enumerate(mailboxes):
+        mailbox = dict(mailbox)
+        mailbox.setdefault("name", f"mailbox{i + 1}")
+        mailbox.setdefault("token_path", os.path.join(os.path.dirname(DEFAULT_TOKEN_PATH), f"gmail_token_{mailbox['name']}.json"))
+        mailbox.setdefault("sheet_name", "Email")
+        configs.append(mailbox)
+    return configs
+
+
+def __getattr__(name):
+    # Backwards-compatible lazy module attributes (`config`, `SHEET_ID`)
+    if name == "config":
+        return get_config()
+    if name == "SHEET_ID":
+        return get_sheet_id()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+DEFAULT_TOKEN_PATH = os.path.join(os.path.dirname(__file__), '..', 'gmail_token.json')
+
+
+def get_gmail_credentials(token_path=DEFAULT_TOKEN_PATH):
+    """Load (refreshing or creating if needed) Gmail OAuth credentials."""
+    from google.auth.transport.requests import Request
+    from google.oauth2.credentials import Credentials
 
-def authenticate_gmail():
-    """Authenticate and return Gmail API service using OAuth from secrets.toml."""
     creds = None
     
     # Check if we have a saved token
-    token_path = os.path.join(os.path.dirname(__file__), '..', 'gmail_token.json')
     if os.path.exists(token_path):
         creds = Credentials.from_authorized_user_file(token_path, GMAIL_SCOPES)
     
@@ -67,11 +120,12 @@ def authenticate_gmail():
             creds.refresh(Request())
         else:
             # Create OAuth config from secrets.toml
-            gmail_oauth = config.get('gmail_oauth', {})
+            gmail_oauth = get_config().get('gmail_oauth', {})
             if not gmail_oauth:
-                print("Error: gmail_oauth section missing in secrets.toml")
-                print("Please add Gmail OAuth credentials to your secrets.toml")
-                exit(1)
+                raise ConfigError(
+                    "gmail_oauth section missing in secrets.toml. "
+                    "Please add Gmail OAuth credentials to your secrets.toml"
+                )
             
             client_config = {
                 "installed": {
@@ -84,6 +138,8 @@ def authenticate_gmail():
                 }
             }
             
+            from google_auth_oauthlib.flow import InstalledAppFlow
+
             flow = InstalledAppFlow.from_client_config(client_config, GMAIL_SCOPES)
             creds = flow.run_local_server(port=0)
         
@@ -91,16 +147,30 @@ def authenticate_gmail():
         with open(token_path, 'w') as token:
             token.write(creds.to_json())
     
-    return build('gmail', 'v1', credentials=creds)
+    return creds
+
+
+def build_gmail_service(creds):
+    """Build a Gmail API service. Services are not thread-safe: build one per thread."""
+    from googleapiclient.discovery import build
+
+    return build('gmail', 'v1', credentials=creds, cache_discovery=False)
+
+
+def authenticate_gmail():
+    """Authenticate and return Gmail API service using OAuth from secrets.toml."""
+    return build_gmail_service(get_gmail_credentials())
 
 
 def authenticate_sheets():
     """Authenticate and return Google Sheets client using service account from secrets.toml."""
-    service_account_info = config.get('gcp_service_account', {})
+    import gspread
+    from google.oauth2.service_account import Credentials as ServiceAccountCredentials
+
+    service_account_info = get_config().get('gcp_service_account', {})
     
     if not service_account_info:
-        print("Error: gcp_service_account section missing in secrets.toml")
-        exit(1)
+        raise ConfigError("gcp_service_account section missing in secrets.toml")
     
     creds = ServiceAccountCredentials.from_service_account_info(
         service_account_info, 
@@ -110,78 +180,115 @@ def authenticate_sheets():
 
 
 def get_email_body(payload):
-    """Extract email body from message payload."""
-    body = ""
+    """Extract the full email body text (HTML converted to text) from a message payload."""
+    return extract_body_text(payload, limit=None)
+
+
+EMAIL_SHEET_HEADERS = ['Name', 'Email', 'UID', 'Time', 'Date', 'Subject', 'Content', 'Message ID', 'Thread ID']
+
+
+def fetch_message(service, message_id, fmt='full'):
+    """Download one Gmail message."""
+    return service.users().messages().get(userId='me', id=message_id, format=fmt).execute()
+
+
+# Partial responses for the two-phase fetch: headers first, then only the
+# body parts get_email_body() reads, for messages that survive filtering.
+METADATA_HEADERS = ['From', 'Date', 'Subject']
+METADATA_FIELDS = 'id,threadId,internalDate,payload/headers'
+BODY_FIELDS = 'id,payload(mimeType,body/data,parts(mimeType,filename,body/data,parts(mimeType,filename,body/data,parts)))'
+
+
+def fetch_message_metadata(service, message_id):
+    """Download only the From/Date/Subject headers of a message."""
+    return service.users().messages().get(
+        userId='me', id=message_id, format='metadata',
+        metadataHeaders=METADATA_HEADERS, fields=METADATA_FIELDS,
+    ).execute()
+
+
+def fetch_message_body(service, message_id):
+    """Download only the MIME structure and body data of a message."""
+    return service.users().messages().get(
+        userId='me', id=message_id, format='full', fields=BODY_FIELDS,
+    ).execute()
+
+
+def parse_email_headers(headers):
+    """Sheet row dict without content from a message's headers (None if not from an allowed domain)."""
+    header_dict = {h['name'].lower(): h['value'] for h in headers}
     
-    if 'parts' in payload:
-        for part in payload['parts']:
-            if part['mimeType'] == 'text/plain':
-                if 'data' in part['body']:
-                    body = base64.urlsafe_b64decode(part['body']['data']).decode('utf-8', errors='ignore')
-                    break
-            elif part['mimeType'] == 'text/html' and not body:
-                if 'data' in part['body']:
-                    body = base64.urlsafe_b64decode(part['body']['data']).decode('utf-8', errors='ignore')
-            # Handle nested parts (multipart/alternative, etc.)
-            elif 'parts' in part:
-                nested_body = get_email_body(part)
-                if nested_body:
-                    body = nested_body
-                    break
-    else:
-        if 'body' in payload and 'data' in payload['body']:
-            body = base64.urlsafe_b64decode(payload['body']['data']).decode('utf-8', errors='ignore')
+    # Extract sender email
+    sender = header_dict.get('from', '')
+    email_address = sender.split('<')[-1].strip('>') if '<' in sender else sender
+    sender_name = sender.split('<')[0].strip().strip('"') if '<' in sender else email_address.split('@')[0]
+    
+    # Check if sender is from allowed domains
+    domain = email_address.split('@')[-1] if '@' in email_address else ''
+    if not any(allowed in domain for allowed in ALLOWED_DOMAINS):
+        return None  # Skip non-UMD emails
     
-    return body.strip()
+    # Extract date
+    date_str = header_dict.get('date', '')
+    try:
+        email_date = parsedate_to_datetime(date_str)
+        date_only = email_date.strftime('%Y-%m-%d')
+        time_only = email_date.strftime('%H:%M:%S')
+    except:
+        date_only = datetime.now().strftime('%Y-%m-%d')
+        time_only = datetime.now().strftime('%H:%M:%S')
+    
+    return {
+        'name': sender_name,
+        'email': email_address,
+        'uid': None,  # Will be filled by matching with student database
+        'time': time_only,
+        'date': date_only,
+        'subject': header_dict.get('subject', '(No Subject)'),
+        'content': '',
+        'message_id': None,
+        'thread_id': None,
+    }
+
+
+# Content length kept in the sheet (avoids sheet size issues)
+CONTENT_CHARS = 2000
+
+
+def email_content(payload):
+    """Body text for the sheet; only as much of the body as needed is decoded."""
+    return extract_body_text(payload, limit=CONTENT_CHARS)
+
+
+def parse_email_message(msg):
+    """Turn a downloaded Gmail message into a sheet row dict (None if not from an allowed domain)."""
+    row = parse_email_headers(msg['payload']['headers'])
+    if row is not None:
+        row['content'] = email_content(msg['payload'])
+        row['message_id'] = msg.get('id')
+        row['thread_id'] = msg.get('threadId')
+    return row
 
 
 def extract_email_data(message, service):
     """Extract relevant data from a Gmail message."""
     try:
-        msg = service.users().messages().get(userId='me', id=message['id'], format='full').execute()
-        
-        headers = msg['payload']['headers']
-        header_dict = {h['name'].lower(): h['value'] for h in headers}
-        
-        # Extract sender email
-        sender = header_dict.get('from', '')
-        email_address = sender.split('<')[-1].strip('>') if '<' in sender else sender
-        sender_name = sender.split('<')[0].strip().strip('"') if '<' in sender else email_address.split('@')[0]
-        
-        # Check if sender is from allowed domains
-        domain = email_address.split('@')[-1] if '@' in email_address else ''
-        if not any(allowed in domain for allowed in ALLOWED_DOMAINS):
-            return None  # Skip non-UMD emails
-        
-        # Extract date
-        date_str = header_dict.get('date', '')
-        try:
-            email_date = parsedate_to_datetime(date_str)
-            date_only = email_date.strftime('%Y-%m-%d')
-            time_only = email_date.strftime('%H:%M:%S')
-        except:
-            date_only = datetime.now().strftime('%Y-%m-%d')
-            time_only = datetime.now().strftime('%H:%M:%S')
-        
-        # Extract subject and body
-        subject = header_dict.get('subject', '(No Subject)')
-        body = get_email_body(msg['payload'])
-        
-        return {
-            'name': sender_name,
-            'email': email_address,
-            'uid': None,  # Will be filled by matching with student database
-            'time': time_only,
-            'date': date_only,
-            'subject': subject,
-            'content': body[:2000]  # Limit content length to avoid sheet size issues
-        }
-    
+        return parse_email_message(fetch_message(service, message['id']))
     except Exception as e:
         print(f"Error extracting email data for message {message.get('id')}: {e}")
         return None
 
 
+def build_uid_lookup(student_cases_df):
+    """Map lower-cased student email -> UID string (first match wins)."""
+    if student_cases_df is None or student_cases_df.empty or 'Email' not in student_cases_df:
+        return {}
+    lookup = {}
+    for email, uid in zip(student_cases_df['Email'].astype(str).str.lower(), student_cases_df['UID']):
+        lookup.setdefault(email, str(uid))
+    return lookup
+
+
 def match_student_uid(email_address, student_cases_df):
     """Match email to student UID from the student database."""
     if student_cases_df is None or student_cases_df.empty:
@@ -195,20 +302,46 @@ def match_student_uid(email_address, student_cases_df):
     return None
 
 
-def fetch_recent_emails(service, max_results=100):
-    """Fetch recent emails from Gmail."""
-    try:
-        # Build query for UMD emails - look for emails in last 7 days
-        query = f"({' OR '.join([f'from:*@{domain}' for domain in ALLOWED_DOMAINS])}) newer_than:7d"
-        
+def build_email_query(newer_than="7d", after=None):
+    """Gmail search query for mail from the allowed domains.
+
+    ``after`` (epoch seconds) narrows the search to mail received since a
+    sync checkpoint; Gmail matches it at one-second granularity, so callers
+    should pass a slightly earlier value and rely on row dedupe.
+    """
+    query = f"({' OR '.join([f'from:*@{domain}' for domain in ALLOWED_DOMAINS])}) newer_than:{newer_than}"
+    if after:
+        query += f" after:{int(after)}"
+    return query
+
+
+def iter_message_ids(service, max_results=100, page_size=100, query=None):
+    """Yield message stubs (``{'id', 'threadId'}``) page by page, up to ``max_results``."""
+    query = query or build_email_query()
+    page_token = None
+    yielded = 0
+    while yielded < max_results:
         results = service.users().messages().list(
             userId='me',
             q=query,
-            maxResults=max_results
+            maxResults=min(page_size, 500, max_results - yielded),
+            pageToken=page_token,
         ).execute()
-        
-        messages = results.get('messages', [])
-        return messages
+        for message in results.get('messages', []):
+            yield message
+            yielded += 1
+        page_token = results.get('nextPageToken')
+        if not page_token:
+            break
+
+
+def fetch_recent_emails(service, max_results=100):
+    """Fetch recent emails from Gmail."""
+    from googleapiclient.errors import HttpError
+
+    try:
+        # UMD emails from the last 7 days, following pagination past 500
+        return list(iter_message_ids(service, max_results=max_results, page_size=max_results))
     
     except HttpError as error:
         print(f"An error occurred fetching emails: {error}")
@@ -227,57 +360,127 @@ def load_student_database(gc, sheet_id):
         return pd.DataFrame()
 
 
-def append_to_email_sheet(gc, sheet_id, email_data_list, sheet_name="Email"):
+def open_email_worksheet(gc, sheet_id, sheet_name="Email"):
+    """Open the email worksheet, creating it (with headers) if needed."""
+    sh = gc.open_by_key(sheet_id)
+    
+    # Try to open the "Email" sheet, create if doesn't exist
+    try:
+        worksheet = sh.worksheet(sheet_name)
+        print(f"Found existing '{sheet_name}' sheet")
+        ensure_email_headers(worksheet)
+    except:
+        print(f"Creating new '{sheet_name}' sheet...")
+        worksheet = sh.add_worksheet(title=sheet_name, rows="1000", cols="10")
+        # Add headers
+        worksheet.append_row(EMAIL_SHEET_HEADERS)
+    return worksheet
+
+
+def ensure_email_headers(worksheet):
+    """Add header cells for columns introduced after the sheet was created (e.g. Thread ID)."""
+    header = worksheet.row_values(1)
+    missing = [name for name in EMAIL_SHEET_HEADERS if name not in header]
+    if not header or not missing:
+        return
+    print(f"Adding columns to '{worksheet.title}': {', '.join(missing)}")
+    for offset, name in enumerate(missing):
+        worksheet.update_cell(1, len(header) + offset + 1, name)
+
+
+def email_row_key(email, date, subject):
+    """Dedupe key for an email row: (lower-cased sender, date, subject)."""
+    return (str(email).lower(), str(date), str(subject))
+
+
+def load_existing_email_keys(worksheet):
+    """Dedupe keys of every row already in the email worksheet."""
+    values = worksheet.get_all_values()
+    if not values:
+        return set()
+    header = values[0]
+    try:
+        e_col, d_col, s_col = header.index('Email'), header.index('Date'), header.index('Subject')
+    except ValueError:
+        return set()
+    width = max(e_col, d_col, s_col) + 1
+    return {
+        email_row_key(row[e_col], row[d_col], row[s_col])
+        for row in values[1:]
+        if len(row) >= width
+    }
+
+
+def email_values_key(values):
+    """Dedupe key of a row in EMAIL_SHEET_HEADERS order."""
+    return email_row_key(values[1], values[4], values[5])
+
+
+def register_email_target(write_queue, gc, sheet_id, sheet_name="Email"):
+    """Register the email worksheet with a write-behind queue; returns the target name."""
+    target = f"email:{sheet_id}:{sheet_name}"
+    write_queue.register_target(
+        target,
+        lambda: open_email_worksheet(gc, sheet_id, sheet_name),
+        key_fn=email_values_key,
+    )
+    return target
+
+
+def email_row_values(email_data):
+    """Sheet row (in EMAIL_SHEET_HEADERS order) for an email dict."""
+    return [
+        email_data['name'],
+        email_data['email'],
+        email_data['uid'] or '',
+        email_data['time'],
+        email_data['date'],
+        email_data['subject'],
+        email_data['content'],
+        email_data.get('message_id') or '',
+        email_data.get('thread_id') or '',
+    ]
+
+
+def append_to_email_sheet(gc, sheet_id, email_data_list, sheet_name="Email", write_queue=None, rollups=None):
     """Append new emails to a sheet in Google Sheets.
 
     Defaults to the 'Email' sheet unless another name is provided.
+    Duplicates (same sender, date and subject) are skipped and the new rows
+    are written in a single batched request, or handed to ``write_queue``
+    (see libs/write_queue.py) so a failed append is retried, not lost.
+    New rows are also counted in ``rollups`` (see libs/rollups.py).
     """
     try:
-        sh = gc.open_by_key(sheet_id)
-        
-        # Try to open the "Email" sheet, create if doesn't exist
-        try:
-            worksheet = sh.worksheet(sheet_name)
-            print(f"Found existing '{sheet_name}' sheet")
-        except:
-            print(f"Creating new '{sheet_name}' sheet...")
-            worksheet = sh.add_worksheet(title=sheet_name, rows="1000", cols="10")
-            # Add headers
-            headers = ['Name', 'Email', 'UID', 'Time', 'Date', 'Subject', 'Content']
-            worksheet.append_row(headers)
+        worksheet = open_email_worksheet(gc, sheet_id, sheet_name)
         
         # Get existing emails to avoid duplicates
-        existing_data = worksheet.get_all_records()
-        existing_df = pd.DataFrame(existing_data)
+        existing_keys = load_existing_email_keys(worksheet)
         
-        # Append new emails
-        rows_added = 0
+        rows = []
+        new_emails = []
         for email_data in email_data_list:
             # Check if email already exists (by email, date, and subject)
-            if not existing_df.empty:
-                duplicate = existing_df[
-                    (existing_df['Email'].astype(str).str.lower() == email_data['email'].lower()) &
-                    (existing_df['Date'].astype(str) == email_data['date']) &
-                    (existing_df['Subject'].astype(str) == email_data['subject'])
-                ]
-                if not duplicate.empty:
-                    print(f"  Skipping duplicate: {email_data['subject'][:50]}...")
-                    continue  # Skip duplicate
-            
-            row = [
-                email_data['name'],
-                email_data['email'],
-                email_data['uid'] or '',
-                email_data['time'],
-                email_data['date'],
-                email_data['subject'],
-                email_data['content']
-            ]
-            worksheet.append_row(row)
-            rows_added += 1
+            key = email_row_key(email_data['email'], email_data['date'], email_data['subject'])
+            if key in existing_keys:
+                print(f"  Skipping duplicate: {email_data['subject'][:50]}...")
+                continue  # Skip duplicate
+            existing_keys.add(key)
+            rows.append(email_row_values(email_data))
+            new_emails.append(email_data)
             print(f"  Added: {email_data['subject'][:50]}... from {email_data['email']}")
         
-        return rows_added
+        added = len(rows)
+        if rows and write_queue is not None:
+            target = register_email_target(write_queue, gc, sheet_id, sheet_name)
+            added = write_queue.enqueue(target, rows, [email_values_key(row) for row in rows])
+        elif rows:
+            worksheet.append_rows(rows)
+        if new_emails and rollups is not None:
+            from libs.rollups import rollup_sheet
+
+            rollups.add_email_rows(new_emails, sheet=rollup_sheet(sheet_id, sheet_name))
+        return added
     
     except Exception as e:
         print(f"Error appending to sheet: {e}")
@@ -290,13 +493,19 @@ def main():
     print("Gmail to Google Sheets Sync")
     print("=" * 60)
     
-    print("\n[1/5] Authenticating with Gmail...")
-    gmail_service = authenticate_gmail()
-    print("✓ Gmail authenticated")
-    
-    print("\n[2/5] Authenticating with Google Sheets...")
-    sheets_client = authenticate_sheets()
-    print("✓ Google Sheets authenticated")
+    try:
+        SHEET_ID = get_sheet_id()
+
+        print("\n[1/5] Authenticating with Gmail...")
+        gmail_service = authenticate_gmail()
+        print("✓ Gmail authenticated")
+        
+        print("\n[2/5] Authenticating with Google Sheets...")
+        sheets_client = authenticate_sheets()
+        print("✓ Google Sheets authenticated")
+    except ConfigError as e:
+        print(f"Error: {e}")
+        return 1
     
     print("\n[3/5] Loading student database...")
     student_cases_df = load_student_database(sheets_client, SHEET_ID)
@@ -322,7 +531,15 @@ def main():
     # Append to Google Sheet
     if email_data_list:
         print(f"\nAppending to 'Email' sheet in Google Sheets...")
-        rows_added = append_to_email_sheet(sheets_client, SHEET_ID, email_data_list)
+        from libs.rollups import get_rollup_store
+        from libs.write_queue import get_write_queue
+
+        write_queue = get_write_queue()
+        rows_added = append_to_email_sheet(sheets_client, SHEET_ID, email_data_list,
+                                           write_queue=write_queue, rollups=get_rollup_store())
+        pending = write_queue.flush(timeout=60)
+        if pending:
+            print(f"! {pending} rows are still spooled in {write_queue.path}; they are retried on the next run")
         print(f"\n{'=' * 60}")
         print(f"✓ COMPLETE: Added {rows_added} new emails to 'Email' sheet")
         print(f"{'=' * 60}")
@@ -331,4 +548,4 @@ def main():
 
 
 if __name__ == "__main__":
-    main()
+    raise SystemExit(main())
@@ -1,26 +1,80 @@
 import os
+import re
+from datetime import datetime
+from functools import lru_cache
+
 import streamlit as st
-from groq import Groq
-import gspread
-from google.oauth2.service_account import Credentials
+
+from libs.draft_check import precheck_draft, precheck_report
+from libs.llm_json import EmailSkeleton, parse_json_object
+from libs.write_queue import get_write_queue
+
+# groq, gspread and google-auth are imported on first use so that importing
+# this module (and therefore app.py) stays cheap and never fails on a
+# missing key; clients are built once per process.
+
 
 # === GROQ SETUP ===
-GROQ_API_KEY = (
-    st.secrets.get("GROQ_API")
-    or st.secrets.get("GROQ_API_KEY")
-    or os.getenv("GROQ_API")
-    or os.getenv("GROQ_API_KEY")
-)
+def _secret(name):
+    """Read a Streamlit secret, tolerating a missing secrets.toml (CLI/bench runs)."""
+    try:
+        return st.secrets.get(name)
+    except Exception:
+        return None
 
-if not GROQ_API_KEY:
-    st.error("GROQ API key not found. Set GROQ_API or GROQ_API_KEY in secrets or env.")
-    raise RuntimeError("Missing GROQ API key")
 
-client = Groq(api_key=GROQ_API_KEY)
+GROQ_MODEL = "llama-3.1-8b-instant"
+
+
+@lru_cache(maxsize=1)
+def get_client():
+    """Return the process-wide Groq client, building it on first use.
+
+    Raises RuntimeError if no API key is configured. Set GROQ_BASE_URL to
+    point the client at a local stub (see libs/fake_llm.py) and
+    GROQ_MAX_RETRIES to override the SDK's retry count.
+    """
+    api_key = (
+        _secret("GROQ_API")
+        or _secret("GROQ_API_KEY")
+        or os.getenv("GROQ_API")
+        or os.getenv("GROQ_API_KEY")
+    )
+    if not api_key:
+        raise RuntimeError("GROQ API key not found. Set GROQ_API or GROQ_API_KEY in secrets or env.")
+
+    from groq import Groq
+
+    base_url = _secret("GROQ_BASE_URL") or os.getenv("GROQ_BASE_URL")
+    kwargs = {}
+    if os.getenv("GROQ_MAX_RETRIES"):
+        kwargs["max_retries"] = int(os.environ["GROQ_MAX_RETRIES"])
+    return Groq(api_key=api_key, base_url=base_url, **kwargs)
 
 
 # === GOOGLE SHEETS SETUP ===
 # Requires Streamlit secrets: "google_credentials" and "SHEET_ID"
+@lru_cache(maxsize=1)
+def _get_gspread_client():
+    import gspread
+    from google.oauth2.service_account import Credentials
+
+    svc_info = (
+        _secret("google_credentials")
+        or _secret("gcp_service_account")
+    )
+    if not svc_info:
+        raise KeyError(
+            'Missing service account in secrets. Add either "google_credentials" or "gcp_service_account".'
+        )
+
+    creds = Credentials.from_service_account_info(
+        svc_info,
+        scopes=["https://www.googleapis.com/auth/spreadsheets"],
+    )
+    return gspread.authorize(creds)
+
+
 def connect_to_sheet():
     """Connect to Google Sheets using service account from secrets.
 
@@ -28,20 +82,7 @@ def connect_to_sheet():
     inside `.streamlit/secrets.toml`.
     """
     try:
-        svc_info = (
-            st.secrets.get("google_credentials")
-            or st.secrets.get("gcp_service_account")
-        )
-        if not svc_info:
-            raise KeyError(
-                'Missing service account in secrets. Add either "google_credentials" or "gcp_service_account".'
-            )
-
-        creds = Credentials.from_service_account_info(
-            svc_info,
-            scopes=["https://www.googleapis.com/auth/spreadsheets"],
-        )
-        gs_client = gspread.authorize(creds)
+        gs_client = _get_gspread_client()
         sheet_id = st.secrets["SHEET_ID"]
         return gs_client.open_by_key(sheet_id)
     except Exception as e:
@@ -49,16 +90,38 @@ def connect_to_sheet():
         raise
 
 
+# === DRAFTS SHEET ===
+DRAFTS_TARGET = "drafts"
+# Saved At / Message ID / Thread ID / Advisor feed the response-time analytics (libs/response_times.py)
+DRAFTS_HEADERS = ["Email Text", "Skeleton", "Draft", "Fact Check", "Saved At", "Message ID", "Thread ID", "Advisor"]
+
+
+def _open_drafts_worksheet():
+    import gspread
+
+    spreadsheet = _get_gspread_client().open_by_key(_secret("SHEET_ID"))
+    try:
+        worksheet = spreadsheet.worksheet("drafts")
+    except gspread.WorksheetNotFound:
+        worksheet = spreadsheet.add_worksheet(title="drafts", rows=1000, cols=10)
+    header = worksheet.row_values(1)
+    if header[:1] != DRAFTS_HEADERS[:1]:
+        # Sheets created before drafts had a header row start with data
+        worksheet.insert_row(DRAFTS_HEADERS, 1)
+    elif len(header) < len(DRAFTS_HEADERS):
+        for col in range(len(header), len(DRAFTS_HEADERS)):
+            worksheet.update_cell(1, col + 1, DRAFTS_HEADERS[col])
+    return worksheet
+
+
+def register_drafts_target(write_queue=None):
+    """Let this process flush spooled drafts (the worksheet is opened on the flusher thread)."""
+    (write_queue or get_write_queue()).register_target(DRAFTS_TARGET, _open_drafts_worksheet)
+
+
 # === FUNCTION 1: Generate Email Skeleton ===
-def generate_email_skeleton(email_text: str, student_summary: str = None) -> str:
-    """
-    Generates a structured skeleton for a reply:
-    - Summarizes the email
-    - Lists what to include in the reply
-    - Suggests useful links/resources
-    - Adds a placeholder for the user’s draft
-    """
-    prompt = f"""
+def _skeleton_prompt(email_text: str, student_summary: str = None) -> str:
+    return f"""
 You are an academic assistant who helps advisors draft responses to student emails.
 
 Student summary:
@@ -84,11 +147,20 @@ Example JSON structure:
 }}
 """
 
-    resp = client.chat.completions.create(
-        model="llama-3.1-8b-instant",
+
+def generate_email_skeleton(email_text: str, student_summary: str = None) -> str:
+    """
+    Generates a structured skeleton for a reply:
+    - Summarizes the email
+    - Lists what to include in the reply
+    - Suggests useful links/resources
+    - Adds a placeholder for the user’s draft
+    """
+    resp = get_client().chat.completions.create(
+        model=GROQ_MODEL,
         messages=[
             {"role": "system", "content": "You are a helpful academic assistant."},
-            {"role": "user", "content": prompt},
+            {"role": "user", "content": _skeleton_prompt(email_text, student_summary)},
         ],
         max_tokens=600,
         temperature=0.3,
@@ -97,16 +169,56 @@ Example JSON structure:
     return resp.choices[0].message.content
 
 
+def generate_email_skeleton_structured(email_text: str, student_summary: str = None) -> EmailSkeleton:
+    """
+    Same as generate_email_skeleton, but requests JSON mode and returns a
+    typed EmailSkeleton. Output is parsed tolerantly: prose around the JSON,
+    truncated responses and JSON-mode validation failures are repaired
+    locally (see libs/llm_json.py) rather than triggering a regeneration.
+    Any schema problems are listed in ``skeleton.issues``.
+    """
+    try:
+        resp = get_client().chat.completions.create(
+            model=GROQ_MODEL,
+            messages=[
+                {"role": "system", "content": "You are a helpful academic assistant. Reply with a single JSON object."},
+                {"role": "user", "content": _skeleton_prompt(email_text, student_summary)},
+            ],
+            max_tokens=600,
+            temperature=0.3,
+            response_format={"type": "json_object"},
+        )
+    except Exception as e:
+        # Groq rejects JSON-mode output that fails validation but returns the
+        # generation itself; salvage it instead of asking again.
+        failed = _failed_generation(e)
+        if failed is None:
+            raise
+        return EmailSkeleton.from_text(failed, truncated=True)
+
+    choice = resp.choices[0]
+    return EmailSkeleton.from_text(choice.message.content, truncated=choice.finish_reason == "length")
+
+
+def _failed_generation(error):
+    body = getattr(error, "body", None)
+    if isinstance(body, dict):
+        err = body.get("error", body)
+        if isinstance(err, dict) and err.get("failed_generation"):
+            return err["failed_generation"]
+    return None
+
+
 # Backwards-compatible alias expected by app.py
 def generate_skeleton_openai(email_text: str, student_summary: str = None) -> str:
     return generate_email_skeleton(email_text, student_summary)
 
 
 # === FUNCTION 2: Fact Check and Save ===
-def fact_check_and_save(user_draft: str, skeleton: str, email_text: str):
+def fact_check_draft(user_draft: str, skeleton: str, email_text: str) -> str:
     """
-    Fact-checks the user's draft against the skeleton + original email,
-    and saves it to Google Sheets if it passes.
+    Asks the LLM to fact-check the user's draft against the skeleton +
+    original email. Returns the raw JSON report; nothing is saved.
     """
     prompt = f"""
 You are a precise fact-checker.
@@ -136,27 +248,63 @@ Return a JSON:
 }}
 """
 
-    resp = client.chat.completions.create(
-        model="llama-3.1-8b-instant",
-        messages=[
-            {"role": "system", "content": "You are a strict and helpful reviewer."},
-            {"role": "user", "content": prompt},
-        ],
-        max_tokens=400,
-        temperature=0.2,
-    )
+    try:
+        resp = get_client().chat.completions.create(
+            model=GROQ_MODEL,
+            messages=[
+                {"role": "system", "content": "You are a strict and helpful reviewer."},
+                {"role": "user", "content": prompt},
+            ],
+            max_tokens=400,
+            temperature=0.2,
+            response_format={"type": "json_object"},
+        )
+    except Exception as e:
+        failed = _failed_generation(e)
+        if failed is None:
+            raise
+        return failed
+
+    return resp.choices[0].message.content
+
+
+def is_factually_correct(result: str) -> bool:
+    """Read the ``factually_correct`` flag from a fact-check report."""
+    report = parse_json_object(result)
+    if "factually_correct" in report:
+        return report["factually_correct"] is True or str(report["factually_correct"]).lower() == "true"
+    return bool(re.search(r'"factually_correct"\s*:\s*true', result or "", re.IGNORECASE))
+
+
+def fact_check_and_save(user_draft: str, skeleton: str, email_text: str,
+                        message_id: str = None, thread_id: str = None, advisor: str = None,
+                        student_uid: str = None):
+    """
+    Fact-checks the user's draft against the skeleton + original email,
+    and saves it to Google Sheets if it passes. The saved row records when it
+    was saved, which message/thread it answers and the advisor who wrote it.
+    """
+    if isinstance(skeleton, EmailSkeleton):
+        skeleton = skeleton.to_json()
+
+    # Cheap local pre-check first: clear failures never reach the LLM
+    check = precheck_draft(user_draft, skeleton, student_uid)
+    if check["verdict"] == "fail":
+        st.warning("⚠️ Draft failed quick checks. Please revise before saving.")
+        return precheck_report(check)
+    for warning in check["warnings"]:
+        st.info(f"ℹ️ {warning} Checking with the LLM anyway.")
 
-    result = resp.choices[0].message.content
+    result = fact_check_draft(user_draft, skeleton, email_text)
 
     # Save to Google Sheets only if factually_correct = true
-    if '"factually_correct": true' in result.lower():
-        try:
-            sheet = connect_to_sheet().worksheet("drafts")
-        except gspread.WorksheetNotFound:
-            sheet = connect_to_sheet().add_worksheet(title="drafts", rows=1000, cols=10)
-
-        sheet.append_row([email_text, skeleton, user_draft, result])
-        st.success("✅ Draft verified and saved to Google Sheets!")
+    if is_factually_correct(result):
+        write_queue = get_write_queue()
+        register_drafts_target(write_queue)
+        saved_at = datetime.now().isoformat(timespec="seconds")
+        write_queue.enqueue(DRAFTS_TARGET, [[email_text, skeleton, user_draft, result, saved_at,
+                                             message_id or "", thread_id or "", advisor or ""]])
+        st.success("✅ Draft verified and saved! It is written to Google Sheets in the background.")
     else:
         st.warning("⚠️ Draft not factually correct. Please revise before saving.")
 
@@ -0,0 +1,201 @@
+# libs/llm_json.py
+"""Tolerant, incremental JSON parsing and typed results for LLM output.
+
+``IncrementalJSONParser`` is fed raw text (whole responses or stream
+chunks), skips any prose or code fences before the first ``{``, and can
+return a best-effort object at any point by closing open strings and
+containers or cutting back to the last complete value. Truncated
+responses (``finish_reason == "length"``) are repaired locally instead of
+being regenerated.
+"""
+import json
+from dataclasses import dataclass, field, fields, asdict
+
+DEFAULT_DRAFT_PROMPT = "✍️ Please type your final draft below."
+
+SKELETON_SCHEMA = {
+    "type": "object",
+    "required": ["summary", "reply_points", "suggested_links", "skeleton_reply"],
+    "properties": {
+        "summary": {"type": "string"},
+        "reply_points": {"type": "array", "items": {"type": "string"}},
+        "suggested_links": {"type": "array", "items": {"type": "string"}},
+        "skeleton_reply": {"type": "string"},
+        "user_draft_space": {"type": "string"},
+    },
+}
+
+_CLOSERS = {"{": "}", "[": "]"}
+
+
+class IncrementalJSONParser:
+    """Feed text chunks; ask for the (repaired) top-level object at any time."""
+
+    def __init__(self):
+        self._buf = []
+        self._pos = 0  # absolute offset of the next character to scan
+        self._start = None  # offset of the opening brace
+        self._end = None  # offset just past the closing brace once complete
+        self._stack = []
+        self._in_string = False
+        self._escape = False
+        self._safe = None  # (offset, stack tuple) of the last complete-value boundary
+
+    @property
+    def complete(self) -> bool:
+        return self._end is not None
+
+    @property
+    def text(self) -> str:
+        return "".join(self._buf)
+
+    def feed(self, chunk: str):
+        if not chunk or self.complete:
+            return self
+        self._buf.append(chunk)
+        for ch in chunk:
+            pos = self._pos
+            self._pos += 1
+            if self._start is None:
+                if ch == "{":
+                    self._start = pos
+                    self._stack.append("{")
+                    self._safe = (pos + 1, ("{",))
+                continue
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+                continue
+            if ch == '"':
+                self._in_string = True
+            elif ch in "{[":
+                self._stack.append(ch)
+                self._safe = (pos + 1, tuple(self._stack))
+            elif ch in "}]":
+                if self._stack:
+                    self._stack.pop()
+                if not self._stack:
+                    self._end = pos + 1
+                    break
+                self._safe = (pos + 1, tuple(self._stack))
+            elif ch == ",":
+                self._safe = (pos, tuple(self._stack))
+        return self
+
+    def snapshot(self):
+        """Return the parsed object so far (repaired if incomplete), or ``None``."""
+        if self._start is None:
+            return None
+        text = self.text
+        if self.complete:
+            return _loads(text[self._start:self._end])
+
+        body = text[self._start:]
+        closers = "".join(_CLOSERS[c] for c in reversed(self._stack))
+        # 1) Close whatever is open as-is (works mid-string and after a full value)
+        tail = body + ('"' if self._in_string else "")
+        for candidate in (tail + closers, tail.rstrip().rstrip(",") + closers):
+            obj = _loads(candidate)
+            if obj is not None:
+                return obj
+        # 2) Cut back to the last complete value and close from there
+        if self._safe is not None:
+            offset, stack = self._safe
+            cut = text[self._start:offset].rstrip().rstrip(",")
+            obj = _loads(cut + "".join(_CLOSERS[c] for c in reversed(stack)))
+            if obj is not None:
+                return obj
+        return None
+
+
+def _loads(text):
+    try:
+        return json.loads(text, strict=False)
+    except ValueError:
+        return None
+
+
+def parse_json_object(text) -> dict:
+    """Parse the first JSON object in ``text`` tolerantly; ``{}`` if none."""
+    if isinstance(text, dict):
+        return text
+    obj = IncrementalJSONParser().feed(text or "").snapshot()
+    return obj if isinstance(obj, dict) else {}
+
+
+def _as_text(value) -> str:
+    if value is None:
+        return ""
+    if isinstance(value, (list, tuple)):
+        return "\n".join(_as_text(v) for v in value)
+    return str(value)
+
+
+def _as_list(value) -> list:
+    if value is None:
+        return []
+    if isinstance(value, str):
+        return [line.strip(" -•*\t") for line in value.splitlines() if line.strip(" -•*\t")]
+    if isinstance(value, (list, tuple)):
+        return [_as_text(v) for v in value if _as_text(v).strip()]
+    return [str(value)]
+
+
+@dataclass
+class EmailSkeleton:
+    summary: str = ""
+    reply_points: list = field(default_factory=list)
+    suggested_links: list = field(default_factory=list)
+    skeleton_reply: str = ""
+    user_draft_space: str = DEFAULT_DRAFT_PROMPT
+    # Schema problems found while parsing (missing fields, repaired truncation)
+    issues: list = field(default_factory=list)
+
+    @classmethod
+    def from_dict(cls, data: dict, truncated: bool = False):
+        """Coerce a loosely-typed dict into an EmailSkeleton and record issues."""
+        data = data or {}
+        issues = []
+        for name in SKELETON_SCHEMA["required"]:
+            if name not in data:
+                issues.append(f"missing field: {name}")
+        if truncated:
+            issues.append("response was truncated and repaired locally")
+        return cls(
+            summary=_as_text(data.get("summary")).strip(),
+            reply_points=_as_list(data.get("reply_points")),
+            suggested_links=_as_list(data.get("suggested_links")),
+            skeleton_reply=_as_text(data.get("skeleton_reply")),
+            user_draft_space=_as_text(data.get("user_draft_space")) or DEFAULT_DRAFT_PROMPT,
+            issues=issues,
+        )
+
+    @classmethod
+    def from_text(cls, text: str, truncated: bool = False):
+        parser = IncrementalJSONParser().feed(text or "")
+        return cls.from_dict(parse_json_object(text), truncated=truncated or not parser.complete)
+
+    def to_dict(self) -> dict:
+        data = asdict(self)
+        data.pop("issues")
+        return data
+
+    def to_json(self) -> str:
+        return json.dumps(self.to_dict(), indent=2)
+
+    def map_text(self, fn):
+        """Return a copy with ``fn`` applied to every string field and list item."""
+        values = {}
+        for f in fields(self):
+            value = getattr(self, f.name)
+            if f.name == "issues":
+                values[f.name] = list(value)
+            elif isinstance(value, list):
+                values[f.name] = [fn(v) for v in value]
+            else:
+                values[f.name] = fn(value)
+        return EmailSkeleton(**values)
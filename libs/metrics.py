@@ -3,40 +3,61 @@ import pandas as pd
 import numpy as np
 from datetime import datetime
 
+# heuristic: each automated skeleton saves 0.5 hr — change as needed
+HOURS_SAVED_PER_AUTOMATED = 0.5
+
 def parse_dates(df, date_col="Date"):
     df = df.copy()
     df[date_col] = pd.to_datetime(df[date_col], errors='coerce')
     return df
 
-def compute_email_metrics(email_history_df):
-    df = parse_dates(email_history_df, "Date")
+def compute_email_metrics(email_history_df=None, rollups=None):
+    """Totals for the email history (``Date``, ``output``, ``Reply``; see
+    libs/response_times.py ``reply_history`` for building it from saved drafts).
+    With ``rollups`` (a libs/rollups.py RollupStore) the answer comes from the
+    per-day counts instead of scanning the frame."""
+    if rollups is not None:
+        total, today, automated, responses, response_hours = rollups.history_totals(
+            day=pd.Timestamp.now().strftime("%Y-%m-%d"))
+        return {
+            "total_emails": int(total),
+            "today_emails": int(today),
+            "automated_count": int(automated),
+            "avg_response_hours": response_hours / responses if responses else None,
+            "hours_saved": automated * HOURS_SAVED_PER_AUTOMATED,
+        }
+
+    # Only the date columns are parsed; the frame itself is not copied
+    dates = pd.to_datetime(email_history_df["Date"], errors='coerce')
     now = pd.Timestamp.now()
-    total = len(df)
-    today = len(df[df["Date"].dt.date == now.date()])
+    total = len(email_history_df)
+    today = int((dates.dt.date == now.date()).sum())
     # assume Email History has Reply and output where output indicates automated/manual?
-    automated = df['output'].apply(lambda x: 1 if str(x).lower().startswith('auto') else 0).sum()
+    automated = email_history_df['output'].astype(str).str.lower().str.startswith('auto').sum()
     # average response time: assume email_history has a 'Reply' time column? If only Date and Reply exist,
     # we'll assume 'Reply' column is reply timestamp as string or NaN
     # fallback: if there's no reply timestamp, skip
-    if 'Reply' in df.columns:
-        df['Reply'] = pd.to_datetime(df['Reply'], errors='coerce')
-        df['response_time_hours'] = (df['Reply'] - df['Date']).dt.total_seconds() / 3600
-        avg_response = df['response_time_hours'].dropna().mean()
-        hours_saved = automated * 0.5  # heuristic: each automated skeleton saves 0.5 hr — change as needed
+    if 'Reply' in email_history_df.columns:
+        replies = pd.to_datetime(email_history_df['Reply'], errors='coerce')
+        response_time_hours = (replies - dates).dt.total_seconds() / 3600
+        avg_response = response_time_hours.dropna().mean()
     else:
         avg_response = None
-        hours_saved = automated * 0.5
     return {
         "total_emails": total,
         "today_emails": today,
         "automated_count": int(automated),
         "avg_response_hours": float(avg_response) if avg_response is not None else None,
-        "hours_saved": hours_saved
+        "hours_saved": automated * HOURS_SAVED_PER_AUTOMATED
     }
 
-def monthly_volume_by_topic(df, date_col="Date", topic_col="topic"):
-    df = df.copy()
-    df[date_col] = pd.to_datetime(df[date_col], errors='coerce')
-    df['month'] = df[date_col].dt.to_period('M').astype(str)
-    pivot = pd.pivot_table(df, index='month', columns=topic_col, values='UID', aggfunc='count', fill_value=0)
+def monthly_volume_by_topic(df=None, date_col="Date", topic_col="topic", rollups=None, sheet="Email"):
+    """Emails per month and topic. With ``rollups`` the table is read from the
+    maintained counts for ``sheet``."""
+    if rollups is not None:
+        return rollups.monthly_by_topic(sheet)
+
+    months = pd.to_datetime(df[date_col], errors='coerce').dt.to_period('M').astype(str)
+    pivot = pd.pivot_table(df.assign(month=months), index='month', columns=topic_col, values='UID',
+                           aggfunc='count', fill_value=0)
     return pivot.reset_index()
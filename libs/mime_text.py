@@ -0,0 +1,158 @@
+# libs/mime_text.py
+"""Size-bounded text extraction from Gmail message payloads.
+
+``extract_body_text`` walks the MIME tree lazily (depth first), picks the
+first text/plain part, or failing that the first text/html part, and
+base64-decodes it in small chunks until it has ``limit`` characters.
+HTML is converted to text by a regex-based stripper fed chunk by chunk, so
+a multi-megabyte newsletter costs roughly as much as the text it yields.
+Images, attachments and other non-text parts are never decoded.
+"""
+import base64
+import codecs
+import re
+from html import unescape
+
+# base64 characters decoded per step (a multiple of 4 → 6 KiB of bytes)
+CHUNK_CHARS = 8192
+
+_BLOCK_TAGS = {
+    "br", "p", "div", "li", "ul", "ol", "tr", "table", "h1", "h2", "h3", "h4", "h5", "h6",
+    "blockquote", "pre", "hr", "section", "article", "header", "footer",
+}
+_SKIP_TAGS = {"script", "style", "head", "title", "noscript", "template"}
+_TOKEN = re.compile(r"<!--.*?-->|<(/?)([a-zA-Z][\w:-]*)(?:\s[^>]*)?/?>|<[!?][^>]*>", re.DOTALL)
+_SPACES = re.compile(r"[ \t\r\f\v\xa0]+")
+_NEWLINES = re.compile(r"\s*\n\s*(\n\s*)+")
+
+
+def iter_text_parts(payload, mime_type):
+    """Yield parts of ``mime_type`` with inline data, depth first, skipping attachments."""
+    stack = [payload]
+    while stack:
+        part = stack.pop()
+        children = part.get("parts")
+        if children:
+            stack.extend(reversed(children))
+            continue
+        if part.get("mimeType") == mime_type and not part.get("filename") and part.get("body", {}).get("data"):
+            yield part
+
+
+def iter_decoded(data, chunk_chars=CHUNK_CHARS):
+    """Decode base64url ``data`` to text incrementally, one chunk at a time."""
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="ignore")
+    for start in range(0, len(data), chunk_chars):
+        chunk = data[start:start + chunk_chars]
+        final = start + chunk_chars >= len(data)
+        if final:
+            chunk += "=" * (-len(chunk) % 4)
+        yield decoder.decode(base64.urlsafe_b64decode(chunk), final=final)
+
+
+class _HTMLText:
+    """Incremental regex-based HTML → text: drops tags, comments, scripts and
+    styles and keeps block-level breaks. Input may be split anywhere; an
+    unfinished tag or entity at the end of a chunk is carried over."""
+
+    def __init__(self):
+        self.pieces = []
+        self.length = 0
+        self._buf = ""
+        self._skip_end = None  # closing-tag pattern while inside <script>/<style>
+
+    def feed(self, chunk):
+        buf = self._buf + chunk
+        pos = 0
+        n = len(buf)
+        while pos < n:
+            if self._skip_end is not None:
+                m = self._skip_end.search(buf, pos)
+                if m is None:
+                    # Keep enough of the tail to match a split closing tag
+                    pos = max(pos, n - 16)
+                    break
+                self._skip_end = None
+                pos = m.end()
+                continue
+            lt = buf.find("<", pos)
+            if lt == -1:
+                end = n
+                amp = buf.rfind("&", pos)
+                if amp != -1 and amp > n - 12 and ";" not in buf[amp:]:
+                    end = amp  # possibly a split entity
+                self._text(buf[pos:end])
+                pos = end
+                break
+            if lt > pos:
+                self._text(buf[pos:lt])
+            m = _TOKEN.match(buf, lt)
+            if m is None:
+                if buf.find(">", lt) == -1 or buf.startswith("<!--", lt):
+                    pos = lt  # unfinished tag or comment: wait for more input
+                    break
+                self._text("<")
+                pos = lt + 1
+                continue
+            tag = (m.group(2) or "").lower()
+            if tag in _SKIP_TAGS and not m.group(1) and not m.group(0).endswith("/>"):
+                self._skip_end = re.compile(rf"</{tag}\s*>", re.IGNORECASE)
+            elif tag in _BLOCK_TAGS:
+                self._add("\n")
+            pos = m.end()
+        self._buf = buf[pos:]
+
+    def close(self):
+        if self._skip_end is None and self._buf:
+            self._text(self._buf)
+        self._buf = ""
+
+    def _text(self, text):
+        if text:
+            self._add(unescape(text) if "&" in text else text)
+
+    def _add(self, text):
+        self.pieces.append(text)
+        self.length += len(text)
+
+    def text(self):
+        text = _SPACES.sub(" ", "".join(self.pieces))
+        return _NEWLINES.sub("\n\n", text).strip()
+
+
+def html_to_text(html, limit=None):
+    """Strip tags from ``html`` (a string or an iterable of chunks), stopping after ~``limit`` characters."""
+    parser = _HTMLText()
+    for chunk in ([html] if isinstance(html, str) else html):
+        parser.feed(chunk)
+        # Whitespace is collapsed afterwards, so read a little past the limit
+        if limit is not None and parser.length > 2 * limit:
+            break
+    parser.close()
+    text = parser.text()
+    return text[:limit] if limit is not None else text
+
+
+def _plain_text(data, limit):
+    pieces, length = [], 0
+    for chunk in iter_decoded(data):
+        pieces.append(chunk)
+        length += len(chunk)
+        # Leading whitespace is stripped afterwards, so keep a small margin
+        if limit is not None and length > limit + 256:
+            break
+    text = "".join(pieces).strip()
+    return text[:limit] if limit is not None else text
+
+
+def extract_body_text(payload, limit=2000):
+    """Body text of a message payload, at most ``limit`` characters (``None`` for all)."""
+    for part in iter_text_parts(payload, "text/plain"):
+        text = _plain_text(part["body"]["data"], limit)
+        if text:
+            return text
+    for part in iter_text_parts(payload, "text/html"):
+        text = html_to_text(iter_decoded(part["body"]["data"]), limit)
+        if text:
+            return text
+    return ""
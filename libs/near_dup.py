@@ -0,0 +1,205 @@
+# libs/near_dup.py
+"""Near-duplicate email detection (MinHash + LSH) for reusing reply skeletons.
+
+During peak weeks many students send nearly the same question. Emails are
+bucketed by the ``classify_topic`` output from ``libs/nlp.py`` and, within a
+topic, by MinHash LSH bands over word shingles. A hit returns the stored
+skeleton with only its placeholders personalized, so no LLM call is needed.
+"""
+import hashlib
+import re
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from libs.nlp import classify_topic
+
+NUM_PERM = 128
+BANDS = 32  # 32 bands x 4 rows: ~96% chance to surface a pair at 0.6 Jaccard
+SHINGLE_SIZE = 3
+DEFAULT_THRESHOLD = 0.75
+
+_MERSENNE_PRIME = (1 << 61) - 1
+_MAX_HASH = (1 << 32) - 1
+_rng = np.random.RandomState(1)
+_PERM_A = _rng.randint(1, _MAX_HASH, size=NUM_PERM, dtype=np.uint64)
+_PERM_B = _rng.randint(0, _MAX_HASH, size=NUM_PERM, dtype=np.uint64)
+
+_QUOTED_LINE = re.compile(r"^\s*>.*$", re.MULTILINE)
+_ON_WROTE = re.compile(r"\bon .{0,80}? wrote:.*", re.IGNORECASE | re.DOTALL)
+_WORD = re.compile(r"[a-z0-9]+")
+
+
+def normalize_email_text(text: str) -> list:
+    """Lowercase word tokens with quoted replies removed. Numbers are kept:
+    "INST 627" and "INST 414", or two different dates, are different questions."""
+    t = _QUOTED_LINE.sub(" ", text or "")
+    t = _ON_WROTE.sub(" ", t)
+    return _WORD.findall(t.lower())
+
+
+def shingles(tokens: list, k: int = SHINGLE_SIZE) -> set:
+    if len(tokens) < k:
+        return {" ".join(tokens)} if tokens else set()
+    return {" ".join(tokens[i:i + k]) for i in range(len(tokens) - k + 1)}
+
+
+def _hash32(s: str) -> int:
+    return int.from_bytes(hashlib.blake2b(s.encode("utf-8"), digest_size=4).digest(), "little")
+
+
+def minhash_signature(shingle_set: set) -> np.ndarray:
+    """MinHash signature (NUM_PERM uint64 values) of a shingle set."""
+    if not shingle_set:
+        return np.full(NUM_PERM, _MAX_HASH, dtype=np.uint64)
+    hv = np.fromiter((_hash32(s) for s in shingle_set), dtype=np.uint64, count=len(shingle_set))
+    # (a*h + b) mod p, truncated to 32 bits; shape (num_shingles, NUM_PERM)
+    phv = np.bitwise_and((np.outer(hv, _PERM_A) + _PERM_B) % _MERSENNE_PRIME, _MAX_HASH)
+    return phv.min(axis=0)
+
+
+def estimate_jaccard(sig_a: np.ndarray, sig_b: np.ndarray) -> float:
+    return float(np.count_nonzero(sig_a == sig_b)) / NUM_PERM
+
+
+def _band_keys(topic: str, sig: np.ndarray):
+    rows = NUM_PERM // BANDS
+    for b in range(BANDS):
+        yield (topic, b, sig[b * rows:(b + 1) * rows].tobytes())
+
+
+def _name_patterns(student_name: str):
+    """(pattern, placeholder) pairs: the full name (any case), then the capitalized
+    first name on its own, so "Ann" never matches inside "announcement" or "ann"."""
+    full = student_name.strip()
+    patterns = [(re.compile(rf"\b{re.escape(full)}\b", re.IGNORECASE), "{student_name}")]
+    first = full.split()[0]
+    if first != full:
+        patterns.append((re.compile(rf"\b{re.escape(first)}\b"), "{first_name}"))
+    return patterns
+
+
+def templatize(skeleton, student_name: str = None):
+    """Swap a concrete student name back to the ``{student_name}`` / ``{first_name}`` placeholders.
+
+    Accepts raw skeleton text or an EmailSkeleton (every text field is handled).
+    """
+    if not skeleton or not student_name or not student_name.strip() or student_name == "N/A":
+        return skeleton
+    patterns = _name_patterns(student_name)
+
+    def sub(text):
+        for pattern, placeholder in patterns:
+            text = pattern.sub(placeholder, text)
+        return text
+
+    if hasattr(skeleton, "map_text"):
+        return skeleton.map_text(sub)
+    return sub(skeleton)
+
+
+def personalize(skeleton, student_name: str = None):
+    """Fill the name placeholders of a reused skeleton (text or EmailSkeleton)."""
+    if not skeleton or not student_name or not student_name.strip() or student_name == "N/A":
+        return skeleton
+    full = student_name.strip()
+
+    def fill(text):
+        return text.replace("{student_name}", full).replace("{first_name}", full.split()[0])
+
+    if hasattr(skeleton, "map_text"):
+        return skeleton.map_text(fill)
+    return fill(skeleton)
+
+
+def is_reusable(skeleton) -> bool:
+    """Only clean, complete skeletons are worth reusing: not empty, and for an
+    EmailSkeleton no parse ``issues`` (missing fields, repaired truncation)."""
+    if hasattr(skeleton, "issues"):
+        return not skeleton.issues and bool(skeleton.summary.strip() or skeleton.skeleton_reply.strip())
+    return isinstance(skeleton, str) and bool(skeleton.strip())
+
+
+class SkeletonReuseIndex:
+    """Thread-safe LSH index of email → skeleton, partitioned by topic."""
+
+    def __init__(self, threshold=DEFAULT_THRESHOLD, max_entries=5000):
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # key -> (topic, signature, skeleton)
+        self._buckets = {}  # band key -> set(entry keys)
+        self._next_key = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _signature(self, email_text):
+        return classify_topic(email_text), minhash_signature(shingles(normalize_email_text(email_text)))
+
+    def lookup(self, email_text: str):
+        """Return ``(skeleton_template, similarity)`` for the closest near-duplicate, or ``None``."""
+        topic, sig = self._signature(email_text)
+        with self._lock:
+            candidates = set()
+            for key in _band_keys(topic, sig):
+                candidates |= self._buckets.get(key, set())
+            best = None
+            for entry_key in candidates:
+                _, other_sig, skeleton = self._entries[entry_key]
+                sim = estimate_jaccard(sig, other_sig)
+                if sim >= self.threshold and (best is None or sim > best[1]):
+                    best = (skeleton, sim, entry_key)
+            if best is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._entries.move_to_end(best[2])
+            return best[0], best[1]
+
+    def add(self, email_text: str, skeleton, student_name: str = None):
+        """Store a freshly generated skeleton (templatized by student name)."""
+        topic, sig = self._signature(email_text)
+        skeleton = templatize(skeleton, student_name)
+        with self._lock:
+            entry_key = self._next_key
+            self._next_key += 1
+            self._entries[entry_key] = (topic, sig, skeleton)
+            for key in _band_keys(topic, sig):
+                self._buckets.setdefault(key, set()).add(entry_key)
+            while len(self._entries) > self.max_entries:
+                old_key, (old_topic, old_sig, _) = self._entries.popitem(last=False)
+                for key in _band_keys(old_topic, old_sig):
+                    bucket = self._buckets.get(key)
+                    if bucket:
+                        bucket.discard(old_key)
+                        if not bucket:
+                            del self._buckets[key]
+
+    def get_or_generate(self, email_text: str, student_name: str, generate):
+        """Reuse a near-duplicate's skeleton or call ``generate(email_text, student_name)``.
+
+        Returns ``(skeleton, similarity)``; similarity is ``None`` on a fresh generation.
+        """
+        hit = self.lookup(email_text)
+        if hit is not None:
+            skeleton, sim = hit
+            return personalize(skeleton, student_name), sim
+        skeleton = generate(email_text, student_name)
+        if is_reusable(skeleton):
+            self.add(email_text, skeleton, student_name)
+        return skeleton, None
+
+
+# Singleton
+_index = None
+
+
+def get_skeleton_index():
+    global _index
+    if _index is None:
+        _index = SkeletonReuseIndex()
+    return _index
@@ -76,15 +76,17 @@ def classify_topic(text: str):
                 return topic
     return "other"
 
-def _extract_candidate_deadlines(t: str):
+def _extract_candidate_deadlines(t: str, now: datetime = None):
     """Yield parsed datetimes for common deadline phrases.
 
     Looks for patterns like:
       - by/before/due/deadline <phrase>
       - on <weekday/date>
       - explicit weekdays (e.g., Friday) or relative words (tomorrow)
+
+    Relative phrases are resolved against ``now`` (default: the current time).
     """
-    now = datetime.now()
+    now = now or datetime.now()
     candidates = []
 
     # Relative words
@@ -122,7 +124,8 @@ def _extract_candidate_deadlines(t: str):
     return uniq
 
 
-def detect_urgency(text: str):
+def detect_urgency(text: str, now: datetime = None):
+    """"high", "medium" or "low"; deadlines count from ``now`` (default: the current time)."""
     t = (text or "").lower()
 
     # 1) Direct keyword hits take precedence
@@ -141,18 +144,25 @@ def detect_urgency(text: str):
         return "high"
 
     # 3) Deadline/date inference
-    candidates = _extract_candidate_deadlines(t)
+    now = now or datetime.now()
+    candidates = _extract_candidate_deadlines(t, now=now)
     if candidates:
-        now = datetime.now()
-        soonest = min(candidates)
-        delta = soonest - now
-        if delta <= timedelta(days=2):
-            return "high"
-        if delta <= timedelta(days=7):
-            return "medium"
+        level = deadline_urgency(min(candidates), now)
+        if level:
+            return level
 
     # 4) Default fallback
     return "low"
 
+
+def deadline_urgency(deadline: datetime, now: datetime):
+    """"high" within two days of ``deadline``, "medium" within a week, else None."""
+    delta = deadline - now
+    if delta <= timedelta(days=2):
+        return "high"
+    if delta <= timedelta(days=7):
+        return "medium"
+    return None
+
 def is_automated_reply(text: str):
     return bool(re.search(r"\b(auto|automated|no-reply|noreply|out of office|vacation)\b", (text or "").lower()))
@@ -0,0 +1,116 @@
+# libs/pagination.py
+"""Server-side pagination for the table pages.
+
+``query_page`` filters, sorts and slices a DataFrame in the data layer and
+returns only the rows of one page. The sort order and the lower-cased
+search text are computed once per data version (``frame_version``) and
+cached, so paging, re-sorting between visits and searching touch the full
+frame only once. The sheet loaders stamp that version on the frames they
+return (``stamp_version``), so a rerun does not hash them again. ``render_table`` draws the search/sort/page controls and a
+single ``st.dataframe`` holding just the visible page, with long text
+columns cut to a preview; the selected row is returned so the caller can
+show its full content on demand.
+"""
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+PAGE_SIZE = 50
+PREVIEW_CHARS = 120
+
+
+def frame_version(df, columns=None):
+    """Cheap content hash of ``df`` (restricted to ``columns`` when given). A frame
+    stamped by ``stamp_version`` that still holds its loaded rows returns the stamp."""
+    stamp = df.attrs.get("version")
+    if stamp is not None and stamp[1] == len(df) and _in_load_order(df):
+        return stamp[0]
+    subset = df[[c for c in columns if c in df.columns]] if columns is not None else df
+    if not len(subset):
+        return hash((0, tuple(subset.columns)))
+    # Row hashes in row order: a re-sorted frame is a different version
+    digest = pd.util.hash_pandas_object(subset.astype(str), index=False).to_numpy().tobytes()
+    return hash((len(subset), tuple(subset.columns), digest))
+
+
+def _in_load_order(df):
+    # pandas carries attrs over to filtered and sorted frames; their index gives them away
+    index = df.index
+    return isinstance(index, pd.RangeIndex) and index.start == 0 and index.step == 1
+
+
+def stamp_version(df):
+    """Record the content hash of a freshly loaded frame in ``df.attrs``; returns ``df``."""
+    df.attrs.pop("version", None)
+    df.attrs["version"] = (frame_version(df), len(df))
+    return df
+
+
+@st.cache_data(max_entries=16, show_spinner=False)
+def _sort_positions(version, sort_by, descending, _df):
+    # Arguments starting with "_" are not hashed by Streamlit: ``version`` stands in for the frame
+    column = _df[sort_by].reset_index(drop=True)
+    try:
+        ordered = column.sort_values(ascending=not descending, kind="stable", na_position="last")
+    except TypeError:  # mixed types from the sheet
+        ordered = column.astype(str).sort_values(ascending=not descending, kind="stable")
+    return ordered.index.to_numpy()
+
+
+@st.cache_data(max_entries=16, show_spinner=False)
+def _search_text(version, columns, _df):
+    text = _df[list(columns)].astype(str).agg(" ".join, axis=1) if len(_df) else pd.Series([], dtype=str)
+    return text.str.lower().reset_index(drop=True)
+
+
+def query_page(df, page=1, page_size=PAGE_SIZE, sort_by=None, descending=False,
+               search="", search_columns=None, version=None):
+    """(rows of ``page``, matching row count, page count) after filtering and sorting."""
+    version = version if version is not None else frame_version(df)
+    if sort_by in df.columns:
+        positions = _sort_positions(version, sort_by, descending, df)
+    else:
+        positions = np.arange(len(df))
+    if search:
+        columns = tuple(c for c in (search_columns or df.columns) if c in df.columns)
+        matches = _search_text(version, columns, df).str.contains(search.strip().lower(), regex=False).to_numpy()
+        positions = positions[matches[positions]]
+    total = len(positions)
+    pages = max(1, -(-total // page_size))
+    page = min(max(1, page), pages)
+    start = (page - 1) * page_size
+    return df.iloc[positions[start:start + page_size]], total, pages
+
+
+def render_table(df, key, sort_options=None, default_sort=None, descending=True, search_columns=None,
+                 preview_columns=(), hidden_columns=(), page_size=PAGE_SIZE, version=None):
+    """Search box, sort and page controls and one table with the current page.
+    Returns the selected row (a Series from ``df``) or None."""
+    sort_options = [c for c in (sort_options or df.columns) if c in df.columns]
+    c1, c2, c3, c4 = st.columns([3, 2, 1, 1])
+    search = c1.text_input("Search", key=f"{key}_search", placeholder="Filter rows…")
+    sort_by = c2.selectbox("Sort by", sort_options, key=f"{key}_sort",
+                           index=sort_options.index(default_sort) if default_sort in sort_options else 0) \
+        if sort_options else None
+    descending = c3.toggle("Desc", value=descending, key=f"{key}_desc")
+
+    version = version if version is not None else frame_version(df)
+    # Total pages depend on the filter, so the page input is drawn after the query
+    page_key = f"{key}_page"
+    page = st.session_state.get(page_key, 1)
+    rows, total, pages = query_page(df, page, page_size, sort_by, descending, search, search_columns, version)
+    if page > pages:
+        st.session_state[page_key] = page = pages
+    c4.number_input("Page", 1, pages, key=page_key)
+
+    shown = rows.drop(columns=[c for c in hidden_columns if c in rows.columns])
+    for column in preview_columns:
+        if column in shown.columns:
+            shown = shown.assign(**{column: shown[column].astype(str).str.slice(0, PREVIEW_CHARS)})
+    event = st.dataframe(shown, use_container_width=True, hide_index=True,
+                         on_select="rerun", selection_mode="single-row", key=f"{key}_table")
+    start = (page - 1) * page_size
+    st.caption(f"Rows {start + 1 if total else 0}–{start + len(rows)} of {total}" +
+               (f" (filtered from {len(df)})" if search else ""))
+    selected = event.selection.rows if event is not None else []
+    return rows.iloc[selected[0]] if selected and selected[0] < len(rows) else None
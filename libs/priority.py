@@ -0,0 +1,253 @@
+# libs/priority.py
+"""Priority index of open email threads.
+
+Each open thread has a sort key: urgency (highest first), then the soonest
+upcoming deadline found in its messages (``_extract_candidate_deadlines``
+in libs/nlp.py, relative to when each message was sent; threads without
+one last), then whether the student is on
+probation or has a registration block (from the Academic Policy sheet),
+then the latest message (newest first). The keys live in a list kept
+sorted with ``bisect``, so adding a message costs O(log n) comparisons and
+``top(k)`` is a slice of the first k entries.
+
+Messages come in through ``add_emails`` from the sync pipeline and from the
+sheet (only rows not seen before); a thread closes when a draft is saved
+after its latest message and reopens when a newer message arrives. A heap
+of deadlines lets ``top`` re-key only the threads whose deadline has passed.
+"""
+import bisect
+import heapq
+import threading
+from datetime import datetime
+
+import pandas as pd
+
+from libs.content_store import get_content_store
+from libs.gmail_to_sheets import EMAIL_SHEET_HEADERS, email_row_key, email_row_values
+from libs.nlp import _extract_candidate_deadlines, detect_urgency
+from libs.threads import URGENCY_LABELS, URGENCY_RANK, message_times, thread_keys
+
+# Sort position of threads with no deadline (after every real one)
+_NO_DEADLINE = float("inf")
+# Messages older than this contribute no deadline (theirs have passed)
+DEADLINE_WINDOW_DAYS = 7
+
+
+def policy_flags(policies_df):
+    """UID → True for students on probation or with a registration block."""
+    if policies_df is None or policies_df.empty or "UID" not in policies_df.columns:
+        return {}
+    flagged = pd.Series(False, index=policies_df.index)
+    for column in ("Probation", "Registration Block"):
+        if column in policies_df.columns:
+            flagged |= policies_df[column].astype(str).str.strip().str.lower() == "yes"
+    return {str(uid): True for uid in policies_df.loc[flagged, "UID"]}
+
+
+def message_deadlines(text, sent_at=None):
+    """Sorted deadlines mentioned in ``text``, relative phrases resolved against ``sent_at``."""
+    now = sent_at.to_pydatetime() if isinstance(sent_at, pd.Timestamp) and pd.notnull(sent_at) else None
+    return _extract_candidate_deadlines((text or "").lower(), now=now)
+
+
+def message_deadline(text, sent_at=None):
+    """Soonest deadline mentioned in ``text`` (a datetime) or None."""
+    candidates = message_deadlines(text, sent_at)
+    return candidates[0] if candidates else None
+
+
+def _upcoming(deadlines, now):
+    i = bisect.bisect_left(deadlines, now)
+    return deadlines[i] if i < len(deadlines) else None
+
+
+class PriorityIndex:
+    """``content_lookup(message_keys)`` → {key: body} supplies bodies for rows
+    without a ``Content`` column (the dashboard's metadata frame)."""
+
+    def __init__(self, content_lookup=None):
+        self.content_lookup = content_lookup
+        self.threads = {}          # thread_id → state dict
+        self._keys = {}            # thread_id → sort key of open threads
+        self._order = []           # sorted [(key, thread_id)] of open threads
+        self._expiry = []          # heap of (deadline, thread_id) of keyed threads
+        self._seen = set()         # email row keys already added
+        self._flags = {}           # UID → probation / registration block
+        self.rows_seen = 0         # Email sheet rows consumed by ingest_sheet
+        self.drafts_seen = 0       # drafts rows consumed by ingest_drafts
+        self._lock = threading.RLock()
+
+    # --- ordering ----------------------------------------------------------
+    def _sort_key(self, state):
+        deadline = state["deadline"]
+        return (
+            -state["urgency_rank"],
+            deadline.timestamp() if deadline is not None else _NO_DEADLINE,
+            0 if self._flags.get(str(state["uid"])) else 1,
+            -state["latest_at"].timestamp() if pd.notnull(state["latest_at"]) else 0,
+            state["thread_id"],
+        )
+
+    def _unlink(self, thread_id):
+        key = self._keys.pop(thread_id, None)
+        if key is not None:
+            i = bisect.bisect_left(self._order, (key, thread_id))
+            del self._order[i]
+
+    def _link(self, state, now=None):
+        self._unlink(state["thread_id"])
+        if state["open"]:
+            now = now or datetime.now()
+            if state["deadline"] is not None and state["deadline"] < now:
+                state["deadline"] = _upcoming(state["deadlines"], now)
+            key = self._sort_key(state)
+            self._keys[state["thread_id"]] = key
+            bisect.insort(self._order, (key, state["thread_id"]))
+            if state["deadline"] is not None and state["queued"] != state["deadline"]:
+                state["queued"] = state["deadline"]
+                heapq.heappush(self._expiry, (state["deadline"], state["thread_id"]))
+
+    def _expire(self, now):
+        """Move threads whose deadline has passed on to their next deadline (or none)."""
+        while self._expiry and self._expiry[0][0] < now:
+            deadline, thread_id = heapq.heappop(self._expiry)
+            state = self.threads[thread_id]
+            if state["queued"] == deadline:
+                state["queued"] = None
+            if state["open"] and state["deadline"] is not None and state["deadline"] < now:
+                self._link(state, now)
+
+    # --- updates -----------------------------------------------------------
+    def add_emails(self, email_df):
+        """Add sheet-shaped email rows; rows already in the index are skipped. Returns rows added."""
+        if email_df.empty:
+            return 0
+        keys = [email_row_key(e, d, s) for e, d, s in zip(
+            email_df["Email"], pd.to_datetime(email_df["Date"], errors="coerce").dt.strftime("%Y-%m-%d"),
+            email_df["Subject"])]
+        with self._lock:
+            new = [key not in self._seen for key in keys]
+            rows = email_df[new]
+            if rows.empty:
+                return 0
+            self._seen.update(key for key, is_new in zip(keys, new) if is_new)
+        urgency = rows["urgency"] if "urgency" in rows.columns else rows["Content"].map(detect_urgency)
+        sent_at = message_times(rows)
+        recent = sent_at >= pd.Timestamp.now() - pd.Timedelta(days=DEADLINE_WINDOW_DAYS)
+        deadlines = [message_deadlines(text, at) if isinstance(text, str) else []
+                     for text, at in zip(self._recent_texts(rows, recent), sent_at)]
+        frame = pd.DataFrame({
+            "thread_id": thread_keys(rows),
+            "sent_at": sent_at,
+            "urgency_rank": urgency.map(URGENCY_RANK).fillna(0).astype(int),
+            "deadlines": deadlines,
+        }, index=rows.index).join(rows[["Name", "Email", "Subject"]])
+        uids = rows["UID"] if "UID" in rows.columns else pd.Series("", index=rows.index)
+
+        with self._lock:
+            for row, uid in zip(frame.itertuples(), uids):
+                self._add_message(row, uid)
+        return len(frame)
+
+    def _recent_texts(self, rows, recent):
+        if "Content" in rows.columns:
+            return rows["Content"].where(recent)
+        if self.content_lookup is not None and "message_key" in rows.columns:
+            bodies = self.content_lookup(rows.loc[recent, "message_key"].tolist())
+            return rows["message_key"].map(bodies).where(recent)
+        return pd.Series(None, index=rows.index, dtype=object)
+
+    def _add_message(self, row, uid):
+        state = self.threads.get(row.thread_id)
+        if state is None:
+            state = self.threads[row.thread_id] = {
+                "thread_id": row.thread_id, "subject": row.Subject, "latest_name": row.Name,
+                "latest_email": row.Email, "uid": None, "messages": 0, "participants": {},
+                "latest_at": pd.NaT, "urgency_rank": 0, "deadlines": [], "deadline": None, "queued": None,
+                "answered_at": None, "open": True,
+            }
+        state["messages"] += 1
+        state["participants"][str(row.Name)] = None
+        if uid not in (None, "") and not pd.isna(uid):
+            state["uid"] = uid
+        if pd.isna(state["latest_at"]) or (pd.notnull(row.sent_at) and row.sent_at >= state["latest_at"]):
+            state.update(latest_at=row.sent_at, latest_name=row.Name, latest_email=row.Email, subject=row.Subject)
+        state["urgency_rank"] = max(state["urgency_rank"], row.urgency_rank)
+        if row.deadlines:
+            state["deadlines"] = sorted(state["deadlines"] + row.deadlines)
+            state["deadline"] = _upcoming(state["deadlines"], datetime.now())
+        self._set_open(state)
+        self._link(state)
+
+    @staticmethod
+    def _set_open(state):
+        answered = state["answered_at"]
+        state["open"] = answered is None or (pd.notnull(state["latest_at"]) and state["latest_at"] > answered)
+
+    def add_email_rows(self, rows):
+        """``add_emails`` for the row dicts built by the sync pipeline."""
+        return self.add_emails(pd.DataFrame([email_row_values(r) for r in rows], columns=EMAIL_SHEET_HEADERS))
+
+    def ingest_sheet(self, email_df):
+        """Add Email sheet rows appended since the last call (the sheet is append-only)."""
+        with self._lock:
+            if len(email_df) < self.rows_seen:
+                self.rows_seen = 0
+            start, self.rows_seen = self.rows_seen, len(email_df)
+        return self.add_emails(email_df.iloc[start:])
+
+    def ingest_drafts(self, drafts_df):
+        """Close threads answered by drafts saved since the last call (libs/response_times.drafts_frame)."""
+        with self._lock:
+            if len(drafts_df) < self.drafts_seen:
+                self.drafts_seen = 0
+            new = drafts_df.iloc[self.drafts_seen:]
+            self.drafts_seen = len(drafts_df)
+            for thread_id, saved_at in zip(new["Thread ID"], new["saved_at"]):
+                self.mark_answered(thread_id, saved_at)
+
+    def mark_answered(self, thread_id, saved_at=None):
+        with self._lock:
+            state = self.threads.get(thread_id)
+            if state is None:
+                return
+            saved_at = pd.Timestamp(saved_at) if saved_at is not None and pd.notnull(saved_at) else pd.Timestamp(datetime.now())
+            if state["answered_at"] is None or saved_at > state["answered_at"]:
+                state["answered_at"] = saved_at
+            self._set_open(state)
+            self._link(state)
+
+    def set_policy_flags(self, flags):
+        """Replace the UID flags; only threads of students whose flag changed are re-keyed."""
+        with self._lock:
+            changed = {uid for uid in set(flags) | set(self._flags) if flags.get(uid) != self._flags.get(uid)}
+            self._flags = dict(flags)
+            if changed:
+                for state in self.threads.values():
+                    if str(state["uid"]) in changed:
+                        self._link(state)
+
+    # --- reads -------------------------------------------------------------
+    def top(self, k=5):
+        """The k most urgent open threads (state dicts), without sorting anything."""
+        with self._lock:
+            self._expire(datetime.now())
+            return [dict(self.threads[tid], participants=", ".join(self.threads[tid]["participants"]),
+                         urgency=URGENCY_LABELS[self.threads[tid]["urgency_rank"]],
+                         flagged=bool(self._flags.get(str(self.threads[tid]["uid"]))))
+                    for _, tid in self._order[:k]]
+
+    def open_count(self):
+        return len(self._order)
+
+
+# Singleton
+_index = None
+_index_lock = threading.Lock()
+
+def get_priority_index():
+    global _index
+    with _index_lock:
+        if _index is None:
+            _index = PriorityIndex(content_lookup=lambda keys: get_content_store().get_many(keys))
+    return _index
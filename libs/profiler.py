@@ -0,0 +1,211 @@
+# libs/profiler.py
+"""Opt-in timing of dashboard reruns.
+
+With ``DASHBOARD_PROFILE=1`` every rerun of app.py records how long each
+named part took: ``section(name)`` times a block, ``mark(name)`` starts a
+span that runs until the next mark (for the long flat parts of the script
+that are not worth re-indenting). Timings of all sessions are aggregated in
+one process-wide store, and ``render_panel`` shows the last reruns and
+p50/p90/p99 per section in the sidebar. "Profile next rerun" runs the
+following rerun under cProfile and writes a ``.pstats`` file to
+``DASHBOARD_PROFILE_DIR``.
+
+When profiling is off every call returns immediately (``section`` hands
+back a shared no-op context manager).
+"""
+import cProfile
+import io
+import os
+import pstats
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager, nullcontext
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+ENABLED = os.getenv("DASHBOARD_PROFILE", "").strip().lower() in ("1", "true", "yes")
+# Reruns kept per section for the percentiles
+HISTORY = int(os.getenv("DASHBOARD_PROFILE_HISTORY", "200"))
+PROFILE_DIR = os.getenv(
+    "DASHBOARD_PROFILE_DIR",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), ".gmail_sync", "profiles"),
+)
+
+TOTAL = "rerun total"
+
+_NULL = nullcontext()
+# Per script thread: the rerun being timed (Streamlit runs each session's script in its own thread)
+_local = threading.local()
+
+
+class ProfileStore:
+    def __init__(self, history=HISTORY):
+        self.history = history
+        self._samples = {}                      # section → deque of ms
+        self._reruns = deque(maxlen=history)    # {"at", section → ms} per rerun
+        self._lock = threading.Lock()
+
+    def record(self, timings):
+        """Add one rerun's ``{section: ms}``."""
+        with self._lock:
+            for name, ms in timings.items():
+                self._samples.setdefault(name, deque(maxlen=self.history)).append(ms)
+            self._reruns.append(dict(timings, at=datetime.now().strftime("%H:%M:%S")))
+
+    def summary(self):
+        """count / last / mean / p50 / p90 / p99 / max in ms per section, slowest p50 first."""
+        with self._lock:
+            samples = {name: np.array(values) for name, values in self._samples.items()}
+        rows = [{
+            "section": name, "count": len(v), "last": v[-1], "mean": v.mean(),
+            "p50": np.percentile(v, 50), "p90": np.percentile(v, 90), "p99": np.percentile(v, 99), "max": v.max(),
+        } for name, v in samples.items() if len(v)]
+        columns = ["section", "count", "last", "mean", "p50", "p90", "p99", "max"]
+        return pd.DataFrame(rows, columns=columns).sort_values("p50", ascending=False, ignore_index=True)
+
+    def recent(self, n=10):
+        """The last ``n`` reruns, newest first, one column per section."""
+        with self._lock:
+            reruns = list(self._reruns)[-n:][::-1]
+        df = pd.DataFrame(reruns)
+        if df.empty:
+            return df
+        first = ["at", TOTAL]
+        return df[first + sorted(c for c in df.columns if c not in first)]
+
+    def reset(self):
+        with self._lock:
+            self._samples.clear()
+            self._reruns.clear()
+
+
+# --- timing -----------------------------------------------------------------
+def start_rerun(profile=False):
+    """Begin timing this rerun; with ``profile`` it also runs under cProfile."""
+    if not ENABLED:
+        return
+    _stop_cprofile()
+    _local.timings = {}
+    _local.mark = None
+    _local.cprofile = None
+    if profile:
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+            _local.cprofile = profiler
+        except ValueError as e:  # another profiler is active on this interpreter
+            print(f"[{datetime.now().strftime('%H:%M:%S')}] ✗ cProfile unavailable: {e}")
+    _local.start = time.perf_counter()
+
+
+def _add(name, ms):
+    timings = getattr(_local, "timings", None)
+    if timings is not None:
+        timings[name] = timings.get(name, 0.0) + ms
+
+
+@contextmanager
+def _timed(name):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        _add(name, (time.perf_counter() - start) * 1000)
+
+
+def section(name):
+    """Context manager timing a block as ``name`` (repeated names add up)."""
+    return _timed(name) if ENABLED else _NULL
+
+
+def mark(name):
+    """End the current mark's span and start one called ``name``."""
+    if not ENABLED or getattr(_local, "timings", None) is None:
+        return
+    now = time.perf_counter()
+    if _local.mark is not None:
+        _add(_local.mark[0], (now - _local.mark[1]) * 1000)
+    _local.mark = (name, now)
+
+
+def _stop_cprofile():
+    profiler = getattr(_local, "cprofile", None)
+    _local.cprofile = None
+    if profiler is not None:
+        profiler.disable()
+    return profiler
+
+
+def finish_rerun():
+    """Record this rerun in the store; returns the .pstats path when it was profiled."""
+    if not ENABLED or getattr(_local, "timings", None) is None:
+        return None
+    mark(None)
+    timings, _local.timings = _local.timings, None
+    timings[TOTAL] = (time.perf_counter() - _local.start) * 1000
+    get_profile_store().record(timings)
+
+    profiler = _stop_cprofile()
+    if profiler is None:
+        return None
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    path = os.path.join(PROFILE_DIR, f"rerun-{datetime.now().strftime('%Y%m%d-%H%M%S')}-{os.getpid()}.pstats")
+    profiler.dump_stats(path)
+    return path
+
+
+def pstats_text(path, limit=25):
+    """Top ``limit`` functions of a dump by cumulative time."""
+    out = io.StringIO()
+    pstats.Stats(path, stream=out).strip_dirs().sort_stats("cumulative").print_stats(limit)
+    return out.getvalue()
+
+
+# --- panel ------------------------------------------------------------------
+def render_panel(dump_path=None):
+    """Sidebar debug panel: last reruns, percentiles per section and cProfile dumps."""
+    if not ENABLED:
+        return
+    if dump_path:
+        st.session_state["_profile_dump"] = dump_path
+    store = get_profile_store()
+    with st.sidebar.expander("⏱️ Rerun profile"):
+        last_n = st.number_input("Last reruns", 1, store.history, 10, key="_profile_last_n")
+        st.dataframe(store.recent(int(last_n)).round(1), use_container_width=True, hide_index=True)
+        st.caption(f"Per section (ms, last {store.history} reruns of all sessions)")
+        st.dataframe(store.summary().round(1), use_container_width=True, hide_index=True)
+        c1, c2 = st.columns(2)
+        if c1.button("Profile next rerun", key="_profile_next_button"):
+            st.session_state["_profile_next"] = True
+            st.rerun()
+        if c2.button("Reset", key="_profile_reset"):
+            store.reset()
+        path = st.session_state.get("_profile_dump")
+        if path and os.path.exists(path):
+            st.caption(path)
+            with open(path, "rb") as f:
+                st.download_button("Download .pstats", f.read(), file_name=os.path.basename(path),
+                                   key="_profile_download")
+            st.code(pstats_text(path), language=None)
+
+
+def start_session_rerun():
+    """``start_rerun`` for app.py: profiles the rerun the panel's button asked for."""
+    if ENABLED:
+        start_rerun(profile=st.session_state.pop("_profile_next", False))
+
+
+# Singleton
+_store = None
+_store_lock = threading.Lock()
+
+def get_profile_store():
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = ProfileStore()
+    return _store
@@ -0,0 +1,209 @@
+# libs/response_times.py
+"""Response-time analytics: how long after an email its reply draft was saved.
+
+Drafts saved by ``fact_check_and_save`` carry a ``Saved At`` timestamp and
+the thread key of the conversation they answer. ``join_drafts`` matches
+every draft to the latest email of its thread sent before it, with one
+vectorized ``pd.merge_asof`` on (thread, time). ``ResponseTimeStats``
+folds the resulting response times into quantile sketches per advisor,
+topic and urgency.
+
+The drafts sheet is append-only, so the stats remember how many draft rows
+they have already seen and each ``update`` only joins the new ones; the
+sketches keep a bounded number of buckets however many years of history
+they summarize. A draft whose email is not loaded yet (the email sheet is
+cached for a minute) is retried on later updates for ``PENDING_MAX_AGE``.
+"""
+import math
+import threading
+
+import numpy as np
+import pandas as pd
+
+from libs.llm_client import DRAFTS_HEADERS
+from libs.threads import thread_keys, with_threads
+
+DIMENSIONS = ("advisor", "topic", "urgency")
+QUANTILES = (0.5, 0.9, 0.99)
+# How long after it was saved an unmatched draft keeps being retried
+PENDING_MAX_AGE = pd.Timedelta(days=1)
+
+
+class QuantileSketch:
+    """Streaming quantiles with bounded relative error (log-spaced buckets).
+
+    A value v > 0 falls in bucket ceil(log(v) / log(gamma)); any quantile is
+    returned within ``relative_accuracy`` of the true value. Sketches are
+    mergeable, and their size grows with the log of the value range, not
+    with the number of values added.
+    """
+
+    def __init__(self, relative_accuracy=0.01):
+        self.relative_accuracy = relative_accuracy
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self.gamma)
+        self.buckets = {}
+        self.zeros = 0
+        self.count = 0
+        self.total = 0.0
+
+    def add(self, values):
+        values = np.asarray(values, dtype=float)
+        values = values[np.isfinite(values) & (values >= 0)]
+        if not len(values):
+            return
+        self.count += len(values)
+        self.total += float(values.sum())
+        positive = values[values > 0]
+        self.zeros += len(values) - len(positive)
+        keys, counts = np.unique(np.ceil(np.log(positive) / self._log_gamma).astype(int), return_counts=True)
+        for key, n in zip(keys.tolist(), counts.tolist()):
+            self.buckets[key] = self.buckets.get(key, 0) + n
+
+    def merge(self, other):
+        for key, n in other.buckets.items():
+            self.buckets[key] = self.buckets.get(key, 0) + n
+        self.zeros += other.zeros
+        self.count += other.count
+        self.total += other.total
+
+    def quantile(self, q):
+        if not self.count:
+            return None
+        rank = q * (self.count - 1)
+        seen = self.zeros
+        if rank < seen:
+            return 0.0
+        for key in sorted(self.buckets):
+            seen += self.buckets[key]
+            if rank < seen:
+                # Midpoint (in relative terms) of the bucket (gamma^(k-1), gamma^k]
+                return 2 * self.gamma ** key / (self.gamma + 1)
+        return 2 * self.gamma ** max(self.buckets) / (self.gamma + 1)
+
+    def mean(self):
+        return self.total / self.count if self.count else None
+
+
+def drafts_frame(values):
+    """Drafts sheet values (``get_all_values()``) → DataFrame with ``saved_at``.
+    Rows saved before drafts were timestamped have no ``saved_at``."""
+    rows = values[1:] if values and values[0][:1] == DRAFTS_HEADERS[:1] else values
+    width = len(DRAFTS_HEADERS)
+    df = pd.DataFrame([(list(r) + [""] * width)[:width] for r in rows], columns=DRAFTS_HEADERS)
+    df["saved_at"] = pd.to_datetime(df["Saved At"], errors="coerce")
+    return df
+
+
+def join_drafts(email_df, drafts_df):
+    """One row per timestamped draft: the email it answers (latest in its thread
+    before the draft) and ``response_hours``; drafts with no earlier email are dropped.
+    ``draft_row`` is the draft's index in ``drafts_df``."""
+    drafts = drafts_df.loc[
+        drafts_df["saved_at"].notna() & (drafts_df["Thread ID"] != ""),
+        ["saved_at", "Thread ID", "Message ID", "Advisor"],
+    ].rename(columns={"Thread ID": "thread_id", "Advisor": "advisor"})
+    drafts["draft_row"] = drafts.index
+    if drafts.empty or email_df.empty:
+        return pd.DataFrame(columns=["saved_at", "thread_id", "advisor", "draft_row", "sent_at",
+                                     *DIMENSIONS[1:], "response_hours"])
+
+    # Only the threads these drafts answer take part in the join
+    emails = with_threads(email_df[thread_keys(email_df).isin(drafts["thread_id"])])
+    emails = emails[emails["sent_at"].notna()]
+    emails = emails.assign(
+        topic=emails["topic"] if "topic" in emails.columns else "other",
+        urgency=emails["urgency"] if "urgency" in emails.columns else "low",
+    )[["thread_id", "sent_at", "topic", "urgency"]]
+
+    joined = pd.merge_asof(
+        drafts.sort_values("saved_at"),
+        emails.sort_values("sent_at"),
+        left_on="saved_at",
+        right_on="sent_at",
+        by="thread_id",
+        direction="backward",
+    ).dropna(subset=["sent_at"])
+    joined["advisor"] = joined["advisor"].replace("", "unknown")
+    joined["response_hours"] = (joined["saved_at"] - joined["sent_at"]).dt.total_seconds() / 3600
+    return joined
+
+
+def reply_history(email_df, drafts_df):
+    """Email history in the shape ``compute_email_metrics`` expects: ``Date`` (sent),
+    ``Reply`` (draft saved) and ``output`` (every saved draft started from an AI skeleton)."""
+    return _history(join_drafts(email_df, drafts_df))
+
+
+def _history(joined):
+    return pd.DataFrame({
+        "Date": joined["sent_at"],
+        "Reply": joined["saved_at"],
+        "output": "auto skeleton",
+    })
+
+
+def history_keys(joined):
+    """Rollup keys of joined drafts (thread and save time), so a draft is counted once."""
+    return [f"{thread}|{saved_at.isoformat()}" for thread, saved_at in zip(joined["thread_id"], joined["saved_at"])]
+
+
+class ResponseTimeStats:
+    def __init__(self, relative_accuracy=0.01):
+        self.relative_accuracy = relative_accuracy
+        self.sketches = {}
+        self.drafts_seen = 0
+        self.pending = []        # rows of timestamped drafts whose email was not loaded yet
+        self._lock = threading.Lock()
+
+    def _sketch(self, dimension, value):
+        key = (dimension, value)
+        if key not in self.sketches:
+            self.sketches[key] = QuantileSketch(self.relative_accuracy)
+        return self.sketches[key]
+
+    def update(self, email_df, drafts_df, rollups=None):
+        """Fold drafts added since the last update into the sketches; returns how many were joined.
+        With ``rollups`` (libs/rollups.py) the joined drafts are also added to its reply history."""
+        with self._lock:
+            if len(drafts_df) < self.drafts_seen:
+                # The sheet was rewritten (not just appended to): start over
+                self.sketches = {}
+                self.drafts_seen = 0
+                self.pending = []
+            new = drafts_df.iloc[self.pending + list(range(self.drafts_seen, len(drafts_df)))]
+            joined = join_drafts(email_df, new)
+            waiting = new[new["saved_at"].notna() & (new["Thread ID"] != "")
+                          & (new["saved_at"] >= pd.Timestamp.now() - PENDING_MAX_AGE)]
+            self.pending = [drafts_df.index.get_loc(row) for row in waiting.index.difference(joined["draft_row"])]
+            self._sketch("all", "all").add(joined["response_hours"].to_numpy())
+            for dimension in DIMENSIONS:
+                for value, hours in joined.groupby(dimension)["response_hours"]:
+                    self._sketch(dimension, value).add(hours.to_numpy())
+            if rollups is not None and len(joined):
+                rollups.add_history(_history(joined), keys=history_keys(joined))
+            self.drafts_seen = len(drafts_df)
+            return len(joined)
+
+    def summary(self, dimension="all"):
+        """Responses, mean and p50/p90/p99 response hours per value of ``dimension``."""
+        with self._lock:
+            rows = [
+                [value, sketch.count, sketch.mean(), *(sketch.quantile(q) for q in QUANTILES)]
+                for (dim, value), sketch in self.sketches.items()
+                if dim == dimension and sketch.count
+            ]
+        columns = [dimension, "responses", "mean_hours", *(f"p{round(q * 100)}_hours" for q in QUANTILES)]
+        return pd.DataFrame(rows, columns=columns).sort_values("responses", ascending=False, ignore_index=True)
+
+
+# Singleton
+_stats = None
+_stats_lock = threading.Lock()
+
+def get_response_stats():
+    global _stats
+    with _stats_lock:
+        if _stats is None:
+            _stats = ResponseTimeStats()
+    return _stats
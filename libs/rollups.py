@@ -0,0 +1,319 @@
+# libs/rollups.py
+"""Email analytics rollups that are updated as rows are appended.
+
+Counts are kept in a small SQLite file keyed by (sheet, day, topic,
+urgency, sender type), where the sheet is ``rollup_sheet(sheet_id,
+worksheet name)`` so mailboxes writing to other spreadsheets never mix;
+the month is the day's ``YYYY-MM`` prefix. The sync
+pipeline calls ``add_emails`` with each batch it writes. The store also
+keeps every row's dedupe key, so a batch that is retried or seen again on
+the next sync is counted only once. Reply history (``output`` / ``Reply``
+columns) is rolled up per day the same way with ``add_history``; the
+dashboard feeds it every saved draft once it is joined to its email
+(libs/response_times.py).
+
+``libs/metrics.py`` answers ``compute_email_metrics`` and
+``monthly_volume_by_topic`` from these tables, whose size depends on the
+number of days and topics, not emails. ``rebuild`` recomputes everything
+from the sheet, and ``compare_with_batch`` checks the rollups against the
+DataFrame computation (see bench/rollups.py).
+"""
+import json
+import os
+import sqlite3
+import threading
+
+import numpy as np
+import pandas as pd
+
+from libs.nlp import classify_topic, detect_sender_type, detect_urgency
+
+ROLLUP_PATH = os.getenv(
+    "EMAIL_ROLLUPS_PATH",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), ".gmail_sync", "rollups.sqlite3"),
+)
+
+# Stands in for rows whose date does not parse (pandas' label for them)
+NO_DATE = "NaT"
+# ``email_seen`` namespace of the reply history keys
+HISTORY_KEYS = "history"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS email_seen (
+    sheet TEXT NOT NULL,
+    row_key TEXT NOT NULL,
+    PRIMARY KEY (sheet, row_key)
+);
+CREATE TABLE IF NOT EXISTS email_counts (
+    sheet TEXT NOT NULL,
+    day TEXT NOT NULL,
+    topic TEXT NOT NULL,
+    urgency TEXT NOT NULL,
+    sender_type TEXT NOT NULL,
+    n INTEGER NOT NULL,
+    PRIMARY KEY (sheet, day, topic, urgency, sender_type)
+);
+CREATE TABLE IF NOT EXISTS history_counts (
+    day TEXT PRIMARY KEY,
+    n INTEGER NOT NULL,
+    automated INTEGER NOT NULL,
+    responses INTEGER NOT NULL,
+    response_hours REAL NOT NULL
+);
+"""
+
+
+def rollup_sheet(sheet_id, sheet_name="Email"):
+    """Rollup key of a worksheet: worksheets of different spreadsheets are counted apart."""
+    return f"{sheet_id}:{sheet_name}"
+
+
+def _days(dates):
+    parsed = pd.to_datetime(pd.Series(dates), errors="coerce")
+    return parsed.dt.strftime("%Y-%m-%d").fillna(NO_DATE)
+
+
+def email_facts(df):
+    """Rollup dimensions for rows with ``Date``, ``Content`` and ``Email`` columns
+    (``topic`` / ``urgency`` / ``sender_type`` are reused when present)."""
+    def column(name, source, fn):
+        if name in df.columns:
+            return df[name].astype(str).to_numpy()
+        return df[source].map(fn).to_numpy()
+
+    return pd.DataFrame({
+        "day": _days(df["Date"]).to_numpy(),
+        "topic": column("topic", "Content", classify_topic),
+        "urgency": column("urgency", "Content", detect_urgency),
+        "sender_type": column("sender_type", "Email", detect_sender_type),
+    })
+
+
+def history_facts(df):
+    """Per-day reply counts for an email history frame (``Date``, ``output``, optional ``Reply``)."""
+    dates = pd.to_datetime(df["Date"], errors="coerce")
+    if "output" in df.columns:
+        automated = df["output"].astype(str).str.lower().str.startswith("auto").astype(int)
+    else:
+        automated = 0
+    if "Reply" in df.columns:
+        hours = (pd.to_datetime(df["Reply"], errors="coerce") - dates).dt.total_seconds() / 3600
+    else:
+        hours = pd.Series(np.nan, index=df.index)
+    facts = pd.DataFrame({
+        "day": dates.dt.strftime("%Y-%m-%d").fillna(NO_DATE),
+        "n": 1,
+        "automated": automated,
+        "responses": hours.notna().astype(int),
+        "response_hours": hours.fillna(0.0),
+    })
+    return facts.groupby("day", as_index=False).sum()
+
+
+class RollupStore:
+    def __init__(self, path=ROLLUP_PATH):
+        self.path = path
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, timeout=30, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript(_SCHEMA)
+
+    # --- updates -----------------------------------------------------------
+    def add_emails(self, df, keys=None, sheet="Email"):
+        """Count email rows (sheet columns); rows whose key was already counted are skipped.
+        Returns how many rows were new."""
+        if df.empty:
+            return 0
+        facts = email_facts(df)
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                if keys is not None:
+                    new = [
+                        self._db.execute(
+                            "INSERT OR IGNORE INTO email_seen (sheet, row_key) VALUES (?, ?)",
+                            (sheet, _key_text(key)),
+                        ).rowcount == 1
+                        for key in keys
+                    ]
+                    facts = facts[new]
+                self._add_counts(sheet, facts)
+            finally:
+                self._db.execute("COMMIT")
+        return len(facts)
+
+    def add_email_rows(self, rows, sheet="Email"):
+        """``add_emails`` for the row dicts built by the sync (``name``, ``email``, ``date``, ...)."""
+        from libs.gmail_to_sheets import email_row_key
+
+        df = pd.DataFrame({
+            "Date": [r["date"] for r in rows],
+            "Content": [r["content"] for r in rows],
+            "Email": [r["email"] for r in rows],
+        })
+        return self.add_emails(df, [email_row_key(r["email"], r["date"], r["subject"]) for r in rows], sheet)
+
+    def add_history(self, df, keys=None):
+        """Add email history rows (reply output and timestamps) to the per-day counts;
+        rows whose key was already counted are skipped. Returns how many rows were new."""
+        if df.empty:
+            return 0
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                if keys is not None:
+                    new = [
+                        self._db.execute(
+                            "INSERT OR IGNORE INTO email_seen (sheet, row_key) VALUES (?, ?)",
+                            (HISTORY_KEYS, _key_text(key)),
+                        ).rowcount == 1
+                        for key in keys
+                    ]
+                    df = df[new]
+                if not df.empty:
+                    self._add_history(history_facts(df))
+            finally:
+                self._db.execute("COMMIT")
+        return len(df)
+
+    def rebuild(self, email_df=None, history_df=None, sheet="Email", history_keys=None):
+        """Replace the rollups with a full recount of the given frames (raw sheet data)."""
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                if email_df is not None:
+                    self._db.execute("DELETE FROM email_seen WHERE sheet = ?", (sheet,))
+                    self._db.execute("DELETE FROM email_counts WHERE sheet = ?", (sheet,))
+                    if not email_df.empty:
+                        self._db.executemany(
+                            "INSERT OR IGNORE INTO email_seen (sheet, row_key) VALUES (?, ?)",
+                            [(sheet, _key_text(key)) for key in _sheet_keys(email_df)],
+                        )
+                        self._add_counts(sheet, email_facts(email_df))
+                if history_df is not None:
+                    self._db.execute("DELETE FROM history_counts")
+                    self._db.execute("DELETE FROM email_seen WHERE sheet = ?", (HISTORY_KEYS,))
+                    if history_keys is not None:
+                        self._db.executemany(
+                            "INSERT OR IGNORE INTO email_seen (sheet, row_key) VALUES (?, ?)",
+                            [(HISTORY_KEYS, _key_text(key)) for key in history_keys],
+                        )
+                    if not history_df.empty:
+                        self._add_history(history_facts(history_df))
+            finally:
+                self._db.execute("COMMIT")
+
+    def _add_counts(self, sheet, facts):
+        grouped = facts.groupby(["day", "topic", "urgency", "sender_type"]).size()
+        self._db.executemany(
+            "INSERT INTO email_counts (sheet, day, topic, urgency, sender_type, n) VALUES (?, ?, ?, ?, ?, ?) "
+            "ON CONFLICT (sheet, day, topic, urgency, sender_type) DO UPDATE SET n = n + excluded.n",
+            [(sheet, *key, int(n)) for key, n in grouped.items()],
+        )
+
+    def _add_history(self, facts):
+        self._db.executemany(
+            "INSERT INTO history_counts (day, n, automated, responses, response_hours) VALUES (?, ?, ?, ?, ?) "
+            "ON CONFLICT (day) DO UPDATE SET n = n + excluded.n, automated = automated + excluded.automated, "
+            "responses = responses + excluded.responses, response_hours = response_hours + excluded.response_hours",
+            [(r.day, int(r.n), int(r.automated), int(r.responses), float(r.response_hours))
+             for r in facts.itertuples(index=False)],
+        )
+
+    # --- queries -----------------------------------------------------------
+    def _query(self, sql, args=()):
+        with self._lock:
+            return self._db.execute(sql, args).fetchall()
+
+    def email_counts(self, sheet="Email"):
+        """All email count cells as a DataFrame (day, month, topic, urgency, sender_type, n)."""
+        rows = self._query(
+            "SELECT day, topic, urgency, sender_type, n FROM email_counts WHERE sheet = ?", (sheet,))
+        df = pd.DataFrame(rows, columns=["day", "topic", "urgency", "sender_type", "n"])
+        df.insert(1, "month", df["day"].str[:7])
+        return df
+
+    def email_total(self, sheet="Email", day=None):
+        sql, args = "SELECT COALESCE(SUM(n), 0) FROM email_counts WHERE sheet = ?", [sheet]
+        if day is not None:
+            sql += " AND day = ?"
+            args.append(day)
+        return self._query(sql, args)[0][0]
+
+    def history_totals(self, day=None):
+        """(rows, rows on ``day``, automated, responses, response hours) of the reply history."""
+        return self._query(
+            "SELECT COALESCE(SUM(n), 0), COALESCE(SUM(CASE WHEN day = ? THEN n END), 0), "
+            "COALESCE(SUM(automated), 0), COALESCE(SUM(responses), 0), COALESCE(SUM(response_hours), 0) "
+            "FROM history_counts",
+            (day,),
+        )[0]
+
+    def monthly_by_topic(self, sheet="Email"):
+        """Emails per month (rows) and topic (columns), like ``monthly_volume_by_topic``."""
+        rows = self._query(
+            "SELECT substr(day, 1, 7) AS month, topic, SUM(n) FROM email_counts WHERE sheet = ? "
+            "GROUP BY month, topic",
+            (sheet,),
+        )
+        if not rows:
+            return pd.DataFrame(columns=["month"])
+        counts = pd.DataFrame(rows, columns=["month", "topic", "n"])
+        pivot = counts.pivot(index="month", columns="topic", values="n").fillna(0).astype(int)
+        return pivot.sort_index().reset_index()
+
+
+def _sheet_keys(email_df):
+    from libs.gmail_to_sheets import email_row_key
+
+    return [email_row_key(e, d, s) for e, d, s in
+            zip(email_df["Email"], email_df["Date"].astype(str), email_df["Subject"])]
+
+
+def _missing(value):
+    return value is None or (isinstance(value, float) and np.isnan(value))
+
+
+def _key_text(key):
+    return key if isinstance(key, str) else json.dumps(key, default=str)
+
+
+def compare_with_batch(store, email_df, history_df=None, sheet="Email"):
+    """Differences between the rollups and a from-scratch computation over the same rows
+    (an empty list when they agree)."""
+    from libs import metrics
+
+    problems = []
+    expected = metrics.monthly_volume_by_topic(email_df).set_index("month").sort_index()
+    actual = metrics.monthly_volume_by_topic(rollups=store, sheet=sheet).set_index("month").sort_index()
+    expected.columns.name = actual.columns.name = None
+    actual = actual.reindex(columns=expected.columns, fill_value=0)
+    if not expected.astype(int).equals(actual.astype(int)):
+        problems.append(f"monthly_volume_by_topic differs:\nbatch\n{expected}\nrollups\n{actual}")
+
+    if history_df is not None:
+        want = metrics.compute_email_metrics(history_df)
+        got = metrics.compute_email_metrics(rollups=store)
+        for key, value in want.items():
+            other = got[key]
+            if _missing(value) or _missing(other):
+                same = _missing(value) and _missing(other)
+            else:
+                same = bool(np.isclose(value, other))
+            if not same:
+                problems.append(f"{key}: batch {value!r} != rollups {other!r}")
+    return problems
+
+
+# Singleton
+_store = None
+_store_lock = threading.Lock()
+
+def get_rollup_store():
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = RollupStore()
+    return _store
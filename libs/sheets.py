@@ -1,14 +1,19 @@
-
 import pandas as pd
-import gspread
-from oauth2client.service_account import ServiceAccountCredentials
 import streamlit as st
 from functools import lru_cache
 
+from libs.pagination import stamp_version
+
 SCOPE = ["https://spreadsheets.google.com/feeds","https://www.googleapis.com/auth/drive"]
 
+@lru_cache(maxsize=1)
 def get_gspread_client():
     # Expects service account JSON in st.secrets["gcp_service_account"]
+    # gspread/oauth2client are imported here so app startup doesn't pay for them;
+    # the authorized client is built once per process.
+    import gspread
+    from oauth2client.service_account import ServiceAccountCredentials
+
     creds_info = st.secrets.get("gcp_service_account")
     if not creds_info:
         raise RuntimeError("Missing Google service account in st.secrets['gcp_service_account']")
@@ -23,4 +28,26 @@ def load_sheet_as_df(sheet_id: str, worksheet_name: str):
     ws = sh.worksheet(worksheet_name)
     rows = ws.get_all_records()
     df = pd.DataFrame(rows)
-    return df
+    return stamp_version(df)
+
+@st.cache_data(ttl=60)
+def load_sheet_values(sheet_id: str, worksheet_name: str):
+    """Raw cell values of a worksheet (header row included); [] if it does not exist yet."""
+    import gspread
+
+    client = get_gspread_client()
+    try:
+        ws = client.open_by_key(sheet_id).worksheet(worksheet_name)
+    except gspread.WorksheetNotFound:
+        return []
+    return ws.get_all_values()
+
+@st.cache_data(ttl=60)
+def load_email_metadata(sheet_id: str, worksheet_name: str = "Email"):
+    """The Email sheet without bodies: Content is moved to the content store
+    (libs/content_store.py) and only metadata, topic and urgency are returned."""
+    from libs.content_store import get_content_store, split_email_frame
+
+    client = get_gspread_client()
+    ws = client.open_by_key(sheet_id).worksheet(worksheet_name)
+    return stamp_version(split_email_frame(pd.DataFrame(ws.get_all_records()), get_content_store()))
@@ -0,0 +1,153 @@
+# libs/sync_metrics.py
+"""Timing and counter instrumentation for the Gmail sync.
+
+Each sync run records per-stage durations (auth, list, per-message
+metadata and body get, body decode, student DB load, dedupe, append) and
+counters, including approximate response bytes per fetch phase. The last
+``history`` runs are kept as a rolling window; ``snapshot()`` summarizes
+them as a dict for ``get_status`` and ``to_prometheus()`` renders the same
+data in the Prometheus text exposition format.
+"""
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+STAGES = ("auth", "list", "metadata", "get", "decode", "student_db", "dedupe", "append")
+BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def _quantile(sorted_values, q):
+    if not sorted_values:
+        return None
+    idx = min(len(sorted_values) - 1, max(0, int(round(q * (len(sorted_values) - 1)))))
+    return sorted_values[idx]
+
+
+class SyncMetrics:
+    def __init__(self, history=20):
+        self._runs = deque(maxlen=history)
+        self._current = None
+        self._lock = threading.Lock()
+        self.total_runs = 0
+
+    @staticmethod
+    def _new_run():
+        return {"started": time.time(), "duration": None, "ok": None,
+                "stages": {s: [] for s in STAGES}, "counters": {}}
+
+    def start_run(self):
+        with self._lock:
+            # Keep observations made before the run started (e.g. auth at startup)
+            pending = self._current
+            self._current = self._new_run()
+            if pending is not None:
+                for stage, samples in pending["stages"].items():
+                    self._current["stages"].setdefault(stage, []).extend(samples)
+                self._current["counters"].update(pending["counters"])
+
+    def end_run(self, ok=True):
+        with self._lock:
+            run = self._current
+            if run is None:
+                return
+            run["duration"] = time.time() - run["started"]
+            run["ok"] = ok
+            self._runs.append(run)
+            self._current = None
+            self.total_runs += 1
+
+    def _run(self):
+        # Observations outside start_run/end_run land in a throwaway run
+        if self._current is None:
+            self._current = self._new_run()
+        return self._current
+
+    def observe(self, stage, seconds):
+        with self._lock:
+            self._run()["stages"].setdefault(stage, []).append(seconds)
+
+    def count(self, name, n=1):
+        with self._lock:
+            counters = self._run()["counters"]
+            counters[name] = counters.get(name, 0) + n
+
+    @contextmanager
+    def timer(self, stage):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(stage, time.perf_counter() - start)
+
+    def snapshot(self):
+        """Summary over the rolling window of completed runs."""
+        with self._lock:
+            runs = list(self._runs)
+        stages = {}
+        for stage in STAGES:
+            samples = sorted(x for run in runs for x in run["stages"].get(stage, []))
+            last = runs[-1]["stages"].get(stage, []) if runs else []
+            stages[stage] = {
+                "count": len(samples),
+                "sum_s": sum(samples),
+                "p50_ms": _ms(_quantile(samples, 0.5)),
+                "p95_ms": _ms(_quantile(samples, 0.95)),
+                "max_ms": _ms(samples[-1] if samples else None),
+                "last_run_total_ms": _ms(sum(last)) if last else None,
+                "buckets": [sum(1 for x in samples if x <= b) for b in BUCKETS],
+            }
+        counters = {}
+        for run in runs:
+            for name, n in run["counters"].items():
+                counters[name] = counters.get(name, 0) + n
+        durations = sorted(run["duration"] for run in runs)
+        return {
+            "runs": len(runs),
+            "total_runs": self.total_runs,
+            "failed_runs": sum(1 for run in runs if run["ok"] is False),
+            "last_run_ms": _ms(runs[-1]["duration"]) if runs else None,
+            "run_p50_ms": _ms(_quantile(durations, 0.5)),
+            "run_p95_ms": _ms(_quantile(durations, 0.95)),
+            "last_run_counters": dict(runs[-1]["counters"]) if runs else {},
+            "counters": counters,
+            "stages": stages,
+        }
+
+    def to_prometheus(self, prefix="gmail_sync"):
+        snap = self.snapshot()
+        lines = [
+            f"# HELP {prefix}_stage_seconds Per-stage durations over the last {snap['runs']} sync runs.",
+            f"# TYPE {prefix}_stage_seconds histogram",
+        ]
+        for stage, s in snap["stages"].items():
+            for bound, n in zip(BUCKETS, s["buckets"]):
+                lines.append(f'{prefix}_stage_seconds_bucket{{stage="{stage}",le="{bound}"}} {n}')
+            lines.append(f'{prefix}_stage_seconds_bucket{{stage="{stage}",le="+Inf"}} {s["count"]}')
+            lines.append(f'{prefix}_stage_seconds_sum{{stage="{stage}"}} {s["sum_s"]:.6f}')
+            lines.append(f'{prefix}_stage_seconds_count{{stage="{stage}"}} {s["count"]}')
+        lines += [
+            f"# HELP {prefix}_window_events Sync event counts over the rolling window of runs.",
+            f"# TYPE {prefix}_window_events gauge",
+        ]
+        for name, n in sorted(snap["counters"].items()):
+            lines.append(f'{prefix}_window_events{{event="{name}"}} {n}')
+        lines += [
+            f"# TYPE {prefix}_runs_total counter",
+            f"{prefix}_runs_total {snap['total_runs']}",
+            f"# TYPE {prefix}_last_run_seconds gauge",
+            f"{prefix}_last_run_seconds {(snap['last_run_ms'] or 0) / 1000:.6f}",
+        ]
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path):
+        """Atomically write the Prometheus text to ``path`` (for a node-exporter textfile collector)."""
+        tmp = f"{path}.tmp"
+        with open(tmp, "w") as f:
+            f.write(self.to_prometheus())
+        os.replace(tmp, path)
+
+
+def _ms(seconds):
+    return None if seconds is None else round(seconds * 1000, 1)
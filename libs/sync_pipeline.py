@@ -0,0 +1,347 @@
+# libs/sync_pipeline.py
+"""Staged Gmail → Sheets sync pipeline.
+
+Stages run concurrently and are connected by bounded queues, so Gmail and
+Sheets round trips overlap instead of running one message at a time:
+
+    list ids ─▶ metadata (pool) ─▶ filter ─▶ body (pool) ─▶ decode ─▶ UID match ─▶ batched writer
+
+Messages are fetched in two phases: first only their From/Date/Subject
+headers, which are enough to drop other domains and rows already in the
+sheet, then the body parts of the survivors (both with ``fields`` masks).
+With ``metadata_first=False`` every message is downloaded in full instead.
+
+Each stage has its own worker count, and a full queue blocks the stage
+upstream of it (backpressure), which keeps memory bounded during large
+backfills. The student database and the sheet's existing dedupe keys are
+loaded in the background while the first messages are listed.
+"""
+import json
+import queue
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime
+
+from libs.gmail_to_sheets import (
+    build_uid_lookup,
+    email_row_key,
+    email_content,
+    email_row_values,
+    fetch_message,
+    fetch_message_body,
+    fetch_message_metadata,
+    iter_message_ids,
+    load_existing_email_keys,
+    load_student_database,
+    open_email_worksheet,
+    parse_email_headers,
+    parse_email_message,
+    register_email_target,
+)
+from libs.sync_metrics import SyncMetrics
+from libs.rollups import rollup_sheet
+
+_DONE = object()
+
+
+@dataclass
+class PipelineConfig:
+    max_messages: int = 50
+    list_page_size: int = 100
+    fetch_workers: int = 8
+    decode_workers: int = 2
+    queue_size: int = 64
+    write_batch_size: int = 100
+    # Fetch headers first and bodies only for new mail from allowed domains
+    metadata_first: bool = True
+    body_workers: int = 4
+    # Gmail search query; None uses build_email_query()'s default window
+    query: str = None
+
+
+class _Stage:
+    """Worker threads that map items from ``inbox`` to ``outbox``.
+
+    ``fn`` returns the item to pass on, or None to drop it. When every
+    worker has seen the end marker, the last one forwards one end marker per
+    downstream worker.
+    """
+
+    def __init__(self, name, fn, workers, inbox, outbox, downstream_workers, on_error):
+        self.name = name
+        self.fn = fn
+        self.inbox = inbox
+        self.outbox = outbox
+        self.downstream_workers = downstream_workers
+        self.on_error = on_error
+        self._remaining = workers
+        self._lock = threading.Lock()
+        self.threads = [
+            threading.Thread(target=self._work, name=f"sync-{name}-{i}", daemon=True)
+            for i in range(workers)
+        ]
+
+    def start(self):
+        for t in self.threads:
+            t.start()
+        return self
+
+    def _work(self):
+        state = threading.local()
+        while True:
+            item = self.inbox.get()
+            if item is _DONE:
+                break
+            try:
+                result = self.fn(item, state)
+            except Exception as e:
+                self.on_error(self.name, item, e)
+                continue
+            if result is not None:
+                self.outbox.put(result)
+        with self._lock:
+            self._remaining -= 1
+            last = self._remaining == 0
+        if last:
+            for _ in range(self.downstream_workers):
+                self.outbox.put(_DONE)
+
+
+class SyncPipeline:
+    """One sync run. ``service_factory()`` must return a new Gmail service
+    (googleapiclient services are not thread-safe, so each fetch worker builds
+    its own); ``progress(key, n)`` is called as messages move through the stages
+    and per-stage timings/counters are recorded on ``metrics``. With a
+    ``write_queue`` new rows are spooled for the write-behind flusher instead
+    of being appended inline. With ``rollups`` (libs/rollups.py) and
+    ``priority`` (libs/priority.py) every written batch is also added to the
+    analytics rollups and the priority inbox.
+    """
+
+    def __init__(self, service_factory, sheets_client, sheet_id, sheet_name="Email",
+                 config=None, progress=None, metrics=None, write_queue=None, rollups=None,
+                 priority=None):
+        self.service_factory = service_factory
+        self.sheets_client = sheets_client
+        self.sheet_id = sheet_id
+        self.sheet_name = sheet_name
+        self.config = config or PipelineConfig()
+        self.progress = progress or (lambda key, n=1: None)
+        self.metrics = metrics or SyncMetrics()
+        self.write_queue = write_queue
+        self.rollups = rollups
+        self.priority = priority
+        self.errors = []
+        self.listed = 0
+        self.rows_added = 0
+        # Newest Gmail internalDate (ms since epoch) among fetched messages,
+        # used by the scheduler to advance the mailbox checkpoint
+        self.newest_internal_date = None
+        self._errors_lock = threading.Lock()
+        self._date_lock = threading.Lock()
+        # Filled by _load_dedupe; the filter and write stages wait for it
+        self._worksheet = None
+        self._existing_keys = set()
+        self._dedupe_ready = threading.Event()
+
+    def _on_error(self, stage, item, error):
+        msg_id = item.get("id") if isinstance(item, dict) else None
+        print(f"[{datetime.now().strftime('%H:%M:%S')}] ✗ {stage} failed for {msg_id}: {error}")
+        with self._errors_lock:
+            self.errors.append((stage, msg_id, str(error)))
+        self.metrics.count("errors")
+
+    # --- stage functions -------------------------------------------------
+    def _list(self, out_q, downstream_workers):
+        list_time = 0.0
+        try:
+            service = self.service_factory()
+            messages = iter_message_ids(service, max_results=self.config.max_messages,
+                                        page_size=self.config.list_page_size,
+                                        query=self.config.query)
+            while True:
+                # Only time the API calls, not time spent blocked on a full queue
+                start = time.perf_counter()
+                message = next(messages, None)
+                list_time += time.perf_counter() - start
+                if message is None:
+                    break
+                self.listed += 1
+                self.metrics.count("listed")
+                self.progress("total")
+                out_q.put(message)
+        except Exception as e:
+            self._on_error("list", None, e)
+        finally:
+            self.metrics.observe("list", list_time)
+            for _ in range(downstream_workers):
+                out_q.put(_DONE)
+
+    def _service(self, state):
+        if not hasattr(state, "service"):
+            state.service = self.service_factory()
+        return state.service
+
+    def _seen(self, msg, stage):
+        """Record response size and the newest internalDate for the checkpoint."""
+        self.metrics.count(f"bytes_{stage}", len(json.dumps(msg)))
+        internal_date = int(msg.get("internalDate") or 0)
+        with self._date_lock:
+            if internal_date > (self.newest_internal_date or 0):
+                self.newest_internal_date = internal_date
+
+    def _fetch(self, message, state):
+        with self.metrics.timer("get"):
+            msg = fetch_message(self._service(state), message["id"])
+        self._seen(msg, "body")
+        self.metrics.count("fetched")
+        self.progress("fetched")
+        return msg
+
+    def _fetch_metadata(self, message, state):
+        with self.metrics.timer("metadata"):
+            msg = fetch_message_metadata(self._service(state), message["id"])
+        self._seen(msg, "metadata")
+        self.progress("fetched")
+        return msg
+
+    def _filter(self, msg, state):
+        row = parse_email_headers(msg.get("payload", {}).get("headers", []))
+        if row is None:
+            self.metrics.count("skipped_domain")
+            return None
+        self._dedupe_ready.wait()
+        if email_row_key(row["email"], row["date"], row["subject"]) in self._existing_keys:
+            self.metrics.count("duplicates")
+            return None
+        row["id"] = row["message_id"] = msg["id"]
+        row["thread_id"] = msg.get("threadId")
+        return row
+
+    def _fetch_body(self, row, state):
+        with self.metrics.timer("get"):
+            msg = fetch_message_body(self._service(state), row["id"])
+        self._seen(msg, "body")
+        self.metrics.count("fetched")
+        return {"row": row, "payload": msg.get("payload", {})}
+
+    def _decode(self, item, state):
+        with self.metrics.timer("decode"):
+            if "row" in item:
+                row = item["row"]
+                row["content"] = email_content(item["payload"])
+            else:
+                row = parse_email_message(item)
+        if row is not None:
+            self.metrics.count("parsed")
+            self.progress("parsed")
+        else:
+            self.metrics.count("skipped_domain")
+        return row
+
+    def _match(self, in_q, out_q):
+        try:
+            with self.metrics.timer("student_db"):
+                uid_lookup = build_uid_lookup(load_student_database(self.sheets_client, self.sheet_id))
+        except Exception as e:
+            self._on_error("match", None, e)
+            uid_lookup = {}
+        while True:
+            row = in_q.get()
+            if row is _DONE:
+                break
+            row["uid"] = uid_lookup.get(row["email"].lower())
+            out_q.put(row)
+        out_q.put(_DONE)
+
+    def _load_dedupe(self):
+        try:
+            with self.metrics.timer("dedupe"):
+                self._worksheet = open_email_worksheet(self.sheets_client, self.sheet_id, self.sheet_name)
+                self._existing_keys = load_existing_email_keys(self._worksheet)
+        except Exception as e:
+            self._on_error("write", None, e)
+        finally:
+            self._dedupe_ready.set()
+
+    def _write(self, in_q):
+        self._dedupe_ready.wait()
+        worksheet = self._worksheet
+        existing_keys = self._existing_keys
+        target = None
+        if self.write_queue is not None:
+            target = register_email_target(self.write_queue, self.sheets_client, self.sheet_id, self.sheet_name)
+
+        batch = []
+        while True:
+            row = in_q.get()
+            if row is not _DONE:
+                key = email_row_key(row["email"], row["date"], row["subject"])
+                if key in existing_keys:
+                    self.metrics.count("duplicates")
+                    print(f"  Skipping duplicate: {row['subject'][:50]}...")
+                else:
+                    existing_keys.add(key)
+                    batch.append((key, email_row_values(row), row))
+            if batch and (row is _DONE or len(batch) >= self.config.write_batch_size):
+                if worksheet is not None:
+                    try:
+                        with self.metrics.timer("append"):
+                            if target is not None:
+                                added = self.write_queue.enqueue(target, [v for _, v, _ in batch],
+                                                                 [k for k, _, _ in batch])
+                            else:
+                                worksheet.append_rows([v for _, v, _ in batch])
+                                added = len(batch)
+                        self.metrics.count("appended", added)
+                        self.rows_added += added
+                        self.progress("appended", added)
+                    except Exception as e:
+                        self._on_error("write", None, e)
+                    else:
+                        self._update_indexes([r for _, _, r in batch])
+                batch = []
+            if row is _DONE:
+                break
+
+    def _update_indexes(self, rows):
+        # Derived views only: a failure here must not fail the sync or hold back its checkpoint
+        try:
+            if self.rollups is not None:
+                self.rollups.add_email_rows(rows, sheet=rollup_sheet(self.sheet_id, self.sheet_name))
+            if self.priority is not None:
+                self.priority.add_email_rows(rows)
+        except Exception as e:
+            print(f"[{datetime.now().strftime('%H:%M:%S')}] ✗ Updating email rollups/priority index failed: {e}")
+
+    # --- driver ----------------------------------------------------------
+    def run(self):
+        """Run all stages to completion and return the number of rows appended."""
+        cfg = self.config
+        ids_q = queue.Queue(maxsize=cfg.queue_size)
+        raw_q = queue.Queue(maxsize=cfg.queue_size)
+        parsed_q = queue.Queue(maxsize=cfg.queue_size)
+        write_q = queue.Queue(maxsize=cfg.queue_size)
+
+        threading.Thread(target=self._load_dedupe, name="sync-dedupe", daemon=True).start()
+        writer = threading.Thread(target=self._write, args=(write_q,), name="sync-write", daemon=True)
+        matcher = threading.Thread(target=self._match, args=(parsed_q, write_q), name="sync-match", daemon=True)
+        writer.start()
+        matcher.start()
+        _Stage("decode", self._decode, cfg.decode_workers, raw_q, parsed_q, 1, self._on_error).start()
+        if cfg.metadata_first:
+            meta_q = queue.Queue(maxsize=cfg.queue_size)
+            body_q = queue.Queue(maxsize=cfg.queue_size)
+            _Stage("body", self._fetch_body, cfg.body_workers, body_q, raw_q, cfg.decode_workers, self._on_error).start()
+            _Stage("filter", self._filter, 1, meta_q, body_q, cfg.body_workers, self._on_error).start()
+            _Stage("metadata", self._fetch_metadata, cfg.fetch_workers, ids_q, meta_q, 1, self._on_error).start()
+        else:
+            _Stage("fetch", self._fetch, cfg.fetch_workers, ids_q, raw_q, cfg.decode_workers, self._on_error).start()
+        lister = threading.Thread(target=self._list, args=(ids_q, cfg.fetch_workers), name="sync-list", daemon=True)
+        lister.start()
+
+        lister.join()
+        matcher.join()
+        writer.join()
+        return self.rows_added
@@ -0,0 +1,314 @@
+# libs/sync_worker.py
+"""Standalone Gmail sync worker.
+
+Runs the sync scheduler in its own process instead of inside the
+Streamlit server:
+
+    python -m libs.sync_worker                  # run until stopped
+    python -m libs.sync_worker --once           # one sync, then exit
+
+Several workers (one per replica) may run at once. They compete for a
+lease file and only the current leader syncs; the others wait and take
+over when the leader's lease expires. The leader publishes the scheduler
+status as JSON, which the dashboard reads through ``WorkerStatusClient``
+when ``GMAIL_SYNC_MODE=worker``. The lease, status and trigger files must
+live on storage shared by all replicas (``GMAIL_SYNC_STATE_DIR``).
+"""
+import argparse
+import json
+import os
+import signal
+import socket
+import sys
+import threading
+import time
+import uuid
+from datetime import datetime
+
+try:
+    import fcntl
+except ImportError:  # Windows: lease updates are best-effort
+    fcntl = None
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from libs.gmail_scheduler import CHECKPOINT_DIR
+
+STATE_DIR = os.getenv("GMAIL_SYNC_STATE_DIR", CHECKPOINT_DIR)
+LEASE_PATH = os.path.join(STATE_DIR, "worker.lease")
+STATUS_PATH = os.path.join(STATE_DIR, "status.json")
+TRIGGER_PATH = os.path.join(STATE_DIR, "trigger")
+
+LEASE_TTL_SECONDS = 60
+HEARTBEAT_SECONDS = 10
+
+# Status keys that hold datetimes (serialized as ISO strings)
+_TIME_KEYS = {"last_sync_time", "next_run_time", "started_at", "heartbeat", "lease_expires"}
+
+
+def worker_mode_enabled():
+    return os.getenv("GMAIL_SYNC_MODE", "").lower() == "worker"
+
+
+class LeaderLease:
+    """Lease-based leader election through a shared file.
+
+    The lease records its owner and an expiry time. ``acquire()`` takes it
+    when it is free, expired or already ours, and extends it by ``ttl``; the
+    read-modify-write is serialized with an exclusive ``flock`` on a
+    sidecar lock file, so two workers can never both see themselves as
+    leader. A leader that stops renewing loses the lease after ``ttl``.
+    """
+
+    def __init__(self, path=LEASE_PATH, ttl=LEASE_TTL_SECONDS, owner=None):
+        self.path = path
+        self.ttl = ttl
+        self.owner = owner or f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+        self.expires_at = None
+
+    def _locked(self, fn):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        with open(f"{self.path}.lock", "a") as lock:
+            if fcntl:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                return fn()
+            finally:
+                if fcntl:
+                    fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def read(self):
+        try:
+            with open(self.path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _write(self, lease):
+        tmp = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(lease, f)
+        os.replace(tmp, self.path)
+
+    def acquire(self):
+        """Take or renew the lease; True if this worker is the leader."""
+        def attempt():
+            now = time.time()
+            lease = self.read()
+            if lease.get("owner") not in (None, self.owner) and lease.get("expires_at", 0) > now:
+                self.expires_at = None
+                return False
+            acquired_at = lease.get("acquired_at", now) if lease.get("owner") == self.owner else now
+            self.expires_at = now + self.ttl
+            self._write({"owner": self.owner, "expires_at": self.expires_at, "acquired_at": acquired_at})
+            return True
+        return self._locked(attempt)
+
+    def release(self):
+        def attempt():
+            if self.read().get("owner") == self.owner:
+                os.remove(self.path)
+            self.expires_at = None
+        self._locked(attempt)
+
+    @property
+    def is_leader(self):
+        return self.expires_at is not None and self.expires_at > time.time()
+
+
+def _encode(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, float) and value != value:  # NaN
+        return None
+    raise TypeError(f"Not JSON serializable: {type(value).__name__}")
+
+
+def _decode(value, key=None):
+    if isinstance(value, dict):
+        return {k: _decode(v, k) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_decode(v) for v in value]
+    if key in _TIME_KEYS and isinstance(value, str):
+        try:
+            return datetime.fromisoformat(value)
+        except ValueError:
+            return value
+    return value
+
+
+def publish_status(status, path=STATUS_PATH):
+    """Atomically write the scheduler status as JSON."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(status, f, default=_encode)
+    os.replace(tmp, path)
+
+
+def read_status(path=STATUS_PATH):
+    """The last published status (datetimes restored), or None if there is none."""
+    try:
+        with open(path) as f:
+            return _decode(json.load(f))
+    except (OSError, ValueError):
+        return None
+
+
+class WorkerStatusClient:
+    """Read-only stand-in for the scheduler, used by the dashboard in worker mode.
+
+    ``get_status()`` returns what the worker last published (plus a
+    ``worker`` entry) and ``trigger_sync()`` leaves a trigger file that the
+    leader picks up on its next heartbeat. ``start()``/``stop()`` do nothing:
+    the worker process owns the sync.
+    """
+
+    def __init__(self, status_path=STATUS_PATH, trigger_path=TRIGGER_PATH,
+                 stale_after=3 * HEARTBEAT_SECONDS):
+        self.status_path = status_path
+        self.trigger_path = trigger_path
+        self.stale_after = stale_after
+
+    def start(self, *args, **kwargs):
+        pass
+
+    def stop(self):
+        pass
+
+    @property
+    def sync_in_progress(self):
+        return self.get_status()["sync_in_progress"]
+
+    def trigger_sync(self):
+        if self.sync_in_progress:
+            return False
+        os.makedirs(os.path.dirname(self.trigger_path), exist_ok=True)
+        with open(self.trigger_path, "w") as f:
+            f.write(datetime.now().isoformat())
+        return True
+
+    def get_status(self):
+        status = read_status(self.status_path)
+        if status is None:
+            return {
+                "is_running": False, "last_sync_time": None, "last_sync_count": 0,
+                "next_run_time": None, "sync_in_progress": False, "progress": {"stage": "idle"},
+                "last_error": "No sync worker status yet. Start one with `python -m libs.sync_worker`.",
+            }
+        worker = status.get("worker") or {}
+        heartbeat = worker.get("heartbeat")
+        if heartbeat and (datetime.now() - heartbeat).total_seconds() > self.stale_after:
+            status["is_running"] = False
+            status["sync_in_progress"] = False
+            status["last_error"] = f"Sync worker {worker.get('owner')} has not reported since {heartbeat:%H:%M:%S}."
+        elif os.path.exists(self.trigger_path):
+            # A requested sync counts as in progress until the leader picks it up
+            status["sync_in_progress"] = True
+        return status
+
+
+def run_worker(interval_minutes=4, adaptive=True, heartbeat=HEARTBEAT_SECONDS, lease=None,
+               status_path=STATUS_PATH, trigger_path=TRIGGER_PATH, stop_event=None):
+    """Run the leader-elected sync loop until ``stop_event`` is set (or SIGINT/SIGTERM)."""
+    from libs.gmail_scheduler import get_scheduler
+
+    lease = lease or LeaderLease()
+    stop_event = stop_event or threading.Event()
+    scheduler = get_scheduler()
+    print(f"Sync worker {lease.owner} started (lease {lease.path}, ttl {lease.ttl}s)")
+
+    while not stop_event.is_set():
+        try:
+            leader = lease.acquire()
+        except OSError as e:
+            print(f"[{datetime.now().strftime('%H:%M:%S')}] ✗ Lease error: {e}")
+            leader = False
+
+        if leader and not scheduler.is_running:
+            print(f"[{datetime.now().strftime('%H:%M:%S')}] Became sync leader")
+            scheduler.start(interval_minutes=interval_minutes, adaptive=adaptive)
+        elif not leader and scheduler.is_running:
+            print(f"[{datetime.now().strftime('%H:%M:%S')}] Lost the lease; stopping sync")
+            scheduler.stop()
+
+        if leader:
+            if os.path.exists(trigger_path):
+                os.remove(trigger_path)
+                scheduler.trigger_sync()
+            status = scheduler.get_status()
+            status["worker"] = {
+                "owner": lease.owner,
+                "heartbeat": datetime.now(),
+                "lease_expires": datetime.fromtimestamp(lease.expires_at),
+            }
+            try:
+                publish_status(status, status_path)
+            except OSError as e:
+                print(f"Could not publish worker status to {status_path}: {e}")
+
+        stop_event.wait(heartbeat)
+
+    if scheduler.is_running:
+        scheduler.stop()
+    lease.release()
+    print(f"Sync worker {lease.owner} stopped")
+
+
+def _renew_lease(lease, heartbeat, done):
+    """Keep renewing ``lease`` every ``heartbeat`` seconds until ``done`` is set."""
+    while not done.wait(heartbeat):
+        try:
+            if not lease.acquire():
+                print(f"[{datetime.now().strftime('%H:%M:%S')}] ✗ Lost the lease during the sync")
+        except OSError as e:
+            print(f"[{datetime.now().strftime('%H:%M:%S')}] ✗ Lease error: {e}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the Gmail → Sheets sync outside the web server.")
+    parser.add_argument("--once", action="store_true", help="Run a single sync (gmail_to_sheets.main) and exit")
+    parser.add_argument("--interval", type=float, default=4, help="Initial sync interval in minutes")
+    parser.add_argument("--fixed-interval", action="store_true", help="Disable the adaptive interval")
+    parser.add_argument("--heartbeat", type=float, default=HEARTBEAT_SECONDS,
+                        help="Seconds between lease renewals and status updates")
+    parser.add_argument("--lease-ttl", type=float, default=LEASE_TTL_SECONDS,
+                        help="Seconds before a silent leader's lease can be taken over")
+    args = parser.parse_args(argv)
+
+    if args.lease_ttl <= args.heartbeat:
+        parser.error("--lease-ttl must be longer than --heartbeat")
+
+    if args.once:
+        from libs.gmail_to_sheets import main as sync_once
+
+        lease = LeaderLease(ttl=args.lease_ttl)
+        if not lease.acquire():
+            print(f"Another worker holds the sync lease ({lease.read().get('owner')}); not syncing")
+            return 0
+        # A sync can outlast the lease ttl: renew it on the heartbeat like the long-running worker
+        done = threading.Event()
+        renewer = threading.Thread(target=_renew_lease, args=(lease, args.heartbeat, done), daemon=True)
+        renewer.start()
+        try:
+            return sync_once()
+        finally:
+            done.set()
+            renewer.join()
+            lease.release()
+
+    stop_event = threading.Event()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(sig, lambda *_: stop_event.set())
+    run_worker(
+        interval_minutes=args.interval,
+        adaptive=not args.fixed_interval,
+        heartbeat=args.heartbeat,
+        lease=LeaderLease(ttl=args.lease_ttl),
+        stop_event=stop_event,
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
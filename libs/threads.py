@@ -0,0 +1,120 @@
+# libs/threads.py
+"""Group email rows into conversations (Gmail threads).
+
+Rows synced with a ``Thread ID`` are grouped by it. Older rows without one
+fall back to the sender plus the subject without Re:/Fwd: prefixes.
+``summarize_threads`` keeps one row of state per thread: the latest
+message, the message count, the participants and the combined (highest)
+urgency. Threads are ranked by urgency, then recency, so the dashboard and
+the LLM assistant can work on one conversation at a time.
+"""
+import re
+
+import pandas as pd
+
+URGENCY_RANK = {"low": 0, "medium": 1, "high": 2}
+URGENCY_LABELS = {rank: label for label, rank in URGENCY_RANK.items()}
+
+_REPLY_PREFIX = re.compile(r"^\s*((re|fwd?|aw|sv)\s*:\s*)+", re.IGNORECASE)
+
+# Characters of conversation sent to the LLM for one thread (newest kept)
+THREAD_TEXT_CHARS = 6000
+
+
+def normalize_subject(subject) -> str:
+    return _REPLY_PREFIX.sub("", str(subject or "")).strip().lower()
+
+
+def thread_keys(email_df: pd.DataFrame) -> pd.Series:
+    """Thread key per row: the Gmail thread id, or sender + normalized subject."""
+    if "Thread ID" in email_df.columns:
+        keys = email_df["Thread ID"].fillna("").astype(str).str.strip()
+        missing = keys.isin(["", "nan", "None"])
+    else:
+        keys = pd.Series("", index=email_df.index, dtype=object)
+        missing = pd.Series(True, index=email_df.index)
+    if missing.any():
+        rows = email_df[missing]
+        keys = keys.astype(object)
+        keys[missing] = (
+            "subject:" + rows["Email"].astype(str).str.lower()
+            + "|" + rows["Subject"].map(normalize_subject)
+        )
+    return keys
+
+
+def message_times(email_df: pd.DataFrame) -> pd.Series:
+    """Date + Time as one timestamp (falls back to the date alone)."""
+    dates = pd.to_datetime(email_df["Date"], errors="coerce")
+    if "Time" not in email_df.columns:
+        return dates
+    combined = pd.to_datetime(
+        dates.dt.strftime("%Y-%m-%d") + " " + email_df["Time"].astype(str), errors="coerce"
+    )
+    return combined.fillna(dates)
+
+
+def with_threads(email_df: pd.DataFrame) -> pd.DataFrame:
+    """Copy of ``email_df`` with ``thread_id`` and ``sent_at`` columns, oldest first."""
+    df = email_df.assign(thread_id=thread_keys(email_df), sent_at=message_times(email_df))
+    return df.sort_values("sent_at", kind="stable")
+
+
+def summarize_threads(email_df: pd.DataFrame) -> pd.DataFrame:
+    """One row per thread, ranked by combined urgency and then latest message time."""
+    columns = ["thread_id", "subject", "latest_name", "latest_email", "uid", "messages",
+               "participants", "first_at", "latest_at", "urgency", "topic", "latest_content"]
+    if email_df.empty:
+        return pd.DataFrame(columns=columns)
+
+    df = with_threads(email_df)
+    if "urgency" in df.columns:
+        df["_urgency"] = df["urgency"].map(URGENCY_RANK).fillna(0).astype(int)
+    else:
+        df["_urgency"] = 0
+    grouped = df.groupby("thread_id", sort=False)
+    latest = grouped.tail(1).set_index("thread_id")
+
+    threads = pd.DataFrame({
+        "subject": latest["Subject"],
+        "latest_name": latest["Name"],
+        "latest_email": latest["Email"],
+        "uid": grouped["UID"].agg(_first_present) if "UID" in df.columns else None,
+        "messages": grouped.size(),
+        "participants": grouped["Name"].agg(lambda names: ", ".join(dict.fromkeys(map(str, names)))),
+        "first_at": grouped["sent_at"].min(),
+        "latest_at": grouped["sent_at"].max(),
+        "urgency": grouped["_urgency"].max().map(URGENCY_LABELS),
+        "topic": latest["topic"] if "topic" in df.columns else None,
+        "latest_content": latest["Content"] if "Content" in df.columns else None,
+    })
+    threads["_rank"] = grouped["_urgency"].max()
+    threads = threads.sort_values(["_rank", "latest_at"], ascending=[False, False], na_position="last")
+    return threads.drop(columns="_rank").reset_index().reindex(columns=columns)
+
+
+def thread_messages(email_df: pd.DataFrame, thread_id: str) -> pd.DataFrame:
+    """The thread's messages, oldest first."""
+    df = with_threads(email_df)
+    return df[df["thread_id"] == thread_id]
+
+
+def thread_text(messages: pd.DataFrame, limit: int = THREAD_TEXT_CHARS) -> str:
+    """The conversation as plain text for the LLM, keeping the newest messages within ``limit``."""
+    blocks = []
+    used = 0
+    for _, row in messages.iloc[::-1].iterrows():
+        when = row["sent_at"].strftime("%b %d, %Y %H:%M") if pd.notnull(row.get("sent_at")) else ""
+        block = f"From: {row['Name']} <{row['Email']}> {when}\n{row['Content']}"
+        if blocks and used + len(block) > limit:
+            break
+        blocks.append(block[:limit])
+        used += len(block)
+    return "\n\n---\n\n".join(reversed(blocks))
+
+
+def _first_present(values):
+    for value in values:
+        if pd.notnull(value) and str(value).strip():
+            return value
+    return None
@@ -0,0 +1,289 @@
+# libs/write_queue.py
+"""Durable write-behind queue for Google Sheets appends.
+
+Writers call ``enqueue(target, rows, keys)``, which stores the rows in a
+local SQLite spool and returns immediately. A background flusher thread
+appends them in batches per target worksheet and retries failures
+(quota errors, timeouts) with exponential backoff, so callers never wait
+on Sheets latency and rows survive throttling and restarts.
+
+Targets are registered per process with ``register_target(name, open_worksheet,
+key_fn)``: ``open_worksheet()`` returns the gspread worksheet and
+``key_fn(row_values)`` the row's dedupe key. Delivery is at-most-once per
+key: a key is only ever spooled once, and a batch that was attempted
+before (and may have been applied even though the call failed) is first
+checked against the keys already in the sheet.
+"""
+import hashlib
+import json
+import os
+import random
+import sqlite3
+import threading
+import time
+from datetime import datetime
+
+SPOOL_PATH = os.getenv(
+    "SHEETS_SPOOL_PATH",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), ".spool", "sheets_writes.sqlite3"),
+)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS rows (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    target TEXT NOT NULL,
+    row_key TEXT NOT NULL,
+    row_values TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt_at REAL NOT NULL DEFAULT 0,
+    sent_at REAL,
+    last_error TEXT,
+    UNIQUE (target, row_key)
+);
+CREATE INDEX IF NOT EXISTS rows_due ON rows (sent_at, target, next_attempt_at);
+"""
+
+
+def hash_row_key(values):
+    """Default dedupe key: a hash of the row's values."""
+    return hashlib.sha1(json.dumps(values, default=str).encode("utf-8")).hexdigest()
+
+
+class WriteQueue:
+    def __init__(self, path=SPOOL_PATH, batch_size=200, flush_interval=2.0,
+                 base_backoff=5.0, max_backoff=600.0, claim_timeout=120.0, retain_days=30):
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        # A claimed batch that is neither sent nor failed after this long
+        # (flusher crashed mid-append) becomes due again and is re-verified
+        self.claim_timeout = claim_timeout
+        self.retain_days = retain_days
+
+        self._targets = {}
+        self._worksheets = {}
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        self._busy = False
+        self.last_error = None
+        self.sent = 0
+
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False, timeout=30, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript(_SCHEMA)
+
+    # --- producer side -----------------------------------------------------
+    def register_target(self, name, open_worksheet, key_fn=hash_row_key):
+        """Make ``name`` flushable from this process."""
+        with self._lock:
+            if self._targets.get(name) != (open_worksheet, key_fn):
+                self._targets[name] = (open_worksheet, key_fn)
+                self._worksheets.pop(name, None)
+        self._wake.set()
+
+    def enqueue(self, target, rows, keys=None):
+        """Spool ``rows`` for ``target``; returns how many were new (not already spooled)."""
+        if not rows:
+            return 0
+        key_fn = self._targets.get(target, (None, hash_row_key))[1]
+        keys = keys or [key_fn(row) for row in rows]
+        now = time.time()
+        with self._lock:
+            before = self._db.total_changes
+            self._db.execute("BEGIN")
+            self._db.executemany(
+                "INSERT OR IGNORE INTO rows (target, row_key, row_values, created_at) VALUES (?, ?, ?, ?)",
+                [(target, _key_text(k), json.dumps(row, default=str), now) for k, row in zip(keys, rows)],
+            )
+            self._db.execute("COMMIT")
+            added = self._db.total_changes - before
+        self.start()
+        self._wake.set()
+        return added
+
+    # --- flusher -----------------------------------------------------------
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="sheets-write-behind", daemon=True)
+            self._thread.start()
+
+    def stop(self, flush_timeout=10):
+        if flush_timeout:
+            self.flush(flush_timeout)
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+
+    def _run(self):
+        last_prune = 0
+        while not self._stop.is_set():
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            try:
+                while self._flush_once():
+                    pass
+                if time.time() - last_prune > 3600:
+                    self._prune()
+                    last_prune = time.time()
+            except Exception as e:
+                print(f"[{datetime.now().strftime('%H:%M:%S')}] ✗ Write queue error: {e}")
+                self.last_error = str(e)
+
+    def _claim(self):
+        """Claim the next due batch of one registered target: (target, [(id, key, values, attempts)])."""
+        now = time.time()
+        with self._lock:
+            targets = list(self._targets)
+            if not targets:
+                return None, []
+            marks = ",".join("?" * len(targets))
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._db.execute(
+                    f"SELECT target FROM rows WHERE sent_at IS NULL AND next_attempt_at <= ? "
+                    f"AND target IN ({marks}) ORDER BY id LIMIT 1",
+                    [now, *targets],
+                ).fetchone()
+                if row is None:
+                    return None, []
+                target = row[0]
+                batch = self._db.execute(
+                    "SELECT id, row_key, row_values, attempts FROM rows "
+                    "WHERE sent_at IS NULL AND next_attempt_at <= ? AND target = ? ORDER BY id LIMIT ?",
+                    (now, target, self.batch_size),
+                ).fetchall()
+                self._db.executemany(
+                    "UPDATE rows SET attempts = attempts + 1, next_attempt_at = ? WHERE id = ?",
+                    [(now + self.claim_timeout, r[0]) for r in batch],
+                )
+            finally:
+                self._db.execute("COMMIT")
+        return target, [(r[0], r[1], json.loads(r[2]), r[3]) for r in batch]
+
+    def _flush_once(self):
+        """Send one batch; True if there may be more due work."""
+        self._busy = True
+        try:
+            return self._send(*self._claim())
+        finally:
+            self._busy = False
+
+    def _send(self, target, batch):
+        if not batch:
+            return False
+        open_worksheet, key_fn = self._targets[target]
+        ids = [r[0] for r in batch]
+        try:
+            worksheet = self._worksheets.get(target)
+            if worksheet is None:
+                worksheet = self._worksheets[target] = open_worksheet()
+
+            to_send = batch
+            if any(attempts for _, _, _, attempts in batch):
+                # An earlier attempt may have reached the sheet: skip rows already there
+                existing = set()
+                for values in worksheet.get_all_values()[1:]:
+                    try:
+                        existing.add(_key_text(key_fn(values)))
+                    except (IndexError, KeyError, ValueError):
+                        continue
+                to_send = [r for r in batch if r[1] not in existing]
+
+            if to_send:
+                worksheet.append_rows([r[2] for r in to_send])
+            self._mark_sent(ids)
+            self.sent += len(to_send)
+            self.last_error = None
+            print(f"[{datetime.now().strftime('%H:%M:%S')}] ✓ Wrote {len(to_send)} queued rows to {target}")
+            return True
+        except Exception as e:
+            self._worksheets.pop(target, None)
+            attempts = max(r[3] for r in batch) + 1
+            delay = min(self.max_backoff, self.base_backoff * 2 ** (attempts - 1)) * random.uniform(0.8, 1.2)
+            self._mark_failed(ids, str(e), time.time() + delay)
+            self.last_error = f"{target}: {e}"
+            print(f"[{datetime.now().strftime('%H:%M:%S')}] ✗ Writing {len(batch)} rows to {target} failed "
+                  f"(attempt {attempts}, retry in {delay:.0f}s): {e}")
+            return False
+
+    def _mark_sent(self, ids):
+        with self._lock:
+            self._db.executemany("UPDATE rows SET sent_at = ?, last_error = NULL WHERE id = ?",
+                                 [(time.time(), i) for i in ids])
+
+    def _mark_failed(self, ids, error, retry_at):
+        with self._lock:
+            self._db.executemany("UPDATE rows SET next_attempt_at = ?, last_error = ? WHERE id = ?",
+                                 [(retry_at, error, i) for i in ids])
+
+    def _prune(self):
+        # Sent keys are kept for a while so re-enqueued rows are still recognized
+        cutoff = time.time() - self.retain_days * 86400
+        with self._lock:
+            self._db.execute("DELETE FROM rows WHERE sent_at IS NOT NULL AND sent_at < ?", (cutoff,))
+
+    # --- inspection --------------------------------------------------------
+    def pending_count(self, target=None):
+        sql = "SELECT COUNT(*) FROM rows WHERE sent_at IS NULL"
+        args = ()
+        if target is not None:
+            sql += " AND target = ?"
+            args = (target,)
+        with self._lock:
+            return self._db.execute(sql, args).fetchone()[0]
+
+    def flush(self, timeout=30):
+        """Wake the flusher and wait until every row of a registered target is written
+        (including retries after backoff) or ``timeout`` passes; returns rows still pending."""
+        self.start()
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            self._wake.set()
+            with self._lock:
+                targets = list(self._targets)
+                marks = ",".join("?" * len(targets))
+                pending = targets and self._db.execute(
+                    f"SELECT COUNT(*) FROM rows WHERE sent_at IS NULL AND target IN ({marks})", targets,
+                ).fetchone()[0]
+            if not pending and not self._busy:
+                break
+            time.sleep(0.05)
+        return self.pending_count()
+
+    def stats(self):
+        with self._lock:
+            pending = self._db.execute(
+                "SELECT target, COUNT(*), MAX(attempts) FROM rows WHERE sent_at IS NULL GROUP BY target"
+            ).fetchall()
+        return {
+            "pending": sum(n for _, n, _ in pending),
+            "pending_by_target": {t: n for t, n, _ in pending},
+            "max_attempts": max((a for _, _, a in pending), default=0),
+            "sent": self.sent,
+            "last_error": self.last_error,
+        }
+
+
+def _key_text(key):
+    return key if isinstance(key, str) else json.dumps(key, default=str)
+
+
+# Singleton
+_queue = None
+_queue_lock = threading.Lock()
+
+def get_write_queue():
+    global _queue
+    with _queue_lock:
+        if _queue is None:
+            _queue = WriteQueue()
+    return _queue